@@ -0,0 +1,188 @@
+"""
+Throughput of the endpoint functions against the local stand-in server (see server.py).
+
+Every scenario runs in a fresh process and reports the returned rows, wall time, rows per second, CPU seconds of the
+client and its peak resident memory, so regressions in decoding, pagination and concurrency show up without
+network access. The server runs in a separate process and does not count for CPU time or memory.
+
+    python benchmarks/bench_client.py [--rows 100000] [--latency 0.02] [--gzip] [--only fetch_all ...]
+                                      [--json results.json]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    # peak memory is not reported on Windows
+    resource = None
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS, ".."))
+sys.path.insert(0, BENCHMARKS)
+import server  # noqa: E402
+
+DISEASE = "kidney clear cell carcinoma"
+GENES = ["ENSG%011d" % i for i in range(50)]
+
+
+def _interactions_page(sw):
+    return sw.get_all_ceRNAInteractions(disease_name=DISEASE, limit=1000)
+
+
+def _fetch_all_sequential(sw):
+    return sw.fetch_all(sw.get_all_ceRNAInteractions, disease_name=DISEASE, concurrency=1)
+
+
+def _fetch_all_concurrent(sw):
+    return sw.fetch_all(sw.get_all_ceRNAInteractions, disease_name=DISEASE, concurrency=8)
+
+
+def _fetch_all_compact(sw):
+    return sw.fetch_all(sw.get_all_ceRNAInteractions, disease_name=DISEASE, concurrency=8, compact=True)
+
+
+def _fetch_all_aio(sw):
+    import asyncio
+    import spongeWebPy.aio as aio
+
+    async def run():
+        try:
+            return await aio.fetch_all(aio.get_all_ceRNAInteractions, disease_name=DISEASE, concurrency=8)
+        finally:
+            await aio.close()
+    return asyncio.run(run())
+
+
+def _ceRNAs(sw):
+    return sw.fetch_all(sw.get_ceRNA, disease_name=DISEASE, concurrency=8)
+
+
+def _miRNA_interactions(sw):
+    return sw.fetch_all(sw.get_specific_miRNAInteraction, disease_name=DISEASE, concurrency=8,
+                        mimat_number=["MIMAT0000076"])
+
+
+def _gene_expression(sw):
+    return sw.get_geneExprValues(DISEASE, ensg_number=GENES)
+
+
+def _mirna_expression(sw):
+    return sw.get_mirnaExprValues(DISEASE, mimat_number=["MIMAT0000076"])
+
+
+def _survival_rates(sw):
+    return sw.get_survAna_rates(DISEASE, ensg_number=GENES)
+
+
+def _survival_pvalues(sw):
+    return sw.get_survAna_pValues(DISEASE, ensg_number=GENES)
+
+
+def _gene_count(sw):
+    return sw.get_geneCount(DISEASE)
+
+
+def _multi_disease(sw):
+    return sw.get_survAna_pValues(["kidney", "breast", "lung", "pancancer"], ensg_number=GENES)
+
+
+# name -> function receiving the spongeWebPy package and returning a dataframe
+SCENARIOS = {
+    "get_all_ceRNAInteractions": _interactions_page,
+    "fetch_all(concurrency=1)": _fetch_all_sequential,
+    "fetch_all(concurrency=8)": _fetch_all_concurrent,
+    "fetch_all(compact=True)": _fetch_all_compact,
+    "aio.fetch_all(concurrency=8)": _fetch_all_aio,
+    "fetch_all(get_ceRNA)": _ceRNAs,
+    "fetch_all(get_specific_miRNAInteraction)": _miRNA_interactions,
+    "get_geneExprValues": _gene_expression,
+    "get_mirnaExprValues": _mirna_expression,
+    "get_survAna_rates": _survival_rates,
+    "get_survAna_pValues": _survival_pvalues,
+    "get_geneCount": _gene_count,
+    "get_survAna_pValues(4 diseases)": _multi_disease,
+}
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+def _run(name, url, results):
+    # executed in a fresh process
+    os.environ["SPONGEWEBPY_API_URL"] = url
+    import spongeWebPy as sw
+    import spongeWebPy.config as config
+    config.api_url_base = url
+    config.cache_enabled = False
+    # import all modules before measuring
+    for function in sw.__all__:
+        getattr(sw, function)
+    baseline = _peak_rss_mb()
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    data = SCENARIOS[name](sw)
+    results.put({"name": name, "rows": len(data), "wall": time.perf_counter() - wall,
+                 "cpu": time.process_time() - cpu, "baseline_rss": baseline, "peak_rss": _peak_rss_mb()})
+
+
+def run_scenario(name, url):
+    """
+    Run one scenario in a fresh process.
+    :return: Dictionary with name, rows, wall and cpu seconds and baseline/peak resident memory in MB.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_run, args=(name, url, results))
+    process.start()
+    process.join()
+    if process.exitcode != 0:
+        return {"name": name, "error": "exit code " + str(process.exitcode)}
+    return results.get()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark spongeWebPy against a local stand-in server.")
+    parser.add_argument("--rows", type=int, default=100000, help="records per query of the server")
+    parser.add_argument("--latency", type=float, default=0.02, help="delay of every answer in seconds")
+    parser.add_argument("--gzip", action="store_true", help="let the server compress its answers")
+    parser.add_argument("--only", nargs="*", help="run only scenarios whose name contains one of these strings")
+    parser.add_argument("--json", help="also write the results to this file")
+    arguments = parser.parse_args()
+
+    names = [name for name in SCENARIOS if not arguments.only or any(part in name for part in arguments.only)]
+    process, url = server.start_process(arguments.rows, arguments.latency, arguments.gzip)
+    results = []
+    try:
+        print("server: %s, rows per query: %d, latency: %.3f s" % (url, arguments.rows, arguments.latency))
+        print("%-42s %9s %8s %11s %8s %10s" % ("function", "rows", "wall-s", "rows/s", "CPU-s", "peak MB"))
+        for name in names:
+            result = run_scenario(name, url)
+            results.append(result)
+            if "error" in result:
+                print("%-42s failed (%s)" % (name, result["error"]))
+                continue
+            peak = "n/a" if result["peak_rss"] is None else "%.0f" % result["peak_rss"]
+            print("%-42s %9d %8.2f %11.0f %8.2f %10s" % (name, result["rows"], result["wall"],
+                                                        result["rows"] / result["wall"], result["cpu"], peak))
+    finally:
+        process.terminate()
+        process.wait()
+
+    if arguments.json:
+        with open(arguments.json, "w") as file:
+            json.dump({"rows": arguments.rows, "latency": arguments.latency, "gzip": arguments.gzip,
+                       "results": results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""
+Memory of the dataframes returned by the endpoint functions with and without compact=True.
+
+    python benchmarks/bench_compact.py [rows]
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import payloads  # noqa: E402
+from spongeWebPy import decoding  # noqa: E402
+
+
+def main(rows=100000):
+    print("rows: %d" % rows)
+    for name, records in [("ceRNAInteraction/findAll", payloads.ceRNA_interactions(rows)),
+                          ("exprValue/getceRNA", payloads.gene_expression(rows))]:
+        data = decoding.records_to_frame(records)
+        compact = decoding.compact_frame(data)
+        before = data.memory_usage(deep=True).sum()
+        after = compact.memory_usage(deep=True).sum()
+        print("%-26s %8.1f MB -> %7.1f MB (%.0f%% less)" % (name, before / 1e6, after / 1e6, 100 - 100 * after / before))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
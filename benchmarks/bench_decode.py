@@ -0,0 +1,48 @@
+"""
+CPU time of turning API answers into dataframes: json.loads + pandas.json_normalize (the former path)
+against spongeWebPy.decoding.
+
+    python benchmarks/bench_decode.py [rows]
+"""
+import json
+import os
+import sys
+import time
+
+from pandas import json_normalize
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import payloads  # noqa: E402
+from spongeWebPy import decoding  # noqa: E402
+
+
+def cpu_seconds(function, content, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.process_time()
+        data = function(content)
+        elapsed = time.process_time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, data
+
+
+def former(content):
+    return json_normalize(json.loads(content.decode('utf-8')))
+
+
+def current(content):
+    return decoding.records_to_frame(decoding.loads(content))
+
+
+def main(rows=100000):
+    content = json.dumps(payloads.ceRNA_interactions(rows)).encode("utf-8")
+    former_seconds, expected = cpu_seconds(former, content)
+    current_seconds, data = cpu_seconds(current, content)
+    assert data.equals(expected)
+    print("rows: %d, payload: %.1f MB, orjson: %s" % (rows, len(content) / 1e6, decoding.orjson is not None))
+    print("json.loads + json_normalize: %.3f CPU-s" % former_seconds)
+    print("spongeWebPy.decoding:        %.3f CPU-s (%.1fx)" % (current_seconds, former_seconds / current_seconds))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
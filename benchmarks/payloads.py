@@ -0,0 +1,195 @@
+"""
+Synthetic SPONGE-web API payloads with the record layout of the real endpoints
+
+Every generator takes the number of rows and the offset of the first row, so paged answers can be produced for any
+limit/offset; the same arguments always give the same records.
+"""
+import random
+
+DISEASES = ["kidney clear cell carcinoma", "breast invasive carcinoma", "lung adenocarcinoma", "pancancer"]
+GENE_TYPES = ["protein_coding", "lincRNA", "antisense", "processed_pseudogene"]
+
+
+def gene(index):
+    return {"chromosome_name": str(index % 22 + 1),
+            "description": "synthetic gene %d" % index,
+            "end_pos": 1000 * index + 900,
+            "ensg_number": "ENSG%011d" % index,
+            "gene_symbol": "GENE%d" % index,
+            "gene_type": GENE_TYPES[index % len(GENE_TYPES)],
+            "start_pos": 1000 * index}
+
+
+def run(index):
+    disease = DISEASES[index % len(DISEASES)]
+    return {"dataset": {"data_origin": "TCGA", "disease_name": disease, "disease_type": "cancer"},
+            "run_ID": index % len(DISEASES) + 1}
+
+
+def ceRNA_interactions(rows, offset=0, genes=20000, seed=0):
+    """
+    Records as returned by ceRNAInteraction/findAll and ceRNAInteraction/findSpecific.
+    """
+    rng = random.Random(seed + offset)
+    return [{"correlation": rng.uniform(-1, 1),
+             "gene1": gene(rng.randrange(genes)),
+             "gene2": gene(rng.randrange(genes)),
+             "mscor": rng.uniform(0, 1),
+             "p_value": rng.uniform(0, 0.05),
+             "run": run(i)} for i in range(offset, offset + rows)]
+
+
+def gene_expression(rows, offset=0, genes=200, seed=0):
+    """
+    Records as returned by exprValue/getceRNA (one row per gene and sample).
+    """
+    rng = random.Random(seed + offset)
+    return [{"dataset": DISEASES[0],
+             "expr_value": rng.gauss(5, 2),
+             "gene": "ENSG%011d" % (i % genes),
+             "sample_ID": "TCGA-%02d-%04d" % (i // genes % 100, i // genes)} for i in range(offset, offset + rows)]
+
+
+def mirna(index):
+    return {"hs_nr": "hsa-mir-%d" % index,
+            "id_type": "mirbase",
+            "mir_ID": "MIMAT%07d" % index,
+            "seq": "UGAGGUAGUAGGUUGUAUAGUU"}
+
+
+def dataset(index):
+    disease = DISEASES[index % len(DISEASES)]
+    return {"data_origin": "TCGA",
+            "dataset_ID": index + 1,
+            "disease_name": disease,
+            "disease_name_abbreviation": "".join(word[0] for word in disease.split()).upper(),
+            "disease_subtype": None,
+            "disease_type": "cancer",
+            "download_url": "https://portal.gdc.cancer.gov/"}
+
+
+def datasets(rows, offset=0, seed=0):
+    """
+    Records as returned by dataset.
+    """
+    return [dataset(i) for i in range(offset, offset + rows)]
+
+
+def run_information(rows, offset=0, seed=0):
+    """
+    Records as returned by dataset/runInformation.
+    """
+    return [{"coefficient_direction": "<", "coefficient_threshold": 0.1, "dataset": dataset(i)["disease_name"],
+             "f_test": True, "f_test_p_adj_threshold": 0.05, "ks": "5", "log_level": "INFO", "m_max": 1,
+             "min_corr": 0.1, "number_of_datasets": 1000, "number_of_samples": 500, "run_ID": i + 1,
+             "variance_cutoff": None} for i in range(offset, offset + rows)]
+
+
+def ceRNAs(rows, offset=0, genes=20000, seed=0):
+    """
+    Records as returned by findceRNA.
+    """
+    rng = random.Random(seed + offset)
+    return [{"betweenness": rng.uniform(0, 1),
+             "eigenvector": rng.uniform(0, 1),
+             "gene": gene(rng.randrange(genes)),
+             "node_degree": rng.randrange(1, 5000),
+             "run": run(i)} for i in range(offset, offset + rows)]
+
+
+def miRNA_interactions(rows, offset=0, genes=20000, mirnas=2000, seed=0):
+    """
+    Records as returned by miRNAInteraction/findSpecific and miRNAInteraction/findceRNA.
+    """
+    rng = random.Random(seed + offset)
+    return [{"coefficient": rng.uniform(-1, 1),
+             "gene": gene(rng.randrange(genes)),
+             "mirna": mirna(rng.randrange(mirnas)),
+             "run": run(i)} for i in range(offset, offset + rows)]
+
+
+def miRNA_occurences(rows, offset=0, mirnas=2000, seed=0):
+    """
+    Records as returned by miRNAInteraction/getOccurence.
+    """
+    rng = random.Random(seed + offset)
+    return [{"mirna": mirna(rng.randrange(mirnas)),
+             "occurences": rng.randrange(1, 100000),
+             "run": run(i)} for i in range(offset, offset + rows)]
+
+
+def gene_counts(rows, offset=0, genes=20000, seed=0):
+    """
+    Records as returned by getGeneCount.
+    """
+    rng = random.Random(seed + offset)
+    return [{"count_all": rng.randrange(1, 10000),
+             "count_sign": rng.randrange(0, 1000),
+             "gene": gene(i % genes),
+             "run": run(i)} for i in range(offset, offset + rows)]
+
+
+def mirna_expression(rows, offset=0, mirnas=200, seed=0):
+    """
+    Records as returned by exprValue/getmirNA (one row per miRNA and sample).
+    """
+    rng = random.Random(seed + offset)
+    return [{"dataset": DISEASES[0],
+             "expr_value": rng.gauss(5, 2),
+             "mirna": "MIMAT%07d" % (i % mirnas),
+             "sample_ID": "TCGA-%02d-%04d" % (i // mirnas % 100, i // mirnas)} for i in range(offset, offset + rows)]
+
+
+def patient(index, rng):
+    return {"disease_status": rng.randrange(2),
+            "sample_ID": "TCGA-%02d-%04d" % (index % 100, index),
+            "survival_time": rng.randrange(1, 5000)}
+
+
+def survival_rates(rows, offset=0, genes=200, seed=0):
+    """
+    Records as returned by survivalAnalysis/getRates (one row per gene and patient).
+    """
+    rng = random.Random(seed + offset)
+    return [{"dataset": DISEASES[0],
+             "gene": gene(i % genes),
+             "overexpression": rng.randrange(2),
+             "patient_information": patient(i // genes, rng)} for i in range(offset, offset + rows)]
+
+
+def survival_pvalues(rows, offset=0, seed=0):
+    """
+    Records as returned by survivalAnalysis/getPValues.
+    """
+    rng = random.Random(seed + offset)
+    return [{"dataset": DISEASES[0],
+             "gene": gene(i),
+             "pValue": rng.uniform(0, 1)} for i in range(offset, offset + rows)]
+
+
+def sample_information(rows, offset=0, seed=0):
+    """
+    Records as returned by survivalAnalysis/sampleInformation.
+    """
+    rng = random.Random(seed + offset)
+    return [dict(patient(i, rng), dataset=DISEASES[0]) for i in range(offset, offset + rows)]
+
+
+def overall_counts(rows, offset=0, seed=0):
+    """
+    Records as returned by getOverallCounts.
+    """
+    rng = random.Random(seed + offset)
+    return [{"count_interactions": rng.randrange(10 ** 6, 10 ** 8),
+             "count_interactions_sign": rng.randrange(10 ** 4, 10 ** 6),
+             "count_shared_miRNAs": rng.randrange(10 ** 6, 10 ** 8),
+             "disease_name": dataset(i)["disease_name"],
+             "run_ID": i + 1} for i in range(offset, offset + rows)]
+
+
+def gene_annotations(key, rows, offset=0, seed=0):
+    """
+    Records as returned by getGeneOntology ("gene_ontology_symbol"), getHallmark ("hallmark") and
+    getWikipathway ("wp_key").
+    """
+    return [{"gene": gene(i), key: "%s_%d" % (key.upper(), i % 500)} for i in range(offset, offset + rows)]
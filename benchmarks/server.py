@@ -0,0 +1,170 @@
+"""
+Local stand-in for the SPONGE-web API serving synthetic payloads (see payloads.py)
+
+Every endpoint used by spongeWebPy answers with records of the real layout. Paged endpoints hold `rows` records per
+query and honor limit and offset, all others answer with `rows` records (metadata endpoints with a few). Every
+answer is delayed by `latency` seconds to imitate the network. Identifier lists and filters are accepted but not
+applied. Answers carry an ETag and conditional requests for an unchanged answer get 304 Not Modified; with --gzip
+they are compressed for clients accepting gzip.
+
+    python benchmarks/server.py [--port 8000] [--rows 100000] [--latency 0.02] [--gzip]
+    SPONGEWEBPY_API_URL=http://127.0.0.1:8000/ python my_script.py
+"""
+import argparse
+import functools
+import gzip
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+import payloads
+
+# endpoint -> (record generator taking rows and offset, whether the endpoint pages with limit and offset)
+ENDPOINTS = {
+    "ceRNAInteraction/findAll": (payloads.ceRNA_interactions, True),
+    "ceRNAInteraction/findSpecific": (payloads.ceRNA_interactions, True),
+    "findceRNA": (payloads.ceRNAs, True),
+    "miRNAInteraction/findSpecific": (payloads.miRNA_interactions, True),
+    "miRNAInteraction/findceRNA": (payloads.miRNA_interactions, False),
+    "miRNAInteraction/getOccurence": (payloads.miRNA_occurences, True),
+    "exprValue/getceRNA": (payloads.gene_expression, False),
+    "exprValue/getmirNA": (payloads.mirna_expression, False),
+    "survivalAnalysis/getRates": (payloads.survival_rates, False),
+    "survivalAnalysis/getPValues": (payloads.survival_pvalues, False),
+    "survivalAnalysis/sampleInformation": (payloads.sample_information, False),
+    "getGeneCount": (payloads.gene_counts, False),
+    "dataset": (lambda rows, offset: payloads.datasets(min(rows, 1), offset), False),
+    "dataset/runInformation": (lambda rows, offset: payloads.run_information(min(rows, 1), offset), False),
+    "getOverallCounts": (lambda rows, offset: payloads.overall_counts(min(rows, 4), offset), False),
+    "getGeneOntology": (functools.partial(payloads.gene_annotations, "gene_ontology_symbol"), False),
+    "getHallmark": (functools.partial(payloads.gene_annotations, "hallmark"), False),
+    "getWikipathway": (functools.partial(payloads.gene_annotations, "wp_key"), False),
+}
+
+# default of the limit parameter of the paged endpoints
+DEFAULT_LIMIT = 100
+
+# endpoint -> status codes answered, one per request, before the real answers (for tests of the retries)
+FAULTS = {}
+
+
+@functools.lru_cache(maxsize=64)
+def _body(endpoint, rows, offset):
+    # answers are generated once, so the server keeps up with the client
+    return json.dumps(ENDPOINTS[endpoint][0](rows, offset)).encode("utf-8")
+
+
+@functools.lru_cache(maxsize=64)
+def _compressed(endpoint, rows, offset):
+    return gzip.compress(_body(endpoint, rows, offset), compresslevel=6)
+
+
+def make_handler(rows, latency, compress=False):
+    """
+    Build the request handler class serving `rows` records per query with `latency` seconds delay,
+    gzip compressed if `compress` is set.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = dict(parse_qsl(url.query))
+            endpoint = url.path.strip("/")
+            time.sleep(latency)
+            if endpoint not in ENDPOINTS:
+                return self._answer(404, json.dumps({"detail": "Unknown endpoint " + endpoint}).encode("utf-8"))
+            if FAULTS.get(endpoint):
+                return self._answer(FAULTS[endpoint].pop(0), json.dumps({"detail": "Injected fault"}).encode("utf-8"),
+                                    {"Retry-After": "0"})
+            generate, paged = ENDPOINTS[endpoint]
+            if paged:
+                limit = int(params.get("limit") or DEFAULT_LIMIT)
+                offset = int(params.get("offset") or 0)
+                count = max(0, min(limit, rows - offset))
+            else:
+                offset, count = 0, rows
+            if count == 0:
+                return self._answer(404, json.dumps({"detail": "No results found."}).encode("utf-8"))
+            etag = '"' + hashlib.sha1(("%s:%d:%d" % (endpoint, count, offset)).encode("utf-8")).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                return self._answer(304, b"", {"ETag": etag})
+            if compress and "gzip" in self.headers.get("Accept-Encoding", ""):
+                return self._answer(200, _compressed(endpoint, count, offset),
+                                    {"ETag": etag, "Content-Encoding": "gzip"})
+            self._answer(200, _body(endpoint, count, offset), {"ETag": etag})
+
+        def _answer(self, status, body, headers=None):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # clients closing their keep-alive connections are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def serve(port=0, rows=100000, latency=0.02, compress=False):
+    """
+    Run the server in a background thread of this process.
+    :return: The server and its base url.
+    """
+    server = _Server(("127.0.0.1", port), make_handler(rows, latency, compress))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, "http://127.0.0.1:%d/" % server.server_address[1]
+
+
+def start_process(rows=100000, latency=0.02, compress=False):
+    """
+    Run the server in a separate process, so that its CPU time and memory do not count for the client.
+    :return: The process (terminate it when done) and the base url.
+    """
+    command = [sys.executable, os.path.abspath(__file__), "--port", "0", "--rows", str(rows), "--latency", str(latency)]
+    if compress:
+        command.append("--gzip")
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, universal_newlines=True)
+    url = process.stdout.readline().strip()
+    if not url:
+        process.kill()
+        raise RuntimeError("The benchmark server did not start.")
+    return process, url
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the SPONGE-web API.")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--rows", type=int, default=100000, help="records per query")
+    parser.add_argument("--latency", type=float, default=0.02, help="delay of every answer in seconds")
+    parser.add_argument("--gzip", action="store_true", help="compress answers for clients accepting gzip")
+    arguments = parser.parse_args()
+    server, url = serve(arguments.port, arguments.rows, arguments.latency, arguments.gzip)
+    print(url, flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
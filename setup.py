@@ -45,7 +45,7 @@ setup(
     # You can just specify package directories manually here if your project is simple.
     packages=["spongeWebPy"],  # Required
 
-    python_requires=">=3.5, <4",
+    python_requires=">=3.7, <4",
 
     # This field lists other packages that your project depends on to run.
     # Any package you put here will be installed by pip when your project is
@@ -66,5 +66,13 @@ setup(
         "urllib3>=1.25.8"
     ],
 
+    # Optional dependencies, e.g. $ pip install spongeWebPy[aio]
+    extras_require={
+        "aio": ["aiohttp>=3.6"],
+        "fast": ["orjson>=3.0"],
+        "parquet": ["pyarrow>=1.0"],
+        "compression": ["brotli>=1.0", "zstandard>=0.18"],
+    },
+
     include_package_data=True,
     zip_safe=False)
\ No newline at end of file
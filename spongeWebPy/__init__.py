@@ -1,15 +1,82 @@
-# load all functions from subdirs
-from spongeWebPy.dataset import *
-from spongeWebPy.occurences import *
-from spongeWebPy.survivalAnalysis import *
-from spongeWebPy.expressionValues import *
-from spongeWebPy.specific_miRNAInteraction import *
-from spongeWebPy.all_ceRNAInteraction import *
-from spongeWebPy.find_miRNA import *
-from spongeWebPy.get_GeneCount import *
-from spongeWebPy.specific_ceRNA import *
-from spongeWebPy.specific_ceRNAInteraction import *
-from spongeWebPy.geneOntology import *
-from spongeWebPy.hallmarks import *
-from spongeWebPy.overview import *
-from spongeWebPy.wikipathway import *
\ No newline at end of file
+# load all functions from subdirs lazily: a submodule (and pandas/requests with it)
+# is only imported on first access to one of its functions (PEP 562)
+import importlib
+
+_functions = {
+    "get_subtypeRunsForCancer": "dataset",
+    "get_datasetInformation": "dataset",
+    "get_runInformation": "dataset",
+    "get_miRNAOccurences": "occurences",
+    "iter_miRNAOccurences": "occurences",
+    "get_survAna_pValues": "survivalAnalysis",
+    "get_survAna_rates": "survivalAnalysis",
+    "get_survAna_sampleInformation": "survivalAnalysis",
+    "stream_survAna_rates": "survivalAnalysis",
+    "SurvivalCohort": "survival",
+    "logrank_screen": "survival",
+    "get_geneExprValues": "expressionValues",
+    "get_mirnaExprValues": "expressionValues",
+    "stream_geneExprValues": "expressionValues",
+    "stream_mirnaExprValues": "expressionValues",
+    "get_geneExprMatrix": "matrix",
+    "get_mirnaExprMatrix": "matrix",
+    "ExpressionMatrix": "matrix",
+    "get_specific_miRNAInteraction": "specific_miRNAInteraction",
+    "iter_specific_miRNAInteraction": "specific_miRNAInteraction",
+    "get_all_ceRNAInteractions": "all_ceRNAInteraction",
+    "iter_all_ceRNAInteractions": "all_ceRNAInteraction",
+    "get_sponged_miRNA": "find_miRNA",
+    "get_geneCount": "get_GeneCount",
+    "get_ceRNA": "specific_ceRNA",
+    "iter_ceRNA": "specific_ceRNA",
+    "get_specific_ceRNAInteractions": "specific_ceRNAInteraction",
+    "iter_specific_ceRNAInteractions": "specific_ceRNAInteraction",
+    "get_geneOntology": "geneOntology",
+    "get_hallmark": "hallmarks",
+    "get_overallCounts": "overview",
+    "get_WikiPathwayKey": "wikipathway",
+    "fetch_all": "pagination",
+    "iter_chunks": "streaming",
+    "export_ceRNAInteractions": "export",
+    "sync_replica": "replica",
+    "CeRNANetwork": "network",
+    "enable_cache": "cache",
+    "disable_cache": "cache",
+    "clear_cache": "cache",
+    "cache_info": "cache",
+    "check_releases": "releases",
+    "dataset_fingerprints": "releases",
+    "clear_memo": "memo",
+    "sync_identifiers": "identifiers",
+    "clear_identifiers": "identifiers",
+    "to_ensg_number": "identifiers",
+    "to_gene_symbol": "identifiers",
+    "to_mimat_number": "identifiers",
+    "to_hs_number": "identifiers",
+    "throttle_info": "throttle",
+    "metrics_snapshot": "metrics",
+    "metrics_prometheus": "metrics",
+    "reset_metrics": "metrics",
+    "add_request_hook": "metrics",
+    "remove_request_hook": "metrics",
+}
+
+# helper modules that are reachable as attributes as well (e.g. spongeWebPy.aio)
+_submodules = set(_functions.values()) | {"aio", "cache", "config", "connection"}
+
+__all__ = list(_functions)
+
+
+def __getattr__(name):
+    if name in _functions:
+        module = importlib.import_module("spongeWebPy." + _functions[name])
+        function = getattr(module, name)
+        globals()[name] = function
+        return function
+    if name in _submodules:
+        return importlib.import_module("spongeWebPy." + name)
+    raise AttributeError("module 'spongeWebPy' has no attribute " + repr(name))
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,375 @@
+"""
+Asynchronous (asyncio) versions of all public functions
+
+Every coroutine validates its parameters exactly like the synchronous function of the same name and returns the
+same dataframe. All coroutines running in one event loop share a single pooled aiohttp session, so they can be
+fanned out with asyncio.gather:
+
+    import asyncio
+    import spongeWebPy.aio as aio
+
+    async def main():
+        try:
+            return await asyncio.gather(aio.get_ceRNA("kidney clear cell carcinoma", limit=10),
+                                        aio.get_survAna_pValues("kidney clear cell carcinoma", gene_symbol=["PTEN"]))
+        finally:
+            await aio.close()
+"""
+import asyncio
+import functools
+import time
+import weakref
+from collections import deque
+
+import aiohttp
+import pandas
+
+# local import
+import spongeWebPy.config as config
+import spongeWebPy.connection as connection
+import spongeWebPy.metrics as metrics
+import spongeWebPy.pagination as pagination
+import spongeWebPy.singleflight as singleflight
+import spongeWebPy.throttle as throttle
+from spongeWebPy import all_ceRNAInteraction, dataset, expressionValues, find_miRNA, geneOntology, get_GeneCount, \
+    hallmarks, occurences, overview, specific_ceRNA, specific_ceRNAInteraction, specific_miRNAInteraction, \
+    survivalAnalysis, wikipathway
+
+# one client session per running event loop
+_sessions = weakref.WeakKeyDictionary()
+
+
+def get_session():
+    """
+    Return the pooled aiohttp session of the running event loop.
+    The session is created on first use with the pool size configured in config.pool_size.
+    :return: An aiohttp.ClientSession instance.
+    """
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        if isinstance(config.timeout, tuple):
+            timeout = aiohttp.ClientTimeout(total=None, sock_connect=config.timeout[0], sock_read=config.timeout[1])
+        else:
+            timeout = aiohttp.ClientTimeout(total=None, sock_connect=config.timeout, sock_read=config.timeout)
+        session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=config.pool_size),
+                                        headers=config.headers, timeout=timeout, trace_configs=[_trace_config()])
+        _sessions[loop] = session
+    return session
+
+
+def _trace_config():
+    # reports the time spent opening a connection to the request that is being recorded
+    async def on_start(session, context, params):
+        context.connect_start = time.perf_counter()
+
+    async def on_end(session, context, params):
+        metrics.add_phase("connect", time.perf_counter() - context.connect_start)
+        metrics.add_count("connections")
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_connection_create_start.append(on_start)
+    trace_config.on_connection_create_end.append(on_end)
+    return trace_config
+
+
+async def close():
+    """
+    Close the session of the running event loop and its pooled connections.
+    """
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
+
+
+async def api_request(endpoint, params=None, empty_status=404, compact=None):
+    """
+    Asynchronous version of connection.api_request.
+    :param endpoint: Path of the endpoint relative to config.api_url_base (e.g. "ceRNAInteraction/findAll").
+    :param params: Dictionary of query parameters. Parameters set to None are not sent.
+    :param empty_status: Status code the endpoint uses to signal an empty result.
+    :param compact: Return memory-compact column types. Default (None) follows config.compact.
+    :return: A pandas dataframe with the normalized JSON answer.
+    """
+    if params is not None and isinstance(params.get("disease_name"), (list, tuple)):
+        async def request(disease_name):
+            return await api_request(endpoint, dict(params, disease_name=disease_name), empty_status, False)
+
+        data = await for_each_disease(request, params["disease_name"])
+        failures = data.attrs.get("failures", {})
+        data = connection.finish_frame(data, compact)
+        data.attrs["failures"] = failures
+        return data
+
+    data = connection.answer_locally(endpoint, params)
+    if data is not None:
+        return connection.finish_frame(data, compact)
+
+    chunks = connection.split_params(params, endpoint)
+    if len(chunks) == 1:
+        data = await _send(endpoint, chunks[0], empty_status)
+    else:
+        semaphore = asyncio.Semaphore(config.chunk_concurrency)
+
+        async def send_chunk(chunk):
+            async with semaphore:
+                try:
+                    return await _send(endpoint, chunk, empty_status)
+                except connection.EmptyResponseError as error:
+                    return error
+
+        results = await asyncio.gather(*[send_chunk(chunk) for chunk in chunks])
+        data = connection.merge_chunks(results)
+    return connection.finish_frame(data, compact)
+
+
+async def for_each_disease(function, diseases, **kwargs):
+    """
+    Asynchronous version of connection.for_each_disease.
+    :param function: Coroutine function taking disease_name as keyword parameter.
+    :param diseases: A list of dataset names.
+    :param kwargs: Further parameters passed to function unchanged.
+    :return: A pandas dataframe with an additional first column "disease" and the failures in data.attrs["failures"].
+    """
+    diseases = list(diseases)
+    if not diseases:
+        raise ValueError("disease_name: at least one dataset name is required.")
+    semaphore = asyncio.Semaphore(config.disease_concurrency)
+
+    async def call(disease_name):
+        async with semaphore:
+            try:
+                return await function(disease_name=disease_name, **kwargs)
+            except Exception as error:
+                return error
+
+    results = await asyncio.gather(*[call(disease) for disease in diseases])
+    return connection.merge_diseases(diseases, results)
+
+
+async def _send(endpoint, params, empty_status):
+    # concurrent identical requests of this event loop share one call to the API
+    return await singleflight.run_async(endpoint, params, lambda: _fetch(endpoint, params, empty_status))
+
+
+async def _fetch(endpoint, params, empty_status):
+    with metrics.request(endpoint, params):
+        data = await _fetch_recorded(endpoint, params, empty_status)
+        if data is not None:
+            metrics.add_count("rows", len(data))
+        return data
+
+
+async def _fetch_recorded(endpoint, params, empty_status):
+    if config.cache_enabled and config.release_check_interval is not None:
+        # the check sends blocking requests, the event loop must keep running meanwhile
+        import spongeWebPy.releases as releases
+        await asyncio.get_running_loop().run_in_executor(None, releases.check_if_due)
+    data = connection.lookup_result(endpoint, params, empty_status, check_releases=False)
+    if data is not None:
+        return data
+
+    api_url = '{0}{1}'.format(config.api_url_base, endpoint)
+    # encode the parameters the same way requests does
+    query = {key: str(value) for key, value in (params or {}).items() if value is not None}
+    headers, stale = connection.conditional_headers(endpoint, params)
+
+    attempt = 0
+    while True:
+        await asyncio.sleep(throttle.rate_delay())
+        controller = throttle.controller()
+        ticket = await controller.acquire_async()
+        status = None
+        success = None
+        try:
+            start = time.perf_counter()
+            async with get_session().get(api_url, params=query, headers=headers) as response:
+                arrived = time.perf_counter()
+                content = await response.read()
+            metrics.add_phase("ttfb", arrived - start)
+            metrics.add_phase("download", time.perf_counter() - arrived)
+            connection.count_transfer(content, _wire_bytes(response, content))
+            metrics.set_source("api", response.status)
+            status = response.status
+            success = not throttle.should_retry(status)
+        except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError):
+            success = False
+            throttle.count("errors")
+            if attempt >= config.max_retries:
+                raise
+        finally:
+            controller.release(ticket, success)
+
+        if status is not None:
+            if not success:
+                throttle.count("throttled")
+            if success or attempt >= config.max_retries:
+                return connection.finish_request(endpoint, params, status, content, empty_status,
+                                                 response.headers, stale)
+        throttle.count("retries")
+        metrics.add_count("retries")
+        await asyncio.sleep(throttle.backoff(attempt, None if status is None else response.headers.get("Retry-After")))
+        attempt += 1
+
+
+def _wire_bytes(response, content):
+    # aiohttp decompresses transparently, the Content-Length of a compressed answer is its transferred size
+    length = response.headers.get("Content-Length")
+    if response.headers.get("Content-Encoding") and length is not None and length.isdigit():
+        return int(length)
+    return len(content)
+
+
+def _coroutine(function):
+    # asynchronous twin of an endpoint function that maps to a single API request
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        request = connection.prepare(function, *args, **kwargs)
+        return await api_request(*request)
+    return wrapper
+
+
+def iter_pages(function, page_size=1000, offset=None, concurrency=1, **params):
+    """
+    Asynchronous version of pagination.iter_pages.
+    :param function: Coroutine function supporting the limit and offset parameters (e.g. aio.get_all_ceRNAInteractions).
+    :param page_size: Number of results per page. Can be up to config.max_page_size (1000).
+    :param offset: Starting point from where results should be shown.
+    :param concurrency: Number of page requests kept in flight at the same time. Pages are always yielded in order.
+    :param params: All further parameters are passed to function unchanged.
+    :return: An asynchronous generator yielding pandas dataframes with at most page_size rows each.
+    """
+    pagination.check_page_arguments(page_size, concurrency)
+    if isinstance(params.get("disease_name"), (list, tuple)):
+        return _iter_diseases(function, page_size, offset, concurrency, params)
+    return _iter_pages(function, page_size, offset, concurrency, params)
+
+
+async def _iter_pages(function, page_size, offset, concurrency, params):
+    async def fetch_page(page_offset):
+        try:
+            return await function(limit=page_size, offset=page_offset, **params)
+        except connection.EmptyResponseError as error:
+            return error
+
+    offset = 0 if offset is None else offset
+    pending = deque()
+    try:
+        for _ in range(concurrency):
+            pending.append(asyncio.ensure_future(fetch_page(offset)))
+            offset += page_size
+        first_page = True
+        while pending:
+            page = await pending.popleft()
+            if page is None:
+                return
+            if isinstance(page, connection.EmptyResponseError):
+                # an empty first page means the query itself matches nothing
+                if first_page:
+                    raise page
+                return
+            if len(page) > 0:
+                yield page
+            if len(page) < page_size:
+                return
+            first_page = False
+            pending.append(asyncio.ensure_future(fetch_page(offset)))
+            offset += page_size
+    finally:
+        for task in pending:
+            task.cancel()
+        # requests beyond the last page must not outlive the iteration
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def _iter_diseases(function, page_size, offset, concurrency, params):
+    diseases = list(params["disease_name"])
+    if not diseases:
+        raise ValueError("disease_name: at least one dataset name is required.")
+    failures = {}
+    for disease in diseases:
+        found = False
+        try:
+            async for page in _iter_pages(function, page_size, offset, concurrency, dict(params, disease_name=disease)):
+                page.insert(0, "disease", disease, allow_duplicates=True)
+                found = True
+                yield page
+        except Exception as error:
+            failures[disease] = error
+        else:
+            if not found:
+                failures[disease] = connection.EmptyResponseError("API response is empty. Reason: no data for " +
+                                                                  str(disease) + ".")
+    if len(failures) == len(diseases):
+        raise failures[diseases[0]]
+    connection.report_failures(failures, len(diseases))
+
+
+async def fetch_all(function, page_size=1000, offset=None, concurrency=None, **params):
+    """
+    Asynchronous version of pagination.fetch_all.
+    :param function: Coroutine function supporting the limit and offset parameters (e.g. aio.get_all_ceRNAInteractions).
+    :param page_size: Number of results per page. Can be up to config.max_page_size (1000).
+    :param offset: Starting point from where results should be shown.
+    :param concurrency: Number of page requests kept in flight at the same time. Default is config.concurrency.
+    :param params: All further parameters are passed to function unchanged.
+    :return: A pandas dataframe with all results in server order.
+    """
+    if concurrency is None:
+        concurrency = config.concurrency
+    params, compact = pagination.page_params(function, params)
+    pages = [page async for page in iter_pages(function, page_size=page_size, offset=offset,
+                                               concurrency=concurrency, **params)]
+    if not pages:
+        return pandas.DataFrame()
+    return connection.finish_frame(pandas.concat(pages, ignore_index=True), compact)
+
+
+def _iterator(function, sync_iterator):
+    # asynchronous twin of one of the iter_* functions
+    @functools.wraps(sync_iterator)
+    def wrapper(page_size=1000, offset=None, concurrency=1, **params):
+        return iter_pages(function, page_size=page_size, offset=offset, concurrency=concurrency, **params)
+    return wrapper
+
+
+async def get_subtypeRunsForCancer(disease_name):
+    """
+    Asynchronous version of dataset.get_subtypeRunsForCancer.
+    """
+    if isinstance(disease_name, (list, tuple)):
+        return await for_each_disease(get_subtypeRunsForCancer, disease_name)
+    data = await get_datasetInformation(disease_name=disease_name)
+    cancer_abbreviation = data['disease_name_abbreviation'].values[0]
+    if cancer_abbreviation != '':
+        subtypes = await get_datasetInformation(disease_name=cancer_abbreviation)
+        return subtypes
+    return None
+
+
+get_datasetInformation = _coroutine(dataset.get_datasetInformation)
+get_runInformation = _coroutine(dataset.get_runInformation)
+get_miRNAOccurences = _coroutine(occurences.get_miRNAOccurences)
+get_survAna_pValues = _coroutine(survivalAnalysis.get_survAna_pValues)
+get_survAna_rates = _coroutine(survivalAnalysis.get_survAna_rates)
+get_survAna_sampleInformation = _coroutine(survivalAnalysis.get_survAna_sampleInformation)
+get_geneExprValues = _coroutine(expressionValues.get_geneExprValues)
+get_mirnaExprValues = _coroutine(expressionValues.get_mirnaExprValues)
+get_specific_miRNAInteraction = _coroutine(specific_miRNAInteraction.get_specific_miRNAInteraction)
+get_all_ceRNAInteractions = _coroutine(all_ceRNAInteraction.get_all_ceRNAInteractions)
+get_sponged_miRNA = _coroutine(find_miRNA.get_sponged_miRNA)
+get_geneCount = _coroutine(get_GeneCount.get_geneCount)
+get_ceRNA = _coroutine(specific_ceRNA.get_ceRNA)
+get_specific_ceRNAInteractions = _coroutine(specific_ceRNAInteraction.get_specific_ceRNAInteractions)
+get_geneOntology = _coroutine(geneOntology.get_geneOntology)
+get_hallmark = _coroutine(hallmarks.get_hallmark)
+get_overallCounts = _coroutine(overview.get_overallCounts)
+get_WikiPathwayKey = _coroutine(wikipathway.get_WikiPathwayKey)
+
+iter_miRNAOccurences = _iterator(get_miRNAOccurences, occurences.iter_miRNAOccurences)
+iter_specific_miRNAInteraction = _iterator(get_specific_miRNAInteraction,
+                                           specific_miRNAInteraction.iter_specific_miRNAInteraction)
+iter_all_ceRNAInteractions = _iterator(get_all_ceRNAInteractions, all_ceRNAInteraction.iter_all_ceRNAInteractions)
+iter_ceRNA = _iterator(get_ceRNA, specific_ceRNA.iter_ceRNA)
+iter_specific_ceRNAInteractions = _iterator(get_specific_ceRNAInteractions,
+                                            specific_ceRNAInteraction.iter_specific_ceRNAInteractions)
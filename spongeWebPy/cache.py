@@ -0,0 +1,313 @@
+"""
+Persistent on-disk cache for API responses
+
+The cache is opt-in. Enable it with enable_cache() or by setting config.cache_enabled = True.
+Responses are stored in a SQLite database keyed by endpoint and the sorted, normalized query parameters.
+Entries expire after config.cache_ttl seconds (or the per-endpoint value in config.cache_ttls) and the least
+recently used entries are evicted once the cache grows beyond config.cache_max_size bytes. Expired entries whose
+answer carried an ETag or Last-Modified header are revalidated with a conditional request, an unchanged answer
+(304 Not Modified) then costs no download. Every entry is tagged with the dataset it was requested for, so that
+entries of a re-released dataset can be removed without touching the others (see spongeWebPy.releases).
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlencode
+
+# local import
+import spongeWebPy.config as config
+
+_local = threading.local()
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "revalidated": 0}
+
+
+def default_cache_dir():
+    """
+    Return the per-user cache directory of spongeWebPy (e.g. ~/.cache/spongeWebPy on Linux).
+    """
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA", os.path.expanduser("~"))
+    else:
+        base = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(base, "spongeWebPy")
+
+
+def cache_path():
+    """
+    Return the path of the cache database, config.cache_path or responses.sqlite in default_cache_dir().
+    """
+    if config.cache_path is not None:
+        return config.cache_path
+    return os.path.join(default_cache_dir(), "responses.sqlite")
+
+
+def request_key(endpoint, params=None):
+    """
+    Build the normalized key of a request: the endpoint followed by the sorted query parameters.
+    Parameters set to None are dropped since they are not sent either.
+    :param endpoint: Path of the endpoint relative to config.api_url_base.
+    :param params: Dictionary of query parameters.
+    :return: The key as string, e.g. "dataset?disease_name=kidney".
+    """
+    items = sorted((key, str(value)) for key, value in (params or {}).items() if value is not None)
+    return endpoint + "?" + urlencode(items)
+
+
+def enable_cache(path=None):
+    """
+    Switch on the persistent response cache.
+    :param path: Location of the cache database. Default (None) keeps config.cache_path.
+    """
+    if path is not None:
+        config.cache_path = path
+    config.cache_enabled = True
+
+
+def disable_cache():
+    """
+    Switch off the persistent response cache. Stored entries are kept.
+    """
+    config.cache_enabled = False
+
+
+def _connect():
+    # one SQLite connection per thread and database file
+    path = cache_path()
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    db = connections.get(path)
+    if db is None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, endpoint TEXT NOT NULL, "
+                   "content BLOB NOT NULL, size INTEGER NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)")
+        db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        # identifier pairs learned by spongeWebPy.identifiers
+        db.execute("CREATE TABLE IF NOT EXISTS identifiers (kind TEXT NOT NULL, key TEXT NOT NULL, "
+                   "value TEXT NOT NULL, PRIMARY KEY (kind, key))")
+        # fingerprints of the datasets (see spongeWebPy.releases)
+        db.execute("CREATE TABLE IF NOT EXISTS fingerprints (disease TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, "
+                   "checked REAL NOT NULL, abbreviation TEXT)")
+        # validators for conditional requests, the parameters of the request (see entries) and the dataset search
+        # term it was sent for, added to databases of older versions
+        columns = {row[1] for row in db.execute("PRAGMA table_info(responses)")}
+        missing = [("responses", column) for column in ("etag", "last_modified", "params", "disease")
+                   if column not in columns]
+        if "abbreviation" not in {row[1] for row in db.execute("PRAGMA table_info(fingerprints)")}:
+            missing.append(("fingerprints", "abbreviation"))
+        for table, column in missing:
+            try:
+                db.execute("ALTER TABLE " + table + " ADD COLUMN " + column + " TEXT")
+            except sqlite3.OperationalError:
+                # added by another process in the meantime
+                pass
+        connections[path] = db
+    return db
+
+
+def _ttl(endpoint):
+    return config.cache_ttls.get(endpoint, config.cache_ttl)
+
+
+def _count(name):
+    with _lock:
+        _stats[name] += 1
+
+
+def lookup(endpoint, params=None):
+    """
+    Return the cached body of a request if a fresh entry exists.
+    :param endpoint: Path of the endpoint relative to config.api_url_base.
+    :param params: Dictionary of query parameters.
+    :return: The raw response body as bytes or None on a cache miss.
+    """
+    key = request_key(endpoint, params)
+    db = _connect()
+    row = db.execute("SELECT content, created FROM responses WHERE key = ?", (key,)).fetchone()
+    now = time.time()
+    if row is None or now - row[1] > _ttl(endpoint):
+        _count("misses")
+        return None
+    db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+    _count("hits")
+    return row[0]
+
+
+def store(endpoint, params, content, etag=None, last_modified=None):
+    """
+    Save the body of a successful request and evict least recently used entries beyond config.cache_max_size.
+    :param endpoint: Path of the endpoint relative to config.api_url_base.
+    :param params: Dictionary of query parameters.
+    :param content: Raw response body as bytes.
+    :param etag: Value of the ETag header of the answer, used to revalidate the entry once it expired.
+    :param last_modified: Value of the Last-Modified header of the answer.
+    """
+    key = request_key(endpoint, params)
+    db = _connect()
+    now = time.time()
+    stored = {name: value for name, value in (params or {}).items() if value is not None}
+    # the partition of the entry, invalidated when one of the datasets it was searched in changes
+    disease = None if stored.get("disease_name") is None else str(stored["disease_name"]).lower()
+    db.execute("INSERT OR REPLACE INTO responses (key, endpoint, content, size, created, accessed, etag, "
+               "last_modified, params, disease) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+               (key, endpoint, content, len(content), now, now, etag, last_modified,
+                json.dumps(stored, sort_keys=True, default=str), disease))
+    _evict(db)
+
+
+def entries(endpoint):
+    """
+    List the fresh entries of an endpoint together with the parameters of their requests.
+    :param endpoint: Path of the endpoint relative to config.api_url_base.
+    :return: A list of (params, size) tuples, smallest entries first. Entries of older versions without stored
+             parameters are left out.
+    """
+    rows = _connect().execute("SELECT params, size FROM responses WHERE endpoint = ? AND params IS NOT NULL AND "
+                              "created >= ? ORDER BY size", (endpoint, time.time() - _ttl(endpoint))).fetchall()
+    return [(json.loads(params), size) for params, size in rows]
+
+
+def stale_entry(endpoint, params=None):
+    """
+    Return an expired entry that can be revalidated with a conditional request.
+    :param endpoint: Path of the endpoint relative to config.api_url_base.
+    :param params: Dictionary of query parameters.
+    :return: A tuple (content, etag, last_modified) or None if there is no entry with an ETag or Last-Modified date.
+    """
+    key = request_key(endpoint, params)
+    row = _connect().execute("SELECT content, etag, last_modified FROM responses WHERE key = ? AND "
+                             "(etag IS NOT NULL OR last_modified IS NOT NULL)", (key,)).fetchone()
+    return None if row is None else tuple(row)
+
+
+def refresh(endpoint, params=None):
+    """
+    Mark an entry as fresh again after the server confirmed it is unchanged (answer 304 Not Modified).
+    :param endpoint: Path of the endpoint relative to config.api_url_base.
+    :param params: Dictionary of query parameters.
+    """
+    key = request_key(endpoint, params)
+    now = time.time()
+    _connect().execute("UPDATE responses SET created = ?, accessed = ? WHERE key = ?", (now, now, key))
+    _count("revalidated")
+
+
+def _evict(db):
+    total = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    if total <= config.cache_max_size:
+        return
+    rows = db.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall()
+    stale = []
+    for key, size in rows:
+        if total <= config.cache_max_size:
+            break
+        stale.append((key,))
+        total -= size
+    db.executemany("DELETE FROM responses WHERE key = ?", stale)
+
+
+def load_identifiers():
+    """
+    Return the identifier pairs stored with store_identifiers.
+    :return: A list of (kind, key, value) tuples, e.g. ("gene", "ENSG00000171862", "PTEN").
+    """
+    return _connect().execute("SELECT kind, key, value FROM identifiers").fetchall()
+
+
+def store_identifiers(pairs):
+    """
+    Save identifier pairs, pairs of known keys are kept.
+    :param pairs: Iterable of (kind, key, value) tuples.
+    """
+    db = _connect()
+    # one transaction instead of one per pair
+    db.execute("BEGIN")
+    try:
+        db.executemany("INSERT OR IGNORE INTO identifiers (kind, key, value) VALUES (?, ?, ?)", pairs)
+    except BaseException:
+        db.execute("ROLLBACK")
+        raise
+    db.execute("COMMIT")
+
+
+def load_fingerprints():
+    """
+    Return the dataset fingerprints stored with store_fingerprints.
+    :return: A tuple (fingerprints, abbreviations, checked): dictionaries lower case disease name -> fingerprint and
+             -> lower case abbreviation (for the datasets that have one) and the time of the last check in seconds
+             since the epoch, None if there was none.
+    """
+    rows = _connect().execute("SELECT disease, fingerprint, checked, abbreviation FROM fingerprints").fetchall()
+    return ({row[0]: row[1] for row in rows}, {row[0]: row[3] for row in rows if row[3]},
+            max((row[2] for row in rows), default=None))
+
+
+def store_fingerprints(fingerprints, abbreviations=None):
+    """
+    Replace the stored dataset fingerprints.
+    :param fingerprints: Dictionary lower case disease name -> fingerprint.
+    :param abbreviations: Dictionary lower case disease name -> lower case abbreviation (e.g. "kirc").
+    """
+    abbreviations = abbreviations or {}
+    db = _connect()
+    now = time.time()
+    db.execute("BEGIN")
+    try:
+        db.execute("DELETE FROM fingerprints")
+        db.executemany("INSERT INTO fingerprints (disease, fingerprint, checked, abbreviation) VALUES (?, ?, ?, ?)",
+                       [(disease, fingerprint, now, abbreviations.get(disease))
+                        for disease, fingerprint in fingerprints.items()])
+    except BaseException:
+        db.execute("ROLLBACK")
+        raise
+    db.execute("COMMIT")
+
+
+def invalidate_diseases(names):
+    """
+    Remove the entries that may hold data of the given datasets: entries whose dataset search term is part of one of
+    the names (the API searches disease names by substring), entries not sent for a single dataset.
+    :param names: Full names of the datasets and their abbreviations, e.g. ["kidney clear cell carcinoma", "KIRC"],
+                  so that requests searching by abbreviation (e.g. from get_subtypeRunsForCancer) are removed as well.
+    :return: The number of removed entries.
+    """
+    db = _connect()
+    removed = db.execute("DELETE FROM responses WHERE disease IS NULL").rowcount
+    for name in names:
+        removed += db.execute("DELETE FROM responses WHERE instr(?, disease) > 0", (str(name).lower(),)).rowcount
+    return removed
+
+
+def clear_cache(endpoint=None):
+    """
+    Remove entries from the persistent cache.
+    :param endpoint: Only remove entries of this endpoint (e.g. "ceRNAInteraction/findAll"). Default removes all,
+                     including the stored identifiers and dataset fingerprints.
+    """
+    db = _connect()
+    if endpoint is None:
+        db.execute("DELETE FROM responses")
+        db.execute("DELETE FROM identifiers")
+        db.execute("DELETE FROM fingerprints")
+    else:
+        db.execute("DELETE FROM responses WHERE endpoint = ?", (endpoint,))
+
+
+def cache_info():
+    """
+    Statistics about the persistent cache.
+    :return: Dictionary with the number of hits, misses and entries revalidated by the server in this process and
+             the number of entries and total size in bytes of the cache database.
+    """
+    entries, size = _connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+    with _lock:
+        info = dict(_stats)
+    info.update({"entries": entries, "size": size, "path": cache_path()})
+    return info
@@ -1,9 +1,104 @@
 """
 Setup the basic connection things
 """
+import os
 
-# set the base url of the SPONGE-web API
-api_url_base = 'https://exbio.wzw.tum.de/sponge-api/'
+# set the base url of the SPONGE-web API, the environment variable SPONGEWEBPY_API_URL points all functions
+# to another server (e.g. a mirror or the stand-in server of the benchmarks)
+api_url_base = os.environ.get('SPONGEWEBPY_API_URL', 'https://exbio.wzw.tum.de/sponge-api/')
 
 # set up the HTTP request headers the way the API docs describe
 headers = {'Content-Type': 'application/json'}
+
+# number of keep-alive connections kept open per host by the shared session
+pool_size = 10
+
+# (connect, read) timeout in seconds for every request, None waits forever
+timeout = (10, 300)
+
+# maximal number of results the API returns per request (upper bound for limit)
+max_page_size = 1000
+
+# number of page requests fetch_all keeps in flight at the same time
+concurrency = 4
+
+# client-side rate limit in requests per second (token bucket), None switches it off
+rate_limit = None
+# number of requests that may be sent at once before the rate limit applies
+rate_burst = 10
+# failed requests (connection errors and answers with one of retry_statuses) are retried this many times
+max_retries = 3
+retry_statuses = {429, 500, 502, 503, 504}
+# base and maximal waiting time in seconds of the jittered exponential backoff between retries, the maximum also
+# caps the waiting time requested by the server with Retry-After
+retry_backoff = 0.5
+retry_backoff_max = 60
+# bounds of the adaptive limit of requests in flight, it halves on failures and grows back by one per window
+# of successful requests
+min_concurrency = 1
+max_concurrency = 64
+
+# concurrent identical requests share one call to the API (see spongeWebPy.singleflight)
+coalesce_requests = True
+
+# record per-endpoint request metrics (see spongeWebPy.metrics)
+metrics_enabled = True
+
+# number of datasets queried at the same time when a list of disease names is given
+disease_concurrency = 4
+
+# persistent response cache (see spongeWebPy.cache), switched off by default
+cache_enabled = False
+# location of the cache database, None uses responses.sqlite in the per-user cache directory
+cache_path = None
+# total size of all cached responses in bytes before least recently used entries are evicted
+cache_max_size = 2 * 1024 ** 3
+# seconds until a cached response expires, cache_ttls overrides it per endpoint (e.g. {"getOverallCounts": 3600})
+cache_ttl = 30 * 24 * 3600
+cache_ttls = {}
+# revalidate expired entries with If-None-Match / If-Modified-Since instead of downloading them again
+cache_revalidate = True
+# answer interaction queries from cached complete answers of broader queries (see spongeWebPy.planner)
+subsume_queries = True
+# seconds between automatic checks for rebuilt datasets, whose cached answers are then removed (see
+# spongeWebPy.releases), None only checks when check_releases() is called
+release_check_interval = None
+
+# metadata endpoints whose answers are kept in memory for the lifetime of the process (see spongeWebPy.memo)
+memoized_endpoints = {"dataset", "dataset/runInformation", "getOverallCounts", "getGeneOntology", "getHallmark",
+                      "getWikipathway"}
+# number of memoized answers kept before the least recently used are dropped
+memo_size = 256
+
+# identifier lists longer than this are split into several requests to keep URLs short
+chunk_size = 200
+# number of chunked requests of one call sent at the same time
+chunk_concurrency = 4
+# longest query string (in characters) sent for identifier lists that can not be split, e.g. the interactions
+# between the given genes
+max_query_length = 16000
+
+# learn gene and miRNA identifier pairs from all answers (see spongeWebPy.identifiers)
+learn_identifiers = True
+# correct, translate and deduplicate identifier lists with the learned identifiers before a request is sent
+normalize_identifiers = False
+
+# maximal number of rows per dataframe yielded by the streaming functions (e.g. stream_mirnaExprValues)
+stream_chunk_size = 100000
+
+# location of the expression matrices stored by get_geneExprMatrix(persist=True), None uses matrices in the
+# per-user cache directory
+matrix_path = None
+
+# return memory-compact column types (categoricals, float32, small integers) from all functions by default
+compact = False
+# string columns with at most this share of distinct values become categoricals in compact mode
+compact_max_unique_ratio = 0.5
+# identifier columns that always become categoricals in compact mode
+compact_categorical_columns = {"disease_name", "gene_type", "gene_symbol", "ensg_number", "mir_ID", "hs_nr",
+                               "sample_ID", "chromosome_name"}
+
+# where the query functions get their data from: "api" or "replica" (local database filled by sync_replica)
+backend = "api"
+# location of the replica database, None uses replica.sqlite in the per-user cache directory
+replica_path = None
@@ -0,0 +1,591 @@
+"""
+Shared HTTP transport for all endpoint functions
+"""
+import contextvars
+import itertools
+import threading
+import time
+import warnings
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+import pandas
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.request import ACCEPT_ENCODING
+
+# local import
+import spongeWebPy.cache as cache
+import spongeWebPy.config as config
+import spongeWebPy.decoding as decoding
+import spongeWebPy.identifiers as identifiers
+import spongeWebPy.memo as memo
+import spongeWebPy.metrics as metrics
+import spongeWebPy.singleflight as singleflight
+import spongeWebPy.throttle as throttle
+
+_session = None
+_session_lock = threading.Lock()
+
+# set while prepare() runs an endpoint function, api_request then only describes the request
+_prepare_only = contextvars.ContextVar("prepare_only", default=False)
+
+# failures of the transport that are retried like overloaded answers, including connections reset while the body
+# was read
+RETRIED_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+# endpoints whose answer depends on the whole identifier list, with the parameters for which it does (None: always);
+# such requests are never split into chunks
+WHOLE_LIST_ENDPOINTS = {"ceRNAInteraction/findSpecific": None, "miRNAInteraction/findceRNA": {"between": True}}
+
+# description of a single API request as built by an endpoint function
+PendingRequest = namedtuple("PendingRequest", ["endpoint", "params", "empty_status", "compact"])
+
+
+class EmptyResponseError(ValueError):
+    """
+    Raised when the API answers that no data fits the request.
+    """
+
+
+class APIError(ValueError):
+    """
+    Raised when the API answers with an error status (after all retries) or with a body that is not JSON.
+    """
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class PartialResultWarning(UserWarning):
+    """
+    Issued when some datasets of a multi-disease query failed or came back empty.
+    """
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    # reports the time spent opening a connection to the request that is being recorded
+
+    def connect(self):
+        with metrics.timed("connect"):
+            super().connect()
+        metrics.add_count("connections")
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+
+    def connect(self):
+        with metrics.timed("connect"):
+            super().connect()
+        metrics.add_count("connections")
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedHTTPAdapter(HTTPAdapter):
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _TimedHTTPConnectionPool,
+                                                   "https": _TimedHTTPSConnectionPool}
+
+
+def get_session():
+    """
+    Return the pooled keep-alive session shared by all endpoint functions.
+    The session is created on first use with the pool size configured in config.pool_size.
+    :return: A requests.Session instance.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                adapter = _TimedHTTPAdapter(pool_connections=config.pool_size, pool_maxsize=config.pool_size)
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                # gzip and deflate, plus brotli and zstd if the brotli and zstandard packages are installed
+                session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+                session.headers.update(config.headers)
+                _session = session
+    return _session
+
+
+def reset_session():
+    """
+    Close the shared session and its pooled connections.
+    The next request opens a new session, so changes to config.pool_size or config.headers take effect.
+    """
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def prepare(function, *args, **kwargs):
+    """
+    Run an endpoint function up to the point where it would contact the API.
+    Parameter validation happens as usual, but instead of sending the request the function returns its description.
+    :param function: Endpoint function that ends with a single call of api_request (e.g. get_ceRNA).
+    :param args: Positional parameters for function.
+    :param kwargs: Keyword parameters for function.
+    :return: A PendingRequest with the arguments of api_request.
+    """
+    token = _prepare_only.set(True)
+    try:
+        request = function(*args, **kwargs)
+    finally:
+        _prepare_only.reset(token)
+    if not isinstance(request, PendingRequest):
+        raise TypeError(function.__name__ + " does not map to a single API request.")
+    return request
+
+
+def api_request(endpoint, params=None, empty_status=404, compact=None):
+    """
+    Send a GET request to an endpoint of the SPONGE-web API and convert the answer into a dataframe.
+    :param endpoint: Path of the endpoint relative to config.api_url_base (e.g. "ceRNAInteraction/findAll").
+    :param params: Dictionary of query parameters. Parameters set to None are not sent.
+    :param empty_status: Status code the endpoint uses to signal an empty result.
+    :param compact: Return memory-compact column types (see decoding.compact_frame).
+                    Default (None) follows config.compact.
+    :return: A pandas dataframe with the normalized JSON answer.
+    """
+    if _prepare_only.get():
+        return PendingRequest(endpoint, params, empty_status, compact)
+
+    if params is not None and isinstance(params.get("disease_name"), (list, tuple)):
+        # one request per dataset, compacted once the results are combined
+        def request(disease_name):
+            return api_request(endpoint, dict(params, disease_name=disease_name), empty_status, False)
+
+        data = for_each_disease(request, params["disease_name"])
+        failures = data.attrs.get("failures", {})
+        data = finish_frame(data, compact)
+        data.attrs["failures"] = failures
+        return data
+
+    data = answer_locally(endpoint, params)
+    if data is not None:
+        return finish_frame(data, compact)
+    return send_request(endpoint, params, empty_status, compact)
+
+
+def send_request(endpoint, params=None, empty_status=404, compact=None):
+    """
+    Like api_request, but always asks the API, even if a local backend is switched on.
+    :param endpoint: Path of the endpoint relative to config.api_url_base (e.g. "ceRNAInteraction/findAll").
+    :param params: Dictionary of query parameters. Parameters set to None are not sent.
+    :param empty_status: Status code the endpoint uses to signal an empty result.
+    :param compact: Return memory-compact column types. Default (None) follows config.compact.
+    :return: A pandas dataframe with the normalized JSON answer.
+    """
+    chunks = split_params(params, endpoint)
+    if len(chunks) == 1:
+        data = _send(endpoint, chunks[0], empty_status)
+    else:
+        def send_chunk(chunk):
+            try:
+                return _send(endpoint, chunk, empty_status)
+            except EmptyResponseError as error:
+                return error
+
+        with ThreadPoolExecutor(max_workers=min(config.chunk_concurrency, len(chunks))) as executor:
+            results = list(executor.map(send_chunk, chunks))
+        data = merge_chunks(results)
+    return finish_frame(data, compact)
+
+
+def for_each_disease(function, diseases, **kwargs):
+    """
+    Call a disease-scoped function for several datasets concurrently and combine the answers.
+    A dataset that fails or comes back empty does not abort the others: it is left out of the result, listed in
+    data.attrs["failures"] and reported with a PartialResultWarning.
+    :param function: Function taking disease_name as keyword parameter and returning a pandas dataframe.
+    :param diseases: A list of dataset names.
+    :param kwargs: Further parameters passed to function unchanged.
+    :return: A pandas dataframe with the rows of all datasets and the requested name in an additional first column
+             "disease". data.attrs["failures"] maps the names of the missing datasets to their errors.
+             If no dataset returns data, the error of the first one is raised.
+    :example: for_each_disease(get_survAna_pValues, ["kidney clear cell carcinoma", "lung adenocarcinoma"],
+                               gene_symbol = ["PTEN"])
+    """
+    diseases = list(diseases)
+    if not diseases:
+        raise ValueError("disease_name: at least one dataset name is required.")
+
+    def call(disease_name):
+        try:
+            return function(disease_name=disease_name, **kwargs)
+        except Exception as error:
+            return error
+
+    with ThreadPoolExecutor(max_workers=min(config.disease_concurrency, len(diseases))) as executor:
+        results = list(executor.map(call, diseases))
+    return merge_diseases(diseases, results)
+
+
+def merge_diseases(diseases, results):
+    """
+    Combine the answers of a multi-disease query (see for_each_disease).
+    :param diseases: A list of dataset names.
+    :param results: List with a dataframe, None or an exception per dataset.
+    :return: A pandas dataframe with an additional first column "disease" and the failures in data.attrs["failures"].
+    """
+    frames = []
+    failures = {}
+    for disease, result in zip(diseases, results):
+        if isinstance(result, Exception):
+            failures[disease] = result
+        elif result is None or len(result) == 0:
+            failures[disease] = EmptyResponseError("API response is empty. Reason: no data for " + str(disease) + ".")
+        else:
+            result.insert(0, "disease", disease, allow_duplicates=True)
+            frames.append(result)
+    if not frames:
+        raise failures[diseases[0]]
+    data = pandas.concat(frames, ignore_index=True)
+    data.attrs["failures"] = failures
+    report_failures(failures, len(diseases), stacklevel=3)
+    return data
+
+
+def report_failures(failures, total, stacklevel=2):
+    """
+    Warn about the datasets of a multi-disease query that failed or came back empty.
+    :param failures: Dictionary dataset name -> exception.
+    :param total: Number of queried datasets.
+    :param stacklevel: Passed to warnings.warn.
+    """
+    if failures:
+        warnings.warn("No data for " + str(len(failures)) + " of " + str(total) + " datasets: " +
+                      "; ".join(str(disease) + " (" + str(error) + ")" for disease, error in failures.items()),
+                      PartialResultWarning, stacklevel=stacklevel + 1)
+
+
+def answer_locally(endpoint, params=None):
+    """
+    Answer a request without the API if a local backend is switched on (config.backend = "replica").
+    :param endpoint: Path of the endpoint relative to config.api_url_base.
+    :param params: Dictionary of query parameters as built by the endpoint function.
+    :return: A pandas dataframe or None if the request has to be sent to the API.
+    """
+    if config.backend == "replica":
+        import spongeWebPy.replica as replica
+        if endpoint in replica.TABLES:
+            return replica.query(endpoint, params)
+    elif config.backend != "api":
+        raise ValueError("config.backend: " + str(config.backend) + " is not an allowed value. "
+                         "Possible values are 'api' and 'replica'.")
+    return None
+
+
+def finish_frame(data, compact=None):
+    """
+    Apply the output options of an endpoint function to its result.
+    :param data: The pandas dataframe of the request or None.
+    :param compact: Return memory-compact column types. Default (None) follows config.compact.
+    :return: The pandas dataframe handed to the caller.
+    """
+    if compact is None:
+        compact = config.compact
+    if compact and data is not None:
+        data = decoding.compact_frame(data)
+    return data
+
+
+def _send(endpoint, params, empty_status):
+    # concurrent identical requests share one call to the API
+    return singleflight.run(endpoint, params, lambda: _fetch(endpoint, params, empty_status))
+
+
+def _fetch(endpoint, params, empty_status):
+    with metrics.request(endpoint, params):
+        data = _fetch_recorded(endpoint, params, empty_status)
+        if data is not None:
+            metrics.add_count("rows", len(data))
+        return data
+
+
+def _fetch_recorded(endpoint, params, empty_status):
+    data = lookup_result(endpoint, params, empty_status)
+    if data is not None:
+        return data
+
+    headers, stale = conditional_headers(endpoint, params)
+    response = send_with_retries(endpoint, params, headers)
+    return finish_request(endpoint, params, response.status_code, response.content, empty_status, response.headers,
+                          stale)
+
+
+def send_with_retries(endpoint, params=None, headers=None, stream=False):
+    """
+    Send a GET request to the API within the rate limit and the adaptive concurrency limit (see spongeWebPy.throttle)
+    and retry connection errors and overloaded answers (config.retry_statuses) with backoff. Phases, transfer and
+    retries are counted for the request recorded in this thread (see metrics.request).
+    :param endpoint: Path of the endpoint relative to config.api_url_base.
+    :param params: Dictionary of query parameters of a single request.
+    :param headers: Additional request headers, e.g. for a conditional request.
+    :param stream: If True, return as soon as the headers arrived and leave reading the body to the caller.
+    :return: The requests.Response of the last attempt. The error of the last attempt is raised if it failed to
+             connect.
+    """
+    api_url = '{0}{1}'.format(config.api_url_base, endpoint)
+    attempt = 0
+    while True:
+        time.sleep(throttle.rate_delay())
+        controller = throttle.controller()
+        ticket = controller.acquire()
+        response = None
+        success = None
+        try:
+            start = time.perf_counter()
+            response = get_session().get(api_url, params=params, headers=headers, timeout=config.timeout,
+                                         stream=stream)
+            # requests measures the time until the headers arrived, the rest was spent on the body
+            ttfb = response.elapsed.total_seconds()
+            metrics.add_phase("ttfb", ttfb)
+            if not stream:
+                metrics.add_phase("download", max(time.perf_counter() - start - ttfb, 0.0))
+                # urllib3 decompresses while reading, tell() is the number of bytes that came over the wire
+                count_transfer(response.content, response.raw.tell())
+            metrics.set_source("api", response.status_code)
+            success = not throttle.should_retry(response.status_code)
+        except RETRIED_ERRORS:
+            success = False
+            throttle.count("errors")
+            if attempt >= config.max_retries:
+                raise
+        finally:
+            # a streamed body is read at the pace of the caller, the slot is only held until the headers arrived
+            controller.release(ticket, success)
+
+        retry_after = None
+        if response is not None:
+            if not success:
+                throttle.count("throttled")
+            if success or attempt >= config.max_retries:
+                return response
+            retry_after = response.headers.get("Retry-After")
+            response.close()
+        throttle.count("retries")
+        metrics.add_count("retries")
+        time.sleep(throttle.backoff(attempt, retry_after))
+        attempt += 1
+
+
+def split_params(params, endpoint=None):
+    """
+    Turn the query parameters of an endpoint function into the parameters of one or more requests.
+    List type parameters (e.g. ensg_number or sample_ID) are joined by commas. Lists longer than config.chunk_size
+    are split into chunks first, so that the URL stays within the limits of the server, and one request is built
+    for every combination of chunks. Requests with a limit are never split since their paging would change, neither
+    are requests whose answer depends on the whole list (see WHOLE_LIST_ENDPOINTS, e.g. the interactions between the
+    given genes); those raise a ValueError if their query is longer than config.max_query_length.
+    :param params: Dictionary of query parameters, list type parameters given as lists.
+    :param endpoint: Path of the endpoint relative to config.api_url_base.
+    :return: A list of parameter dictionaries.
+    """
+    if params is None:
+        return [None]
+    params = identifiers.normalize_params(params)
+    lists = [key for key, value in params.items() if isinstance(value, (list, tuple))]
+    whole = _whole_list(endpoint, params)
+    chunked = {}
+    for key in lists:
+        values = list(params[key])
+        if params.get("limit") is None and not whole and len(values) > config.chunk_size:
+            chunked[key] = [values[i:i + config.chunk_size] for i in range(0, len(values), config.chunk_size)]
+        else:
+            chunked[key] = [values]
+
+    chunks = []
+    for combination in itertools.product(*[chunked[key] for key in lists]):
+        chunk = dict(params)
+        for key, values in zip(lists, combination):
+            chunk[key] = ",".join(str(value) for value in values)
+        chunks.append(chunk)
+    if whole and lists:
+        length = len(urlencode([(key, value) for key, value in chunks[0].items() if value is not None]))
+        if length > config.max_query_length:
+            raise ValueError("The identifier lists of " + endpoint + " can not be split into several requests "
+                             "without losing interactions between them, and their query of " + str(length) +
+                             " characters exceeds config.max_query_length (" + str(config.max_query_length) +
+                             "). Please query fewer identifiers.")
+    return chunks
+
+
+def _whole_list(endpoint, params):
+    # whether the answer depends on the whole identifier list
+    if endpoint not in WHOLE_LIST_ENDPOINTS:
+        return False
+    condition = WHOLE_LIST_ENDPOINTS[endpoint]
+    return condition is None or all(str(params.get(key)) == str(value) for key, value in condition.items())
+
+
+def merge_chunks(results):
+    """
+    Combine the answers of the chunked requests of one call into a single dataframe.
+    Rows are kept in chunk order and duplicates (e.g. interactions found through two chunks) are removed.
+    :param results: List with a dataframe, None or an EmptyResponseError per chunk.
+    :return: A pandas dataframe. If every chunk was empty, the error of the first chunk is raised.
+    """
+    frames = [result for result in results if isinstance(result, pandas.DataFrame)]
+    if not frames:
+        errors = [result for result in results if isinstance(result, EmptyResponseError)]
+        if errors:
+            raise errors[0]
+        return None
+    data = pandas.concat(frames, ignore_index=True)
+    try:
+        duplicated = data.duplicated()
+    except TypeError:
+        # cells holding lists are not hashable, compare their text representation instead
+        duplicated = data.astype(str).duplicated()
+    return data[~duplicated].reset_index(drop=True)
+
+
+def lookup_result(endpoint, params=None, empty_status=404, check_releases=True):
+    """
+    Answer a request from memoized metadata or the persistent cache without contacting the API, possibly from the
+    cached answers of a broader query (see spongeWebPy.planner).
+    :param endpoint: Path of the endpoint relative to config.api_url_base.
+    :param params: Dictionary of query parameters.
+    :param empty_status: Status code the endpoint uses to signal an empty result.
+    :param check_releases: Run a due check for rebuilt datasets first (see config.release_check_interval). The check
+                           sends blocking requests, coroutines run it on a worker thread beforehand instead.
+    :return: A pandas dataframe or None if the request has to be sent.
+    """
+    data = memo.lookup(endpoint, params)
+    if data is not None:
+        metrics.set_source("memo")
+        metrics.add_count("memo_hits")
+        return data
+
+    if config.cache_enabled:
+        if check_releases and config.release_check_interval is not None:
+            import spongeWebPy.releases as releases
+            releases.check_if_due()
+        content = cache.lookup(endpoint, params)
+        if content is not None:
+            metrics.set_source("cache", 200)
+            metrics.add_count("cache_hits")
+            data = build_frame(200, content, empty_status)
+            memo.store(endpoint, params, data)
+            return data
+
+        import spongeWebPy.planner as planner
+        data = planner.answer(endpoint, params, empty_status)
+        if data is not None:
+            metrics.set_source("subsumed", 200)
+            metrics.add_count("subsumed")
+            if len(data) == 0:
+                metrics.add_count("empty")
+                raise EmptyResponseError("API response is empty. Reason: no cached rows fit the parameters.")
+            return data
+    return None
+
+
+def conditional_headers(endpoint, params=None):
+    """
+    Prepare the revalidation of an expired cache entry whose answer carried an ETag or Last-Modified header.
+    :param endpoint: Path of the endpoint relative to config.api_url_base.
+    :param params: Dictionary of query parameters.
+    :return: A tuple (headers, entry) with the If-None-Match / If-Modified-Since headers to send and the entry as
+             returned by cache.stale_entry, (None, None) if the request is sent unconditionally.
+    """
+    if not (config.cache_enabled and config.cache_revalidate):
+        return None, None
+    entry = cache.stale_entry(endpoint, params)
+    if entry is None:
+        return None, None
+    headers = {}
+    if entry[1] is not None:
+        headers["If-None-Match"] = entry[1]
+    if entry[2] is not None:
+        headers["If-Modified-Since"] = entry[2]
+    return headers, entry
+
+
+def count_transfer(content, wire_bytes):
+    """
+    Count the size of a response body in the metrics of the current request.
+    :param content: The decompressed response body as bytes.
+    :param wire_bytes: Number of bytes that were transferred for it, smaller than the body if it was compressed.
+    """
+    metrics.add_count("bytes", len(content))
+    metrics.add_count("wire_bytes", wire_bytes)
+    metrics.add_count("bytes_saved", max(len(content) - wire_bytes, 0))
+
+
+def finish_request(endpoint, params, status_code, content, empty_status=404, headers=None, stale=None):
+    """
+    Convert the answer of a request that was sent to the API and remember it in the caches.
+    :param endpoint: Path of the endpoint relative to config.api_url_base.
+    :param params: Dictionary of query parameters.
+    :param status_code: HTTP status code of the answer.
+    :param content: Raw response body as bytes.
+    :param empty_status: Status code the endpoint uses to signal an empty result.
+    :param headers: Response headers, their ETag and Last-Modified values are stored with the cached body.
+    :param stale: The cache entry a conditional request was sent for (see conditional_headers) or None.
+    :return: A pandas dataframe with the normalized JSON answer.
+    """
+    revalidated = status_code == 304 and stale is not None
+    if revalidated:
+        # the expired entry is still current, the server did not send the body again
+        cache.refresh(endpoint, params)
+        metrics.add_count("revalidated")
+        metrics.add_count("bytes_saved", len(stale[0]))
+        status_code, content = 200, stale[0]
+    # only bodies that could be decoded are cached, a truncated answer or a proxy page is not replayed
+    data = build_frame(status_code, content, empty_status)
+    if status_code == 200:
+        if config.cache_enabled and not revalidated:
+            if headers is None:
+                cache.store(endpoint, params, content)
+            else:
+                cache.store(endpoint, params, content, headers.get("ETag"), headers.get("Last-Modified"))
+        memo.store(endpoint, params, data)
+        identifiers.learn(data)
+    return data
+
+
+def build_frame(status_code, content, empty_status=404):
+    """
+    Convert the raw body of an API answer into a dataframe.
+    :param status_code: HTTP status code of the answer.
+    :param content: Raw response body as bytes.
+    :param empty_status: Status code the endpoint uses to signal an empty result.
+    :return: A pandas dataframe with the normalized JSON answer. Raises EmptyResponseError if the status is
+             empty_status and APIError for any other status or a body that is not JSON.
+    """
+    try:
+        with metrics.timed("decode"):
+            json_dicts = decoding.loads(content)
+    except ValueError:
+        # e.g. the HTML error page of a proxy
+        raise APIError("API response with status " + str(status_code) + " is not valid JSON: " +
+                       content[:200].decode("utf-8", "replace"), status_code)
+
+    if status_code == 200:
+        with metrics.timed("frame"):
+            return decoding.records_to_frame(json_dicts)
+    if isinstance(json_dicts, dict) and "detail" in json_dicts:
+        reason = str(json_dicts["detail"])
+    else:
+        reason = str(json_dicts)[:200]
+    if status_code == empty_status:
+        metrics.add_count("empty")
+        raise EmptyResponseError("API response is empty. Reason: " + reason)
+    raise APIError("API request failed with status " + str(status_code) + ". Reason: " + reason, status_code)
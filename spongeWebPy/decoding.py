@@ -0,0 +1,201 @@
+"""
+Decode API answers into dataframes
+
+The raw response body is parsed once, with orjson if it is installed, and the nested records are turned into
+columns directly. The column layout (e.g. gene1.ensg_number, gene1.gene_symbol, ...) is taken from the first record
+and every other record must have the same keys on every level; answers that do not share one layout fall back to
+pandas.json_normalize, which gives the same result more slowly. ArrayDecoder parses an answer incrementally while
+it arrives, for the streaming functions.
+"""
+import codecs
+import json
+import re
+
+import pandas
+from pandas import json_normalize
+from pandas.api import types
+
+# local import
+import spongeWebPy.config as config
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_whitespace = re.compile(r"[ \t\n\r]*")
+# characters that can follow an element of an array
+_ends = frozenset(",] \t\n\r")
+
+
+def loads(content):
+    """
+    Parse a raw JSON response body.
+    :param content: Response body as bytes.
+    :return: The decoded JSON document.
+    """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+class ArrayDecoder:
+    """
+    Incremental parser of a JSON array, e.g. a response body that is read piece by piece.
+    Elements are returned as soon as their last byte was fed, only the unparsed rest of the input is kept.
+    A document that is not an array (e.g. a single object) is kept as a whole and returned by close().
+    """
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        # "start", "first" (after "["), "value" (after ","), "separator", "end" or "document"
+        self._state = "start"
+        # number of bytes fed so far
+        self.size = 0
+
+    def feed(self, data):
+        """
+        Parse the next piece of the input.
+        :param data: Bytes following the previously fed ones.
+        :return: A list of the elements completed by this piece.
+        """
+        self.size += len(data)
+        self._buffer += self._text.decode(data)
+        return self._parse(False)
+
+    def close(self):
+        """
+        Finish parsing after the last piece of the input was fed.
+        :return: A list of the remaining elements. Raises ValueError if the input is not complete, valid JSON.
+        """
+        self._buffer += self._text.decode(b"", True)
+        elements = self._parse(True)
+        if self._state == "document":
+            document = json.loads(self._buffer)
+            self._buffer = ""
+            self._state = "end"
+            return document if isinstance(document, list) else [document]
+        if self._state != "end":
+            raise ValueError("Incomplete JSON array after " + str(self.size) + " bytes.")
+        return elements
+
+    def _parse(self, final):
+        elements = []
+        buffer = self._buffer
+        length = len(buffer)
+        position = 0
+        while self._state != "document":
+            position = _whitespace.match(buffer, position).end()
+            if position == length:
+                break
+            if self._state == "start":
+                if buffer[position] != "[":
+                    self._state = "document"
+                    break
+                self._state = "first"
+                position += 1
+            elif self._state == "first" and buffer[position] == "]":
+                self._state = "end"
+                position += 1
+            elif self._state in ("first", "value"):
+                try:
+                    element, end = self._decoder.raw_decode(buffer, position)
+                except ValueError:
+                    # the element is not complete yet
+                    if final:
+                        raise
+                    break
+                if not final and type(element) not in (dict, list) and (end == length or buffer[end] not in _ends):
+                    # a number might continue in the next piece
+                    break
+                elements.append(element)
+                position = end
+                self._state = "separator"
+            elif self._state == "separator" and buffer[position] in ",]":
+                self._state = "value" if buffer[position] == "," else "end"
+                position += 1
+            else:
+                raise ValueError("Unexpected " + repr(buffer[position]) + " in JSON array.")
+        self._buffer = buffer[position:]
+        return elements
+
+
+def records_to_frame(records):
+    """
+    Flatten decoded JSON records into a dataframe, equivalent to pandas.json_normalize(records).
+    :param records: Decoded JSON document, usually a list of (nested) dictionaries.
+    :return: A pandas dataframe with one column per leaf, nested keys joined by ".".
+    """
+    if not isinstance(records, list) or not records or type(records[0]) is not dict:
+        return json_normalize(records)
+
+    layout = _layout(records[0])
+    # like json_normalize, the top level leaves come first, followed by the flattened nested dictionaries
+    leaves = tuple(item for item in layout if item[1] is None)
+    nested = tuple(item for item in layout if item[1] is not None)
+    columns = {}
+    try:
+        if not all(len(record) == len(layout) for record in records):
+            return json_normalize(records)
+        if not (_extract(records, leaves, (), columns) and _extract(records, nested, (), columns)):
+            return json_normalize(records)
+    except (KeyError, TypeError):
+        # a record misses a key or holds something else than a dictionary where the first one has one
+        return json_normalize(records)
+    if not columns:
+        return json_normalize(records)
+    return pandas.DataFrame(columns, columns=list(columns))
+
+
+def _layout(record):
+    # nested (key, sub layout) tuples, sub layout is None for leaves
+    return tuple((key, _layout(value) if type(value) is dict else None) for key, value in record.items())
+
+
+def _extract(records, layout, prefix, columns):
+    for key, sub_layout in layout:
+        values = [record[key] for record in records]
+        if sub_layout is None:
+            # a leaf that is null in the first record might hold a dictionary elsewhere
+            if values[0] is None and any(type(value) is dict for value in values):
+                return False
+            columns[".".join(prefix + (key,))] = values
+        else:
+            if not all(len(value) == len(sub_layout) for value in values):
+                return False
+            if not _extract(values, sub_layout, prefix + (key,), columns):
+                return False
+    return True
+
+
+def compact_frame(data):
+    """
+    Convert a dataframe to memory-compact column types:
+    repeated strings (e.g. disease_name, gene_type, gene_symbol, ensg_number) become categoricals, which store one
+    small integer code per row, floating point statistics (e.g. p_value, mscor, correlation) become float32 and
+    integer columns are downcast to the smallest integer type holding their values.
+    Note that float32 cannot represent p-values below about 1e-45, these become 0.
+    :param data: A pandas dataframe as returned by the endpoint functions.
+    :return: A new pandas dataframe with the same values and compact column types.
+    """
+    columns = {}
+    for column in data.columns:
+        values = data[column]
+        if types.is_bool_dtype(values.dtype):
+            pass
+        elif types.is_float_dtype(values.dtype):
+            values = values.astype("float32")
+        elif types.is_integer_dtype(values.dtype):
+            values = pandas.to_numeric(values, downcast="integer")
+        elif types.is_object_dtype(values.dtype) or types.is_string_dtype(values.dtype):
+            try:
+                repeated = values.nunique(dropna=False) <= config.compact_max_unique_ratio * len(values)
+            except TypeError:
+                # cells holding lists are left as they are
+                repeated = False
+            if repeated or column.rsplit(".", 1)[-1] in config.compact_categorical_columns:
+                values = values.astype("category")
+        columns[column] = values
+    return pandas.DataFrame(columns, index=data.index)
@@ -0,0 +1,134 @@
+"""
+Stream complete ceRNA networks into a partitioned Parquet dataset
+"""
+import os
+from urllib.parse import quote
+
+import pandas
+
+# local import
+from spongeWebPy.all_ceRNAInteraction import iter_all_ceRNAInteractions
+
+# Parquet types of the interaction columns by the last part of their flattened name; all other columns are typed from
+# their values with promoted types (see _schema), so that every row group of a file has the same schema even if a page
+# holds only missing values in a column or integers turn into floats
+COLUMN_TYPES = {"correlation": "float64", "mscor": "float64", "p_value": "float64", "start_pos": "int64",
+                "end_pos": "int64", "run_ID": "int64", "dataset_ID": "int64", "chromosome_name": "string",
+                "description": "string", "ensg_number": "string", "gene_symbol": "string", "gene_type": "string",
+                "data_origin": "string", "disease_name": "string", "disease_type": "string"}
+# partition of rows without a dataset name, the name Hive and pyarrow read as a missing value
+MISSING_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+
+def export_ceRNAInteractions(path,
+                             disease_name=None,
+                             compression="snappy",
+                             row_group_size=100000,
+                             page_size=1000,
+                             concurrency=1,
+                             **params):
+    """
+    Download all ceRNA interactions fitting the parameters and write them page by page into a Parquet dataset
+    partitioned by disease_name (one directory disease_name=<name> per dataset). Pages are only buffered until
+    row_group_size rows of a dataset are collected, so peak memory does not depend on the size of the network.
+    Requires the optional dependency pyarrow (pip install spongeWebPy[parquet]).
+    :param path: Directory of the Parquet dataset. Existing files of the exported datasets are overwritten.
+    :param disease_name: The name of the dataset of interest as string.
+                         If default (None) is set, the interactions of all available datasets are exported.
+                         Fuzzy search is available (e.g. "kidney clear cell carcinoma" or just "kidney").
+                         A list of names exports these datasets one after the other.
+    :param compression: Parquet compression codec, e.g. "snappy" (default), "zstd", "gzip", "lz4", "brotli" or "none".
+    :param row_group_size: Number of rows written per Parquet row group and dataset.
+    :param page_size: Number of interactions per request. Can be up to 1000.
+    :param concurrency: Number of page requests kept in flight at the same time.
+    :param params: Further filter parameters of get_all_ceRNAInteractions (e.g. pValue, mscor, gene_type).
+    :return: A list with the paths of the written Parquet files.
+    :example: export_ceRNAInteractions("networks", disease_name = "kidney clear cell carcinoma",
+                                       compression = "zstd", concurrency = 4)
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet as parquet
+    except ImportError:
+        raise ImportError("export_ceRNAInteractions requires pyarrow. Please install it with "
+                          "'pip install spongeWebPy[parquet]'.")
+
+    writers = {}
+    buffers = {}
+    paths = []
+
+    def flush(partition):
+        frames = buffers.pop(partition)
+        data = frames[0] if len(frames) == 1 else pandas.concat(frames, ignore_index=True)
+        writer = writers.get(partition)
+        if writer is None:
+            directory = os.path.join(path, "disease_name=" + quote(str(partition), safe=""))
+            os.makedirs(directory, exist_ok=True)
+            file_path = os.path.join(directory, "part-0.parquet")
+            writer = parquet.ParquetWriter(file_path, _schema(pyarrow, data), compression=compression)
+            writers[partition] = writer
+            paths.append(file_path)
+        writer.write_table(_table(pyarrow, data, writer.schema), row_group_size=row_group_size)
+
+    try:
+        for page in iter_all_ceRNAInteractions(page_size=page_size, concurrency=concurrency,
+                                               disease_name=disease_name, **params):
+            column = _disease_column(page)
+            # groupby drops missing keys (dropna=False needs pandas 1.1)
+            for partition, rows in page.groupby(page[column].fillna(MISSING_PARTITION), sort=False):
+                buffers.setdefault(partition, []).append(rows)
+                if sum(len(frame) for frame in buffers[partition]) >= row_group_size:
+                    flush(partition)
+        for partition in list(buffers):
+            flush(partition)
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    return paths
+
+
+def _disease_column(data):
+    # the dataset name is nested in the interaction records (e.g. run.dataset.disease_name)
+    for column in data.columns:
+        if column == "disease_name" or column.endswith(".disease_name"):
+            return column
+    raise ValueError("The interactions do not contain a disease_name column to partition by.")
+
+
+def _schema(pyarrow, data):
+    # the schema of a file, from the column layout and the first rows written
+    fields = []
+    for column in data.columns:
+        name = column.rsplit(".", 1)[-1]
+        if name in COLUMN_TYPES:
+            kind = pyarrow.type_for_alias(COLUMN_TYPES[name])
+        else:
+            inferred = pandas.api.types.infer_dtype(data[column], skipna=True)
+            if inferred == "boolean":
+                kind = pyarrow.bool_()
+            elif inferred in ("integer", "floating", "mixed-integer-float", "decimal"):
+                # integers turn into floats as soon as a value is missing
+                kind = pyarrow.float64()
+            elif inferred in ("string", "empty"):
+                kind = pyarrow.string()
+            else:
+                kind = pyarrow.array(data[column], from_pandas=True).type
+                if pyarrow.types.is_null(kind):
+                    kind = pyarrow.string()
+        fields.append(pyarrow.field(column, kind))
+    return pyarrow.schema(fields)
+
+
+def _table(pyarrow, data, schema):
+    # converts the rows to the schema of their file, columns missing in these rows are left empty
+    unknown = [column for column in data.columns if column not in schema.names]
+    if unknown:
+        raise ValueError("The interactions hold columns that are missing in the first rows of their dataset: " +
+                         ", ".join(unknown) + ".")
+    data = data.reindex(columns=schema.names)
+    for field in schema:
+        if pyarrow.types.is_string(field.type):
+            values = data[field.name]
+            data[field.name] = values.astype(str).where(values.notna(), None)
+    return pyarrow.Table.from_pandas(data, schema=schema, preserve_index=False)
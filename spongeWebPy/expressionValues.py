@@ -1,18 +1,18 @@
-import json
-import requests
-from pandas import json_normalize
-
 #local import
-import spongeWebPy.config as config
+import spongeWebPy.connection as connection
+import spongeWebPy.streaming as streaming
 
-def get_geneExprValues(disease_name, ensg_number = None, gene_symbol = None):
+def get_geneExprValues(disease_name, ensg_number = None, gene_symbol = None, compact = None):
     """
     Get all expression values for gene(s) of interest.
     :param disease_name: The name of the dataset of interest as string.
                          If default (None) is set, all available datasets with corresponding information are shown.
                          Fuzzy search is available (e.g. "kidney clear cell carcinoma" or just "kidney").
+                         A list of names queries all of these datasets concurrently and adds a "disease" column.
     :param ensg_number: A list of ensg number(s). If ensg_number is set, gene_symbol must be None.
     :param gene_symbol: A list of gene symbol(s). If gene_symbol is set, ensg_number must be None.
+    :param compact: If True, return memory-compact column types: categoricals for repeated identifiers, float32 for
+                    statistics and small integer types. Default (None) follows config.compact.
     :return: A pandas dataframe with gene expression values. If empty return value will be the reason for failure.
     :example: get_geneExprValues(disease_name = "kidney clear cell carcinoma",
                     ensg_number = ["ENSG00000259090","ENSG00000217289"])
@@ -21,32 +21,24 @@ def get_geneExprValues(disease_name, ensg_number = None, gene_symbol = None):
 
     # Add list type parameters
     if ensg_number is not None:
-        params.update({"ensg_number": ",".join(ensg_number)})
+        params.update({"ensg_number": ensg_number})
     if gene_symbol is not None:
-        params.update({"gene_symbol": ",".join(gene_symbol)})
-
-    api_url = '{0}exprValue/getceRNA'.format(config.api_url_base)
-
-    response = requests.get(api_url, headers=config.headers, params=params)
+        params.update({"gene_symbol": gene_symbol})
 
-    json_dicts = json.loads(response.content.decode('utf-8'))
-    data = json_normalize(json_dicts)
+    return connection.api_request('exprValue/getceRNA', params, compact=compact)
 
-    if response.status_code == 200:
-        return data
-    else:
-        if response.status_code == 404:
-            raise ValueError("API response is empty. Reason: " + data["detail"].values)
 
-
-def get_mirnaExprValues(disease_name, mimat_number = None, hs_number = None):
+def get_mirnaExprValues(disease_name, mimat_number = None, hs_number = None, compact = None):
     """
     Get all expression values for miRNA(s) of interest.
     :param disease_name: The name of the dataset of interest as string.
                          If default (None) is set, all available datasets with corresponding information are shown.
                          Fuzzy search is available (e.g. "kidney clear cell carcinoma" or just "kidney").
+                         A list of names queries all of these datasets concurrently and adds a "disease" column.
     :param mimat_number: A list of mimat_number(s). If mimat_number is set, hs_number must be None.
     :param hs_number: A list of hs_number(s). If hs_number is set, mimat_number must be None.
+    :param compact: If True, return memory-compact column types: categoricals for repeated identifiers, float32 for
+                    statistics and small integer types. Default (None) follows config.compact.
     :return: A pandas dataframe with gene mirna values. If empty return value will be the reason for failure.
     :example: get_mirnaExprValues(disease_name = "kidney clear cell carcinoma",
                      mimat_number = ["MIMAT0000076", "MIMAT0000261"])
@@ -55,19 +47,36 @@ def get_mirnaExprValues(disease_name, mimat_number = None, hs_number = None):
 
     # Add list type parameters
     if mimat_number is not None:
-        params.update({"mimat_number": ",".join(mimat_number)})
+        params.update({"mimat_number": mimat_number})
     if hs_number is not None:
-        params.update({"hs_number": ",".join(hs_number)})
+        params.update({"hs_number": hs_number})
 
-    api_url = '{0}exprValue/getmirNA'.format(config.api_url_base)
+    return connection.api_request('exprValue/getmirNA', params, compact=compact)
 
-    response = requests.get(api_url, headers=config.headers, params=params)
 
-    json_dicts = json.loads(response.content.decode('utf-8'))
-    data = json_normalize(json_dicts)
+def stream_geneExprValues(disease_name, ensg_number = None, gene_symbol = None, chunk_size = None, compact = None):
+    """
+    Stream the expression values for gene(s) of interest in chunks, parsed while the answer arrives, so that a full
+    cohort can be processed with memory proportional to the chunk size.
+    Parameters as for get_geneExprValues, plus:
+    :param chunk_size: Maximal number of rows per chunk. Default (None) follows config.stream_chunk_size.
+    :return: A generator yielding pandas dataframes with at most chunk_size rows each.
+    :example: for chunk in stream_geneExprValues(disease_name = "kidney clear cell carcinoma", chunk_size = 50000):
+                  print(chunk.shape)
+    """
+    return streaming.iter_chunks(get_geneExprValues, disease_name, ensg_number=ensg_number, gene_symbol=gene_symbol,
+                                 chunk_size=chunk_size, compact=compact)
+
 
-    if response.status_code == 200:
-        return data
-    else:
-        if response.status_code == 404:
-            raise ValueError("API response is empty. Reason: " + data["detail"].values)
\ No newline at end of file
+def stream_mirnaExprValues(disease_name, mimat_number = None, hs_number = None, chunk_size = None, compact = None):
+    """
+    Stream the expression values for miRNA(s) of interest in chunks, parsed while the answer arrives, so that a full
+    cohort can be processed with memory proportional to the chunk size.
+    Parameters as for get_mirnaExprValues, plus:
+    :param chunk_size: Maximal number of rows per chunk. Default (None) follows config.stream_chunk_size.
+    :return: A generator yielding pandas dataframes with at most chunk_size rows each.
+    :example: for chunk in stream_mirnaExprValues(disease_name = "kidney clear cell carcinoma", chunk_size = 50000):
+                  print(chunk.shape)
+    """
+    return streaming.iter_chunks(get_mirnaExprValues, disease_name, mimat_number=mimat_number, hs_number=hs_number,
+                                 chunk_size=chunk_size, compact=compact)
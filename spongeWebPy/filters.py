@@ -0,0 +1,183 @@
+"""
+Filter semantics of the query endpoints
+
+Describes how the parameters of the interaction and ceRNA endpoints restrict and order their results, so that
+queries can be answered locally (see spongeWebPy.replica). Columns are referred to by the last part of their
+flattened name, e.g. "ensg_number" matches both gene1.ensg_number and gene2.ensg_number, and a row fits an
+identifier filter if any of the matching columns holds one of the identifiers. apply() evaluates the same semantics
+on a dataframe and subsumes() decides whether the rows of one query include those of another (see
+spongeWebPy.planner).
+"""
+import numpy
+import pandas
+
+# per endpoint:
+#   match: parameter -> (column suffix, "like" for fuzzy text search, "in" for identifier lists or "eq")
+#   thresholds: parameter -> (column suffix, direction parameter or fixed comparison operator)
+#   sorting: value of the sorting parameter -> column suffix
+#   paged: whether the server applies a default limit to requests without one
+ENDPOINTS = {
+    "ceRNAInteraction/findAll": {
+        "match": {"disease_name": ("disease_name", "like"),
+                  "ensg_number": ("ensg_number", "in"),
+                  "gene_symbol": ("gene_symbol", "in"),
+                  "gene_type": ("gene_type", "eq")},
+        "thresholds": {"pValue": ("p_value", "pValueDirection"),
+                       "mscor": ("mscor", "mscorDirection"),
+                       "correlation": ("correlation", "correlationDirection")},
+        "sorting": {"pValue": "p_value", "mscor": "mscor", "correlation": "correlation"},
+        "paged": True,
+    },
+    "findceRNA": {
+        "match": {"disease_name": ("disease_name", "like"),
+                  "ensg_number": ("ensg_number", "in"),
+                  "gene_symbol": ("gene_symbol", "in"),
+                  "gene_type": ("gene_type", "eq")},
+        "thresholds": {"minBetweenness": ("betweenness", ">"),
+                       "minNodeDegree": ("node_degree", ">"),
+                       "minEigenvector": ("eigenvector", ">")},
+        "sorting": {"degree": "node_degree", "betweenness": "betweenness", "eigenvector": "eigenvector"},
+        "paged": True,
+    },
+    "miRNAInteraction/findSpecific": {
+        "match": {"disease_name": ("disease_name", "like"),
+                  "mimat_number": ("mir_ID", "in"),
+                  "hs_number": ("hs_nr", "in")},
+        "thresholds": {"pValue": ("p_value", "pValueDirection"),
+                       "mscor": ("mscor", "mscorDirection"),
+                       "correlation": ("correlation", "correlationDirection")},
+        "sorting": {"pValue": "p_value", "mscor": "mscor", "correlation": "correlation"},
+        "paged": True,
+    },
+}
+
+# parameters that do not filter rows
+PAGING = ("sorting", "descending", "limit", "offset", "information")
+
+
+def unsupported(endpoint, params):
+    """
+    List the parameters of a request whose meaning is not described here.
+    :param endpoint: Path of the endpoint relative to config.api_url_base.
+    :param params: Dictionary of query parameters.
+    :return: A list of parameter names, empty if the request can be answered locally.
+    """
+    spec = ENDPOINTS[endpoint]
+    known = set(spec["match"]) | set(spec["thresholds"]) | set(PAGING)
+    known |= {direction for _, direction in spec["thresholds"].values() if direction not in ("<", ">")}
+    return sorted(key for key, value in (params or {}).items() if value is not None and key not in known)
+
+
+def columns(names, suffix):
+    """
+    Select the columns referred to by a column suffix.
+    :param names: Column names of a result table.
+    :param suffix: Last part of the flattened column name, e.g. "ensg_number".
+    :return: A list of the matching column names.
+    """
+    return [name for name in names if name == suffix or name.endswith("." + suffix)]
+
+
+def identifiers(value):
+    """
+    Turn the value of an identifier parameter (list or comma separated string) into a list.
+    """
+    if isinstance(value, (list, tuple)):
+        return [str(item) for item in value]
+    return [item for item in str(value).split(",") if item]
+
+
+def threshold_operator(spec_direction, params):
+    """
+    Comparison operator of a threshold, either fixed or taken from its direction parameter.
+    """
+    if spec_direction in ("<", ">"):
+        return spec_direction
+    operator = params.get(spec_direction) or "<"
+    if operator not in ("<", ">"):
+        raise ValueError(spec_direction + ": " + str(operator) + " is not an allowed value.")
+    return operator
+
+
+def apply(endpoint, data, params):
+    """
+    Filter, sort and page a result table like the API (and spongeWebPy.replica) would.
+    :param endpoint: Path of the endpoint relative to config.api_url_base (one of ENDPOINTS).
+    :param data: A pandas dataframe with the columns of the API answer.
+    :param params: Dictionary of query parameters.
+    :return: A new pandas dataframe with a fresh index. Rows with equal sort values keep their order in data.
+    """
+    spec = ENDPOINTS[endpoint]
+    names = list(data.columns)
+    keep = numpy.ones(len(data), dtype=bool)
+    for key, (suffix, kind) in spec["match"].items():
+        value = params.get(key)
+        if value is None:
+            continue
+        fits = numpy.zeros(len(data), dtype=bool)
+        for column in columns(names, suffix):
+            text = data[column].astype(str)
+            if kind == "like":
+                fits |= text.str.contains(str(value), case=False, regex=False).to_numpy(dtype=bool)
+            elif kind == "in":
+                fits |= text.isin(identifiers(value)).to_numpy(dtype=bool)
+            else:
+                fits |= (text == str(value)).to_numpy(dtype=bool)
+        keep &= fits
+    for key, (suffix, direction) in spec["thresholds"].items():
+        value = params.get(key)
+        if value is None:
+            continue
+        operator = threshold_operator(direction, params)
+        for column in columns(names, suffix):
+            values = pandas.to_numeric(data[column], errors="coerce").to_numpy(dtype=numpy.float64)
+            # NaN compares False like NULL in SQL
+            keep &= values < float(value) if operator == "<" else values > float(value)
+
+    result = data[keep]
+    if params.get("sorting") is not None:
+        order = columns(names, spec["sorting"][params["sorting"]])
+        if order:
+            result = result.sort_values(order, ascending=str(params.get("descending")) == "False", kind="stable")
+    offset = int(params.get("offset") or 0)
+    limit = params.get("limit")
+    result = result.iloc[offset:] if limit is None else result.iloc[offset:offset + int(limit)]
+    return result.reset_index(drop=True)
+
+
+def subsumes(endpoint, broader, narrower):
+    """
+    Whether every row fitting the filters of one query fits those of another. Paging parameters are ignored.
+    :param endpoint: Path of the endpoint relative to config.api_url_base (one of ENDPOINTS).
+    :param broader: Dictionary of query parameters of the query that may hold more rows.
+    :param narrower: Dictionary of query parameters of the query that may hold fewer rows.
+    :return: True if the rows of narrower are a subset of the rows of broader.
+    """
+    spec = ENDPOINTS[endpoint]
+    for key, (_, kind) in spec["match"].items():
+        wide, narrow = broader.get(key), narrower.get(key)
+        if wide is None:
+            continue
+        if narrow is None:
+            return False
+        if kind == "in":
+            if not set(identifiers(narrow)) <= set(identifiers(wide)):
+                return False
+        elif kind == "like":
+            # fuzzy search on the server, only the same search term is known to match the same datasets
+            if str(narrow).lower() != str(wide).lower():
+                return False
+        elif str(narrow) != str(wide):
+            return False
+    for key, (_, direction) in spec["thresholds"].items():
+        wide, narrow = broader.get(key), narrower.get(key)
+        if wide is None:
+            continue
+        if narrow is None:
+            return False
+        operator = threshold_operator(direction, broader)
+        if operator != threshold_operator(direction, narrower):
+            return False
+        if float(narrow) > float(wide) if operator == "<" else float(narrow) < float(wide):
+            return False
+    return True
@@ -1,9 +1,5 @@
-import json
-import requests
-from pandas import json_normalize
-
 # local import
-import spongeWebPy.config as config
+import spongeWebPy.connection as connection
 
 def get_hallmark(gene_symbol):
     """
@@ -17,17 +13,6 @@ def get_hallmark(gene_symbol):
 
     # Add list type parameters
     if gene_symbol is not None:
-        params.update({"gene_symbol": ",".join(gene_symbol)})
-
-    api_url = '{0}getHallmark'.format(config.api_url_base)
-
-    response = requests.get(api_url, headers=config.headers, params=params)
-
-    json_dicts = json.loads(response.content.decode('utf-8'))
-    data = json_normalize(json_dicts)
+        params.update({"gene_symbol": gene_symbol})
 
-    if response.status_code == 200:
-        return data
-    else:
-        if response.status_code == 202:
-            raise ValueError("API response is empty. Reason: " + data["detail"].values)
\ No newline at end of file
+    return connection.api_request('getHallmark', params, empty_status=202)
\ No newline at end of file
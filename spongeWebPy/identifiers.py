@@ -0,0 +1,335 @@
+"""
+Local index of gene and miRNA identifiers
+
+Every answer that holds genes (ensg_number and gene_symbol) or miRNAs (mir_ID and hs_nr) teaches the index the
+pairs it has not seen yet; sync_identifiers() fills it for a whole dataset at once. With the response cache switched
+on, the pairs are stored in the cache database and known in later sessions as well. Lookups are dictionary lookups
+that ignore case, except for hs numbers, whose case tells apart e.g. the precursor hsa-mir-21 and the mature
+hsa-miR-21-5p. The translation functions work on whole lists at once.
+
+With config.normalize_identifiers = True (off by default), identifier lists are normalized with the index before a
+request is sent: duplicates are removed, the spelling of known identifiers is corrected (e.g. "pten" -> "PTEN") and
+identifiers given in the wrong list (a gene symbol as ensg_number or vice versa) are translated. A gene symbol of
+several ensg numbers is not translated but raises an AmbiguousIdentifierError.
+"""
+import re
+import threading
+
+import numpy
+import pandas
+
+# local import
+import spongeWebPy.cache as cache
+import spongeWebPy.config as config
+
+# kind -> (key parameter, value parameter) of the endpoint functions
+PARAMETERS = {"gene": ("ensg_number", "gene_symbol"), "mirna": ("mimat_number", "hs_number")}
+# kind -> (key column, value column) of the answers, possibly with a prefix such as "gene1."
+COLUMNS = {"gene": ("ensg_number", "gene_symbol"), "mirna": ("mir_ID", "hs_nr")}
+# kinds whose values are matched with their case
+CASE_SENSITIVE_VALUES = {"mirna"}
+
+# version suffix of ensembl identifiers, e.g. ENSG00000171862.10
+_ensembl_version = re.compile(r"^(ENSG\d+)\.\d+$", re.IGNORECASE)
+
+_lock = threading.Lock()
+_index = None
+
+
+class AmbiguousIdentifierError(ValueError):
+    """
+    Raised when an identifier that should be translated into a key belongs to several keys.
+    """
+
+
+class IdentifierIndex:
+    """
+    Bidirectional mapping between ensg numbers and gene symbols and between mimat numbers and hs numbers.
+    Keys and gene symbols are matched in any case, hs numbers only in their exact case.
+    """
+
+    def __init__(self):
+        # kind -> lower case key -> key
+        self._keys = {kind: {} for kind in PARAMETERS}
+        # kind -> matched value (see _fold) -> key, the first key seen for a value
+        self._values = {kind: {} for kind in PARAMETERS}
+        # kind -> matched value -> all keys of values shared by several keys
+        self._ambiguous = {kind: {} for kind in PARAMETERS}
+        # kind -> key -> value
+        self._pairs = {kind: {} for kind in PARAMETERS}
+        self._lock = threading.Lock()
+        # cache databases the stored pairs were loaded from
+        self.loaded = set()
+
+    def __len__(self):
+        return sum(len(pairs) for pairs in self._pairs.values())
+
+    def __repr__(self):
+        return "IdentifierIndex(" + ", ".join(str(len(self._pairs[kind])) + " " + kind + "s"
+                                              for kind in PARAMETERS) + ")"
+
+    def add(self, kind, keys, values):
+        """
+        Add identifier pairs, pairs of known keys are kept.
+        :param kind: "gene" or "mirna".
+        :param keys: Ensg numbers or mimat numbers.
+        :param values: The gene symbols or hs numbers of the keys.
+        :return: A list of the (kind, key, value) tuples that were new.
+        """
+        by_key = self._keys[kind]
+        by_value = self._values[kind]
+        ambiguous = self._ambiguous[kind]
+        pairs = self._pairs[kind]
+        added = []
+        with self._lock:
+            for key, value in zip(keys, values):
+                key = str(key)
+                if key.lower() in by_key:
+                    continue
+                value = str(value)
+                folded = _fold(kind, value)
+                by_key[key.lower()] = key
+                first = by_value.setdefault(folded, key)
+                if first != key:
+                    ambiguous.setdefault(folded, [first]).append(key)
+                pairs[key] = value
+                added.append((kind, key, value))
+        return added
+
+    def pairs(self):
+        """
+        :return: A list of all (kind, key, value) tuples.
+        """
+        with self._lock:
+            return [(kind, key, value) for kind, pairs in self._pairs.items() for key, value in pairs.items()]
+
+    def knows(self, kind, keys):
+        """
+        Whether all keys (missing values aside) are in the index.
+        """
+        by_key = self._keys[kind]
+        # answers spell keys like the index, only the rest needs a case-insensitive check
+        missing = set(keys).difference(self._pairs[kind])
+        return all(key.lower() in by_key for key in missing if isinstance(key, str))
+
+    def key(self, kind, identifier):
+        """
+        The canonical key (ensg or mimat number) of an identifier given as key or value, None if unknown.
+        Raises AmbiguousIdentifierError for a value of several keys.
+        """
+        text = str(identifier).strip()
+        key = self._keys[kind].get(text.lower())
+        if key is not None:
+            return key
+        folded = _fold(kind, text)
+        if folded in self._ambiguous[kind]:
+            raise AmbiguousIdentifierError(text + " belongs to several identifiers: " +
+                                           ", ".join(self._ambiguous[kind][folded]) + ".")
+        return self._values[kind].get(folded)
+
+    def value(self, kind, identifier):
+        """
+        The canonical value (gene symbol or hs number) of an identifier given as key or value, None if unknown.
+        """
+        text = str(identifier).strip()
+        key = self._keys[kind].get(text.lower())
+        if key is None:
+            # any key of an ambiguous value gives its spelling
+            key = self._values[kind].get(_fold(kind, text))
+        return None if key is None else self._pairs[kind][key]
+
+    def translate(self, kind, identifiers, to_key):
+        """
+        Translate many identifiers at once.
+        :param kind: "gene" or "mirna".
+        :param identifiers: A list, numpy array or pandas series of identifiers, given as keys or values.
+        :param to_key: True to return keys (ensg/mimat numbers), False to return values (gene symbols/hs numbers).
+        :return: A numpy object array (a series for a series) with None for unknown identifiers and, if to_key is
+                 set, for values of several keys.
+        """
+        if isinstance(identifiers, pandas.Series):
+            series = identifiers
+        else:
+            series = pandas.Series(list(identifiers), dtype=object)
+        text = series.astype(str).str.strip()
+        lower = text.str.lower()
+        folded = text if kind in CASE_SENSITIVE_VALUES else lower
+        # identifiers given as keys, then those given as values
+        keys = lower.map(self._keys[kind])
+        by_value = folded.map(self._values[kind])
+        if to_key:
+            by_value = by_value.where(~folded.isin(list(self._ambiguous[kind])))
+        keys = keys.where(keys.notna(), by_value)
+        result = keys if to_key else keys.map(self._pairs[kind])
+        result = result.astype(object).where(result.notna(), None)
+        return result if isinstance(identifiers, pandas.Series) else result.to_numpy(dtype=object)
+
+    def normalize(self, kind, identifiers, to_key):
+        """
+        Normalize an identifier list of a request: known identifiers are spelled like in the database and given as
+        keys (to_key True) or values, versions of ensg numbers are removed and duplicates are dropped.
+        :return: A list of identifiers in the original order. Raises AmbiguousIdentifierError if a value of
+                 several keys is given where keys are expected.
+        """
+        normalized = []
+        for identifier in identifiers:
+            text = str(identifier).strip()
+            known = self.key(kind, text) if to_key else self.value(kind, text)
+            if known is None and kind == "gene" and to_key:
+                match = _ensembl_version.match(text)
+                if match:
+                    known = self.key(kind, match.group(1)) or match.group(1).upper()
+            normalized.append(text if known is None else known)
+        return list(dict.fromkeys(normalized))
+
+
+def _fold(kind, value):
+    # the form values are matched in
+    return value if kind in CASE_SENSITIVE_VALUES else value.lower()
+
+
+def index():
+    """
+    Return the identifier index of this process, with the pairs stored in the cache database if the response cache
+    is switched on.
+    """
+    global _index
+    with _lock:
+        if _index is None:
+            _index = IdentifierIndex()
+        current = _index
+        path = cache.cache_path() if config.cache_enabled else None
+        if path is not None and path not in current.loaded:
+            current.loaded.add(path)
+            # pairs learned before the cache was switched on are stored as well
+            cache.store_identifiers(current.pairs())
+            rows = cache.load_identifiers()
+            for kind in PARAMETERS:
+                pairs = [(key, value) for row_kind, key, value in rows if row_kind == kind]
+                current.add(kind, [key for key, _ in pairs], [value for _, value in pairs])
+    return current
+
+
+def learn(data):
+    """
+    Add the identifier pairs of an answer to the index (see COLUMNS) if config.learn_identifiers is set.
+    :param data: A pandas dataframe as returned by the endpoint functions.
+    """
+    if config.learn_identifiers:
+        _learn(data)
+
+
+def _learn(data):
+    if data is None or len(data) == 0:
+        return
+    current = None
+    added = []
+    for column in data.columns:
+        for kind, (key, value) in COLUMNS.items():
+            if column != key and not column.endswith("." + key):
+                continue
+            partner = column[:len(column) - len(key)] + value
+            if partner not in data.columns:
+                continue
+            if current is None:
+                current = index()
+            # most answers only hold known identifiers, checking the distinct keys is cheap
+            if current.knows(kind, pandas.unique(data[column].to_numpy())):
+                continue
+            pairs = pandas.DataFrame({"key": data[column].to_numpy(), "value": data[partner].to_numpy()})
+            pairs = pairs.dropna().drop_duplicates("key")
+            added.extend(current.add(kind, pairs["key"].to_numpy(), pairs["value"].to_numpy()))
+    if added and config.cache_enabled:
+        cache.store_identifiers(added)
+
+
+def normalize_params(params):
+    """
+    Normalize the identifier lists of a request (see IdentifierIndex.normalize) and drop duplicates from all other
+    lists, if config.normalize_identifiers is set.
+    :param params: Dictionary of query parameters as built by an endpoint function.
+    :return: A new dictionary, or params itself if it holds no lists or normalization is off.
+    """
+    if params is None or not config.normalize_identifiers:
+        return params
+    lists = [key for key, value in params.items() if isinstance(value, (list, tuple, numpy.ndarray, pandas.Series))]
+    if not lists:
+        return params
+    normalized = dict(params)
+    current = None
+    for name in lists:
+        for kind, (key, value) in PARAMETERS.items():
+            if name in (key, value):
+                if current is None:
+                    current = index()
+                normalized[name] = current.normalize(kind, params[name], name == key)
+                break
+        else:
+            normalized[name] = list(dict.fromkeys(params[name]))
+    return normalized
+
+
+def to_ensg_number(gene_symbols):
+    """
+    Translate gene symbols (in any case) into ensg numbers with the local index.
+    :param gene_symbols: A list, numpy array or pandas series of gene symbols.
+    :return: A numpy array (a series for a series) of ensg numbers, None where the symbol is unknown or belongs to
+             several ensg numbers.
+    :example: to_ensg_number(["PTEN", "tigar"])
+    """
+    return index().translate("gene", gene_symbols, True)
+
+
+def to_gene_symbol(ensg_numbers):
+    """
+    Translate ensg numbers into gene symbols with the local index.
+    :param ensg_numbers: A list, numpy array or pandas series of ensg numbers.
+    :return: A numpy array (a series for a series) of gene symbols, None where the ensg number is unknown.
+    """
+    return index().translate("gene", ensg_numbers, False)
+
+
+def to_mimat_number(hs_numbers):
+    """
+    Translate hs numbers (e.g. hsa-miR-21-5p, in their exact case) into mimat numbers with the local index.
+    :param hs_numbers: A list, numpy array or pandas series of hs numbers.
+    :return: A numpy array (a series for a series) of mimat numbers, None where the hs number is unknown.
+    """
+    return index().translate("mirna", hs_numbers, True)
+
+
+def to_hs_number(mimat_numbers):
+    """
+    Translate mimat numbers into hs numbers with the local index.
+    :param mimat_numbers: A list, numpy array or pandas series of mimat numbers.
+    :return: A numpy array (a series for a series) of hs numbers, None where the mimat number is unknown.
+    """
+    return index().translate("mirna", mimat_numbers, False)
+
+
+def sync_identifiers(disease_name="pancancer"):
+    """
+    Fill the index with all genes and miRNAs of a dataset: the genes of its ceRNA network (get_geneCount) and the
+    miRNAs contributing to it (get_miRNAOccurences, all pages).
+    :param disease_name: The name of the dataset of interest as string, or a list of names.
+    :return: The IdentifierIndex.
+    :example: sync_identifiers("kidney clear cell carcinoma")
+    """
+    from spongeWebPy.get_GeneCount import get_geneCount
+    from spongeWebPy.occurences import get_miRNAOccurences
+    from spongeWebPy.pagination import fetch_all
+
+    # learned explicitly, the answers may come from the caches and config.learn_identifiers may be off
+    _learn(get_geneCount(disease_name=disease_name))
+    _learn(fetch_all(get_miRNAOccurences, disease_name=disease_name))
+    return index()
+
+
+def clear_identifiers():
+    """
+    Forget the identifiers learned in this process. Pairs stored in the cache database are removed by
+    cache.clear_cache().
+    """
+    global _index
+    with _lock:
+        _index = None
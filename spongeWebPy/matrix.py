@@ -0,0 +1,253 @@
+"""
+Wide expression matrices with memory-mapped local persistence
+
+The expression functions return one row per gene (or miRNA) and sample. An ExpressionMatrix holds the same values
+as a dense features x samples float32 NumPy array with aligned arrays of feature and sample identifiers. It is built
+while the answer is streamed (see streaming.iter_chunks), without a long-format dataframe or a pandas pivot.
+Matrices can be stored per disease as .npy files that later calls open memory-mapped, i.e. instantly and without
+copying them into memory.
+"""
+import hashlib
+import os
+import shutil
+from urllib.parse import quote
+
+import numpy
+import pandas
+
+# local import
+import spongeWebPy.cache as cache
+import spongeWebPy.config as config
+import spongeWebPy.streaming as streaming
+from spongeWebPy.expressionValues import get_geneExprValues, get_mirnaExprValues
+
+# identifier columns of the expression answers, the first one present becomes the row index
+FEATURE_COLUMNS = {"gene": ("gene.ensg_number", "gene", "ensg_number"),
+                   "mirna": ("mirna.mir_ID", "mirna", "mir_ID")}
+
+
+class ExpressionMatrix:
+    """
+    Dense features x samples expression matrix.
+    :param values: Two-dimensional float32 array with one row per feature and one column per sample, missing values
+                   are NaN. May be a numpy.memmap.
+    :param features: Array with the identifier of every row (e.g. ensg numbers).
+    :param samples: Array with the sample ID of every column.
+    :example: matrix = get_geneExprMatrix("kidney clear cell carcinoma", persist = True)
+              matrix.values[matrix.rows(["ENSG00000259090"])].mean(axis = 1)
+    """
+
+    def __init__(self, values, features, samples):
+        self.values = values
+        self.features = numpy.asarray(features)
+        self.samples = numpy.asarray(samples)
+        if self.values.shape != (len(self.features), len(self.samples)):
+            raise ValueError("values must have the shape (number of features, number of samples).")
+
+    @classmethod
+    def from_frame(cls, data, feature=None, sample="sample_ID", value="expr_value"):
+        """
+        Build a matrix from long-format expression values.
+        :param data: A pandas dataframe as returned by get_geneExprValues or get_mirnaExprValues, or an iterable of
+                     such dataframes (e.g. stream_geneExprValues), which is consumed chunk by chunk.
+        :param feature: Column with the row identifiers. Default (None) takes the first column of FEATURE_COLUMNS
+                        that is present.
+        :param sample: Column with the sample IDs.
+        :param value: Column with the expression values.
+        :return: An ExpressionMatrix with features and samples sorted by identifier. If a feature and sample occur
+                 more than once, the last value is kept.
+        """
+        if isinstance(data, pandas.DataFrame):
+            data = [data]
+        feature_codes = {}
+        sample_codes = {}
+        rows, columns, values = [], [], []
+        for chunk in data:
+            if len(chunk) == 0:
+                continue
+            if feature is None:
+                feature = _feature_column(chunk)
+            for column in (feature, sample, value):
+                if column not in chunk.columns:
+                    raise ValueError("Column " + column + " is missing in the expression values.")
+            rows.append(_codes(chunk[feature], feature_codes))
+            columns.append(_codes(chunk[sample], sample_codes))
+            values.append(chunk[value].to_numpy(dtype=numpy.float32, na_value=numpy.nan))
+
+        features, feature_rank = _sorted(feature_codes)
+        samples, sample_rank = _sorted(sample_codes)
+        matrix = numpy.full((len(features), len(samples)), numpy.nan, dtype=numpy.float32)
+        for row, column, value in zip(rows, columns, values):
+            matrix[feature_rank[row], sample_rank[column]] = value
+        return cls(matrix, features, samples)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def __repr__(self):
+        return "ExpressionMatrix(" + str(len(self.features)) + " features x " + str(len(self.samples)) + " samples)"
+
+    def rows(self, features):
+        """
+        Positions of features in the matrix, e.g. matrix.values[matrix.rows(["ENSG00000259090"])].
+        Raises ValueError for unknown identifiers.
+        """
+        return _positions(self.features, features, "feature")
+
+    def columns(self, samples):
+        """
+        Positions of samples in the matrix, e.g. matrix.values[:, matrix.columns(["TCGA-BP-4968"])].
+        Raises ValueError for unknown sample IDs.
+        """
+        return _positions(self.samples, samples, "sample")
+
+    def to_frame(self):
+        """
+        :return: A pandas dataframe with one row per feature and one column per sample, sharing memory with values
+                 where possible.
+        """
+        return pandas.DataFrame(self.values, index=pandas.Index(self.features, name="feature"),
+                                columns=pandas.Index(self.samples, name="sample_ID"), copy=False)
+
+    def save(self, path):
+        """
+        Store the matrix as values.npy, features.npy and samples.npy in the directory path, replacing an existing
+        store. The files are written next to it first and the directories are swapped by renaming, so readers see
+        the old store, the new one or (between the two renames) none, never a partial one.
+        :param path: Directory of the store.
+        """
+        temporary = path + ".tmp" + str(os.getpid())
+        os.makedirs(temporary, exist_ok=True)
+        numpy.save(os.path.join(temporary, "values.npy"), numpy.asarray(self.values, dtype=numpy.float32))
+        # fixed width unicode arrays, so loading needs no pickle
+        numpy.save(os.path.join(temporary, "features.npy"), self.features.astype(str))
+        numpy.save(os.path.join(temporary, "samples.npy"), self.samples.astype(str))
+        # a directory cannot replace a non-empty one, the old store is moved aside and deleted afterwards
+        old = path + ".old" + str(os.getpid())
+        shutil.rmtree(old, ignore_errors=True)
+        if os.path.isdir(path):
+            os.replace(path, old)
+        os.replace(temporary, path)
+        # matrices mapped from the old store keep it on some systems (e.g. Windows), it is left behind there
+        shutil.rmtree(old, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        """
+        Open a matrix stored with save().
+        :param path: Directory of the store.
+        :param mmap_mode: Memory-map mode of numpy.load: "r" (default) maps the values read-only without reading
+                          them, "c" allows changes in memory only, None loads them into memory.
+        :return: An ExpressionMatrix.
+        """
+        return cls(numpy.load(os.path.join(path, "values.npy"), mmap_mode=mmap_mode),
+                   numpy.load(os.path.join(path, "features.npy")),
+                   numpy.load(os.path.join(path, "samples.npy")))
+
+
+def get_geneExprMatrix(disease_name, ensg_number = None, gene_symbol = None, persist = False, refresh = False):
+    """
+    Get the expression values of genes as a dense genes x samples matrix.
+    :param disease_name: The name of the dataset of interest as string.
+                         Fuzzy search is available (e.g. "kidney clear cell carcinoma" or just "kidney").
+    :param ensg_number: A list of ensg number(s). If ensg_number is set, gene_symbol must be None.
+                        Default (None) returns all genes of the dataset.
+    :param gene_symbol: A list of gene symbol(s). If gene_symbol is set, ensg_number must be None.
+    :param persist: If True, the matrix is stored in config.matrix_path and opened memory-mapped by later calls
+                    with the same parameters instead of downloading it again.
+    :param refresh: If True, download the matrix again even if it is stored.
+    :return: An ExpressionMatrix with one row per ensg number.
+    :example: get_geneExprMatrix(disease_name = "kidney clear cell carcinoma", persist = True)
+    """
+    return _matrix("gene", get_geneExprValues, disease_name, persist, refresh,
+                   ensg_number=ensg_number, gene_symbol=gene_symbol)
+
+
+def get_mirnaExprMatrix(disease_name, mimat_number = None, hs_number = None, persist = False, refresh = False):
+    """
+    Get the expression values of miRNAs as a dense miRNAs x samples matrix.
+    :param disease_name: The name of the dataset of interest as string.
+                         Fuzzy search is available (e.g. "kidney clear cell carcinoma" or just "kidney").
+    :param mimat_number: A list of mimat_number(s). If mimat_number is set, hs_number must be None.
+                         Default (None) returns all miRNAs of the dataset.
+    :param hs_number: A list of hs_number(s). If hs_number is set, mimat_number must be None.
+    :param persist: If True, the matrix is stored in config.matrix_path and opened memory-mapped by later calls
+                    with the same parameters instead of downloading it again.
+    :param refresh: If True, download the matrix again even if it is stored.
+    :return: An ExpressionMatrix with one row per mimat number.
+    :example: get_mirnaExprMatrix(disease_name = "kidney clear cell carcinoma", persist = True)
+    """
+    return _matrix("mirna", get_mirnaExprValues, disease_name, persist, refresh,
+                   mimat_number=mimat_number, hs_number=hs_number)
+
+
+def matrix_path():
+    """
+    Return the directory of the stored matrices, config.matrix_path or matrices in cache.default_cache_dir().
+    """
+    if config.matrix_path is not None:
+        return config.matrix_path
+    return os.path.join(cache.default_cache_dir(), "matrices")
+
+
+def _matrix(kind, function, disease_name, persist, refresh, **identifiers):
+    if not isinstance(disease_name, str):
+        raise ValueError("disease_name: an expression matrix is built for one dataset, a name is required.")
+    # validates the parameters before a stored matrix is looked up
+    chunks = streaming.iter_chunks(function, disease_name, **identifiers)
+    if not persist:
+        return ExpressionMatrix.from_frame(chunks)
+
+    path = os.path.join(matrix_path(), _store_name(kind, disease_name, identifiers))
+    if refresh or not os.path.isfile(os.path.join(path, "values.npy")):
+        ExpressionMatrix.from_frame(chunks).save(path)
+    else:
+        chunks.close()
+    return ExpressionMatrix.load(path)
+
+
+def _store_name(kind, disease_name, identifiers):
+    # one directory per disease, kind and identifier selection
+    name = quote(disease_name, safe="") + "-" + kind
+    selected = {key: sorted(str(value) for value in values) for key, values in identifiers.items()
+                if values is not None}
+    if selected:
+        name += "-" + hashlib.sha1(repr(sorted(selected.items())).encode("utf-8")).hexdigest()[:16]
+    return name
+
+
+def _feature_column(data):
+    for columns in FEATURE_COLUMNS.values():
+        for column in columns:
+            if column in data.columns:
+                return column
+    raise ValueError("No identifier column (" + ", ".join(sum(FEATURE_COLUMNS.values(), ())) +
+                     ") in the expression values.")
+
+
+def _codes(identifiers, codes):
+    # integer code of every identifier, new identifiers are numbered in order of appearance
+    chunk_codes, uniques = pandas.factorize(identifiers)
+    if (chunk_codes < 0).any():
+        raise ValueError("Expression values without identifier or sample ID.")
+    mapping = numpy.array([codes.setdefault(unique, len(codes)) for unique in uniques], dtype=numpy.int32)
+    return mapping[chunk_codes]
+
+
+def _sorted(codes):
+    # identifiers in sorted order and the new position of every code
+    labels = numpy.array(list(codes), dtype=object)
+    order = numpy.argsort(labels.astype(str), kind="stable")
+    rank = numpy.empty(len(labels), dtype=numpy.int64)
+    rank[order] = numpy.arange(len(labels))
+    return labels[order], rank
+
+
+def _positions(labels, selected, name):
+    index = pandas.Index(labels)
+    positions = index.get_indexer(list(selected))
+    if (positions < 0).any():
+        missing = [value for value, position in zip(selected, positions) if position < 0]
+        raise ValueError("Unknown " + name + "(s): " + ", ".join(str(value) for value in missing[:10]))
+    return positions
@@ -0,0 +1,81 @@
+"""
+In-process memoization of the static metadata endpoints
+
+Reference data such as dataset and run information, overall counts, GO terms, hallmarks and WikiPathway keys
+hardly ever changes. Answers of the endpoints listed in config.memoized_endpoints are kept in a small LRU store
+for the lifetime of the process; every caller receives its own copy.
+"""
+import threading
+from collections import OrderedDict
+from urllib.parse import parse_qsl
+
+# local import
+import spongeWebPy.cache as cache
+import spongeWebPy.config as config
+
+_frames = OrderedDict()
+_lock = threading.Lock()
+
+
+def lookup(endpoint, params=None):
+    """
+    Return a copy of the memoized answer of a metadata request.
+    :param endpoint: Path of the endpoint relative to config.api_url_base.
+    :param params: Dictionary of query parameters.
+    :return: A pandas dataframe or None if the request is not memoized.
+    """
+    if endpoint not in config.memoized_endpoints:
+        return None
+    key = cache.request_key(endpoint, params)
+    with _lock:
+        data = _frames.get(key)
+        if data is None:
+            return None
+        _frames.move_to_end(key)
+    return data.copy(deep=True)
+
+
+def store(endpoint, params, data):
+    """
+    Memoize the answer of a metadata request, evicting the least recently used answers beyond config.memo_size.
+    Requests to other endpoints are ignored.
+    :param endpoint: Path of the endpoint relative to config.api_url_base.
+    :param params: Dictionary of query parameters.
+    :param data: The pandas dataframe returned to the caller.
+    """
+    if endpoint not in config.memoized_endpoints:
+        return
+    key = cache.request_key(endpoint, params)
+    data = data.copy(deep=True)
+    with _lock:
+        _frames[key] = data
+        _frames.move_to_end(key)
+        while len(_frames) > config.memo_size:
+            _frames.popitem(last=False)
+
+
+def clear_memo(endpoint=None):
+    """
+    Invalidate memoized metadata.
+    :param endpoint: Only forget answers of this endpoint (e.g. "dataset"). Default forgets everything.
+    """
+    with _lock:
+        if endpoint is None:
+            _frames.clear()
+        else:
+            for key in [key for key in _frames if key.split("?", 1)[0] == endpoint]:
+                del _frames[key]
+
+
+def forget_diseases(names):
+    """
+    Forget the memoized answers that may hold data of the given datasets, matched like cache.invalidate_diseases:
+    answers whose dataset search term is part of one of the names and answers not requested for a single dataset.
+    :param names: Full names of the datasets and their abbreviations, e.g. ["kidney clear cell carcinoma", "KIRC"].
+    """
+    names = [str(name).lower() for name in names]
+    with _lock:
+        for key in list(_frames):
+            disease = dict(parse_qsl(key.split("?", 1)[1], keep_blank_values=True)).get("disease_name")
+            if disease is None or any(disease.lower() in name for name in names):
+                del _frames[key]
@@ -0,0 +1,317 @@
+"""
+Per-endpoint performance metrics and request hooks
+
+Every request sent by the endpoint functions is recorded per endpoint: number of requests, errors, empty answers,
+retries, memo and cache hits, requests answered from cached broader results ("subsumed"), coalesced calls, new
+connections, bytes received (decompressed, "bytes", and as transferred, "wire_bytes"), cache entries revalidated
+with 304 Not Modified, bytes saved by compression and revalidation and rows returned, plus latency histograms of
+its phases:
+
+    connect   opening a new connection (TCP and TLS), only observed when no pooled connection was free
+    ttfb      sending the request until the response headers arrived (includes connect)
+    download  reading the response body
+    decode    parsing the JSON body
+    frame     flattening the records into a dataframe
+    total     the whole request including cache lookups, retries and backoff
+
+metrics_snapshot() returns everything as a dictionary (e.g. to log it at the end of a job), metrics_prometheus()
+in the Prometheus text format. Hooks registered with add_request_hook() are called before and after every request.
+Switch the recording off with config.metrics_enabled = False.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# local import
+import spongeWebPy.config as config
+
+PHASES = ("connect", "ttfb", "download", "decode", "frame", "total")
+COUNTERS = ("requests", "errors", "empty", "retries", "memo_hits", "cache_hits", "subsumed", "coalesced",
+            "connections", "bytes", "wire_bytes", "revalidated", "bytes_saved", "rows")
+# upper bounds of the latency histogram buckets in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_lock = threading.Lock()
+_endpoints = {}
+_before_hooks = []
+_after_hooks = []
+# the request that is being sent in this thread or task
+_current = contextvars.ContextVar("current_request", default=None)
+
+
+class Histogram:
+    """
+    Cumulative latency histogram with the bucket bounds of BUCKETS.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def snapshot(self):
+        """
+        :return: Dictionary with count, sum and the cumulative count per upper bound ("+Inf" for the last bucket).
+        """
+        buckets = {}
+        total = 0
+        for bound, count in zip(BUCKETS + ("+Inf",), self.counts):
+            total += count
+            buckets[bound] = total
+        return {"count": self.count, "sum": self.sum, "buckets": buckets}
+
+
+class RequestRecord:
+    """
+    Measurements of a single request, handed to the after hooks.
+    :param endpoint: Path of the endpoint relative to config.api_url_base.
+    :param params: Dictionary of query parameters.
+    """
+
+    def __init__(self, endpoint, params):
+        self.endpoint = endpoint
+        self.params = params
+        # "api", "memo" or "cache"
+        self.source = "api"
+        self.status_code = None
+        self.error = None
+        self.phases = {}
+        self.counts = {}
+        self.start = None
+
+    def add_phase(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def add_count(self, name, value=1):
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def __repr__(self):
+        return "RequestRecord(" + self.endpoint + ", source=" + self.source + ", status_code=" + \
+               str(self.status_code) + ", phases=" + repr(self.phases) + ", counts=" + repr(self.counts) + ")"
+
+
+def _stats(endpoint):
+    # per-endpoint counters and histograms, created on first use (call with _lock held)
+    stats = _endpoints.get(endpoint)
+    if stats is None:
+        stats = _endpoints[endpoint] = {"counts": dict.fromkeys(COUNTERS, 0),
+                                        "phases": {phase: Histogram() for phase in PHASES}}
+    return stats
+
+
+@contextmanager
+def request(endpoint, params=None):
+    """
+    Record one request of an endpoint. Phases and counts reported while the block runs (in the same thread or task)
+    are attributed to it; hooks are called on entry and exit.
+    :param endpoint: Path of the endpoint relative to config.api_url_base.
+    :param params: Dictionary of query parameters.
+    :return: The RequestRecord of the request.
+    """
+    record = start_record(endpoint, params)
+    if record is None:
+        yield None
+        return
+    try:
+        with recording(record):
+            yield record
+    except BaseException as error:
+        record.error = error
+        raise
+    finally:
+        finish_record(record)
+
+
+def start_record(endpoint, params=None):
+    """
+    Start recording a request whose work is not done in one block, e.g. a streamed answer that is read while the
+    caller consumes it. Attach it with recording() while the request is worked on and end it with finish_record().
+    :param endpoint: Path of the endpoint relative to config.api_url_base.
+    :param params: Dictionary of query parameters.
+    :return: The RequestRecord of the request, None if config.metrics_enabled is off.
+    """
+    if not config.metrics_enabled:
+        return None
+    record = RequestRecord(endpoint, params)
+    for hook in list(_before_hooks):
+        hook(endpoint, params)
+    record.start = time.perf_counter()
+    return record
+
+
+@contextmanager
+def recording(record):
+    """
+    Attribute the phases and counts reported while the block runs (in the same thread or task) to a record of
+    start_record. Does nothing for None.
+    """
+    if record is None:
+        yield
+        return
+    token = _current.set(record)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def finish_record(record, error=None):
+    """
+    End the recording of a request started with start_record: its total time is observed, its counts are added to
+    its endpoint and the hooks are called. Does nothing for None.
+    :param record: The RequestRecord of the request.
+    :param error: The exception the request failed with, if any.
+    """
+    if record is None:
+        return
+    if error is not None:
+        record.error = error
+    record.add_phase("total", time.perf_counter() - record.start)
+    _store(record)
+    for hook in list(_after_hooks):
+        hook(record)
+
+
+def _store(record):
+    with _lock:
+        stats = _stats(record.endpoint)
+        counts = stats["counts"]
+        counts["requests"] += 1
+        if record.error is not None and not record.counts.get("empty"):
+            counts["errors"] += 1
+        for name, value in record.counts.items():
+            counts[name] += value
+        for phase, seconds in record.phases.items():
+            stats["phases"][phase].observe(seconds)
+
+
+def add_phase(phase, seconds):
+    """
+    Attribute the duration of a phase to the request that is being recorded in this thread or task.
+    """
+    record = _current.get()
+    if record is not None:
+        record.add_phase(phase, seconds)
+
+
+@contextmanager
+def timed(phase):
+    """
+    Measure the duration of a block as a phase of the current request.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_phase(phase, time.perf_counter() - start)
+
+
+def add_count(name, value=1):
+    """
+    Count an event of the current request: one of COUNTERS, e.g. "retries" or "bytes".
+    """
+    record = _current.get()
+    if record is not None:
+        record.add_count(name, value)
+
+
+def set_source(source, status_code=None):
+    """
+    Note where the answer of the current request came from ("api", "memo", "cache" or "subsumed") and its status code.
+    """
+    record = _current.get()
+    if record is not None:
+        record.source = source
+        if status_code is not None:
+            record.status_code = status_code
+
+
+def count(endpoint, name, value=1):
+    """
+    Count an event of an endpoint that happens outside of a recorded request (e.g. a coalesced call).
+    """
+    if not config.metrics_enabled:
+        return
+    with _lock:
+        _stats(endpoint)["counts"][name] += value
+
+
+def add_request_hook(before=None, after=None):
+    """
+    Register callbacks for every request sent by the endpoint functions.
+    :param before: Called as before(endpoint, params) before a request is looked up in the caches and sent.
+    :param after: Called as after(record) with the RequestRecord once the request finished or failed.
+    """
+    with _lock:
+        if before is not None:
+            _before_hooks.append(before)
+        if after is not None:
+            _after_hooks.append(after)
+
+
+def remove_request_hook(before=None, after=None):
+    """
+    Unregister callbacks added with add_request_hook.
+    """
+    with _lock:
+        if before in _before_hooks:
+            _before_hooks.remove(before)
+        if after in _after_hooks:
+            _after_hooks.remove(after)
+
+
+def metrics_snapshot():
+    """
+    Current metrics of all endpoints.
+    :return: Dictionary endpoint -> {"counts": {counter: value}, "phases": {phase: {"count", "sum", "buckets"}}}.
+    :example: for endpoint, stats in metrics_snapshot().items():
+                  print(endpoint, stats["counts"]["requests"], stats["phases"]["ttfb"]["sum"])
+    """
+    with _lock:
+        return {endpoint: {"counts": dict(stats["counts"]),
+                           "phases": {phase: histogram.snapshot() for phase, histogram in stats["phases"].items()}}
+                for endpoint, stats in _endpoints.items()}
+
+
+def metrics_prometheus(prefix="spongewebpy"):
+    """
+    Current metrics of all endpoints in the Prometheus text exposition format.
+    :param prefix: Prefix of the metric names.
+    :return: The metrics as string, e.g. to serve them on a /metrics page or write them for the node exporter.
+    """
+    snapshot = metrics_snapshot()
+    lines = []
+    for name in COUNTERS:
+        metric = prefix + "_" + name + "_total"
+        lines.append("# TYPE " + metric + " counter")
+        for endpoint, stats in snapshot.items():
+            lines.append(metric + '{endpoint="' + _escape(endpoint) + '"} ' + str(stats["counts"][name]))
+    metric = prefix + "_request_phase_seconds"
+    lines.append("# TYPE " + metric + " histogram")
+    for endpoint, stats in snapshot.items():
+        for phase, histogram in stats["phases"].items():
+            labels = 'endpoint="' + _escape(endpoint) + '",phase="' + phase + '"'
+            for bound, total in histogram["buckets"].items():
+                lines.append(metric + "_bucket{" + labels + ',le="' + str(bound) + '"} ' + str(total))
+            lines.append(metric + "_sum{" + labels + "} " + repr(histogram["sum"]))
+            lines.append(metric + "_count{" + labels + "} " + str(histogram["count"]))
+    return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def reset_metrics():
+    """
+    Forget all recorded metrics. Registered hooks are kept.
+    """
+    with _lock:
+        _endpoints.clear()
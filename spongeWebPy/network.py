@@ -0,0 +1,295 @@
+"""
+Client-side ceRNA networks with vectorized centrality computation
+
+A CeRNANetwork is built from the interaction tables returned by get_all_ceRNAInteractions (or its pages). Genes are
+coded as integers 0..n-1 and the undirected adjacency is held in compressed sparse row (CSR) form, so degree,
+eigenvector and betweenness centrality can be recomputed with NumPy for any pValue, mscor or correlation cutoff
+without a round trip to the server or a conversion to networkx.
+"""
+import numpy
+import pandas
+
+# local import
+import spongeWebPy.filters as filters
+
+# edge statistics kept per interaction, named like the column suffixes of the interaction tables
+EDGE_COLUMNS = ("p_value", "mscor", "correlation")
+
+
+class CeRNANetwork:
+    """
+    Undirected ceRNA network with integer-coded genes and a CSR adjacency.
+    :param nodes: Array with the name (ensg number) of every gene, the position is the integer code of the gene.
+    :param source: Integer codes of the first gene of every interaction.
+    :param target: Integer codes of the second gene of every interaction.
+    :param edge_data: Dictionary column name -> array with one value per interaction (e.g. p_value, mscor).
+    :example: network = CeRNANetwork.from_interactions(get_all_ceRNAInteractions(disease_name = "kidney", limit = 1000))
+              network.threshold(pValue = 0.01, mscor = 0.2, mscorDirection = ">").centralities()
+    """
+
+    def __init__(self, nodes, source, target, edge_data=None):
+        self.nodes = numpy.asarray(nodes, dtype=object)
+        self.source = numpy.asarray(source, dtype=numpy.int64)
+        self.target = numpy.asarray(target, dtype=numpy.int64)
+        if len(self.source) != len(self.target):
+            raise ValueError("source and target must have the same length.")
+        self.edge_data = {column: numpy.asarray(values) for column, values in (edge_data or {}).items()}
+        for column, values in self.edge_data.items():
+            if len(values) != len(self.source):
+                raise ValueError("Edge column " + column + " does not have one value per interaction.")
+        self._build_adjacency()
+
+    @classmethod
+    def from_interactions(cls, interactions, source="gene1.ensg_number", target="gene2.ensg_number"):
+        """
+        Build a network from ceRNA interaction tables.
+        :param interactions: A pandas dataframe as returned by get_all_ceRNAInteractions or
+                             get_specific_ceRNAInteractions, or an iterable of such dataframes
+                             (e.g. iter_all_ceRNAInteractions), which is consumed page by page.
+        :param source: Column with the identifier of the first gene.
+        :param target: Column with the identifier of the second gene.
+        :return: A CeRNANetwork with one edge per interaction.
+        :example: CeRNANetwork.from_interactions(iter_all_ceRNAInteractions(disease_name = "kidney clear cell carcinoma"))
+        """
+        if isinstance(interactions, pandas.DataFrame):
+            interactions = [interactions]
+
+        sources, targets = [], []
+        edge_data = {}
+        for page in interactions:
+            if source not in page.columns or target not in page.columns:
+                raise ValueError("The interactions need the columns " + source + " and " + target + ".")
+            sources.append(page[source].to_numpy(dtype=object))
+            targets.append(page[target].to_numpy(dtype=object))
+            for column in EDGE_COLUMNS:
+                names = filters.columns(page.columns, column)
+                if names:
+                    edge_data.setdefault(column, []).append(page[names[0]].to_numpy(dtype=numpy.float64))
+
+        if not sources:
+            return cls([], [], [])
+        sources = numpy.concatenate(sources)
+        targets = numpy.concatenate(targets)
+        edge_data = {column: numpy.concatenate(values) for column, values in edge_data.items()
+                     if sum(len(part) for part in values) == len(sources)}
+        # one code per gene, in order of first appearance
+        codes, nodes = pandas.factorize(numpy.concatenate([sources, targets]))
+        return cls(nodes, codes[:len(sources)], codes[len(sources):], edge_data)
+
+    def _build_adjacency(self):
+        # both directions of every interaction, without self loops and parallel edges
+        n = len(self.nodes)
+        keep = self.source != self.target
+        rows = numpy.concatenate([self.source[keep], self.target[keep]])
+        columns = numpy.concatenate([self.target[keep], self.source[keep]])
+        pairs = numpy.sort(rows * n + columns)
+        pairs = pairs[numpy.concatenate([pairs[:1] == pairs[:1], pairs[1:] != pairs[:-1]])]
+        rows, columns = numpy.divmod(pairs, max(n, 1))
+        self.indices = columns
+        self.indptr = numpy.zeros(n + 1, dtype=numpy.int64)
+        numpy.cumsum(numpy.bincount(rows, minlength=n), out=self.indptr[1:])
+        # row of every stored entry, used to sum over neighbours with bincount
+        self._rows = rows
+
+    @property
+    def number_of_nodes(self):
+        return len(self.nodes)
+
+    @property
+    def number_of_edges(self):
+        """
+        Number of distinct gene pairs (interactions between the same genes are counted once).
+        """
+        return len(self.indices) // 2
+
+    def __len__(self):
+        return self.number_of_nodes
+
+    def __repr__(self):
+        return "CeRNANetwork(" + str(self.number_of_nodes) + " genes, " + str(self.number_of_edges) + " interactions)"
+
+    def neighbors(self, node):
+        """
+        Genes interacting with a gene.
+        :param node: The ensg number of the gene.
+        :return: An array with the ensg numbers of its neighbours.
+        """
+        code = self._codes([node])[0]
+        return self.nodes[self.indices[self.indptr[code]:self.indptr[code + 1]]]
+
+    def _codes(self, names):
+        codes = pandas.Index(self.nodes).get_indexer(list(names))
+        if (codes < 0).any():
+            missing = [name for name, code in zip(names, codes) if code < 0]
+            raise ValueError("Gene(s) " + ", ".join(map(str, missing)) + " are not part of the network.")
+        return codes
+
+    def degree(self, normalized=False):
+        """
+        Number of interaction partners of every gene.
+        :param normalized: Divide by the highest possible degree (number of genes - 1).
+        :return: A pandas series indexed by ensg number.
+        """
+        degree = numpy.diff(self.indptr)
+        if normalized:
+            degree = degree / max(self.number_of_nodes - 1, 1)
+        return self._series(degree, "node_degree")
+
+    def eigenvector(self, max_iter=100, tol=1e-06):
+        """
+        Eigenvector centrality by power iteration on the sparse adjacency (same definition as networkx).
+        :param max_iter: Maximum number of iterations.
+        :param tol: Convergence tolerance (per gene).
+        :return: A pandas series indexed by ensg number, normalized to unit length.
+        """
+        n = self.number_of_nodes
+        if n == 0:
+            return self._series(numpy.zeros(0), "eigenvector")
+        x = numpy.full(n, 1.0 / n)
+        for _ in range(max_iter):
+            last = x
+            # multiply with (A + I), the shift keeps the iteration from oscillating on bipartite parts
+            x = last + numpy.bincount(self._rows, weights=last[self.indices], minlength=n)
+            norm = numpy.sqrt(numpy.dot(x, x)) or 1.0
+            x = x / norm
+            if numpy.abs(x - last).sum() < n * tol:
+                return self._series(x, "eigenvector")
+        raise ValueError("Eigenvector centrality did not converge in " + str(max_iter) + " iterations.")
+
+    def betweenness(self, k=None, normalized=True, seed=None):
+        """
+        Betweenness centrality with Brandes' algorithm, each breadth-first search is run level by level on whole
+        frontiers of genes. With k set, only k randomly sampled source genes are used and the result is
+        extrapolated, which makes the computation feasible for networks with millions of interactions.
+        :param k: Number of sampled source genes. Default (None) uses all genes and gives the exact value.
+        :param normalized: Divide by the number of gene pairs ((n - 1) * (n - 2)), like the SPONGE database.
+        :param seed: Seed of the random sampling of source genes.
+        :return: A pandas series indexed by ensg number.
+        """
+        n = self.number_of_nodes
+        if k is None or k >= n:
+            sources = numpy.arange(n)
+        else:
+            sources = numpy.random.default_rng(seed).choice(n, size=k, replace=False)
+
+        betweenness = numpy.zeros(n)
+        for start in sources:
+            betweenness += self._dependencies(start)
+
+        if normalized:
+            scale = 1.0 / ((n - 1) * (n - 2)) if n > 2 else None
+        else:
+            # every shortest path is found from both of its ends
+            scale = 0.5
+        if scale is not None:
+            if len(sources) and len(sources) < n:
+                scale *= n / len(sources)
+            betweenness *= scale
+        return self._series(betweenness, "betweenness")
+
+    def _dependencies(self, start):
+        # single source shortest paths (breadth-first) followed by the accumulation of pair dependencies
+        n = self.number_of_nodes
+        distance = numpy.full(n, -1, dtype=numpy.int64)
+        sigma = numpy.zeros(n)
+        distance[start] = 0
+        sigma[start] = 1.0
+        frontier = numpy.array([start])
+        levels = []
+        depth = 0
+        while len(frontier):
+            parents, children = self._expand(frontier)
+            new = children[distance[children] < 0]
+            distance[new] = depth + 1
+            # edges into the next level carry the number of shortest paths
+            forward = distance[children] == depth + 1
+            parents, children = parents[forward], children[forward]
+            sigma += numpy.bincount(children, weights=sigma[parents], minlength=n)
+            levels.append((parents, children))
+            frontier = numpy.unique(new)
+            depth += 1
+
+        delta = numpy.zeros(n)
+        for parents, children in reversed(levels):
+            delta += numpy.bincount(parents, weights=sigma[parents] / sigma[children] * (1.0 + delta[children]),
+                                    minlength=n)
+        delta[start] = 0.0
+        return delta
+
+    def _expand(self, frontier):
+        # all (gene, neighbour) pairs of the genes in the frontier
+        starts = self.indptr[frontier]
+        counts = self.indptr[frontier + 1] - starts
+        parents = numpy.repeat(frontier, counts)
+        offsets = numpy.arange(counts.sum()) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+        return parents, self.indices[numpy.repeat(starts, counts) + offsets]
+
+    def centralities(self, k=None, seed=None):
+        """
+        Degree, betweenness and eigenvector centrality of every gene, like the columns of get_ceRNA.
+        :param k: Number of sampled source genes for the betweenness (see betweenness). Default is exact.
+        :param seed: Seed of the random sampling of source genes.
+        :return: A pandas dataframe indexed by ensg number.
+        """
+        return pandas.concat([self.degree(), self.betweenness(k=k, seed=seed), self.eigenvector()], axis=1)
+
+    def threshold(self, keep_nodes=False, **thresholds):
+        """
+        Subnetwork of the interactions passing cutoffs, with the parameters of get_all_ceRNAInteractions.
+        :param keep_nodes: Keep genes without remaining interactions (default drops them).
+        :param thresholds: pValue, mscor or correlation cutoffs and their directions, e.g.
+                           pValue = 0.01, mscor = 0.1, mscorDirection = ">". Directions default to "<".
+        :return: A new CeRNANetwork.
+        :example: network.threshold(pValue = 0.01, correlation = 0.5, correlationDirection = ">")
+        """
+        spec = filters.ENDPOINTS["ceRNAInteraction/findAll"]["thresholds"]
+        unknown = set(thresholds) - set(spec) - {direction for _, direction in spec.values()}
+        if unknown:
+            raise ValueError("Unknown threshold(s) " + ", ".join(sorted(unknown)) + ". Possible values are " +
+                             ", ".join(spec) + " and their directions.")
+        keep = numpy.ones(len(self.source), dtype=bool)
+        for key, (column, direction) in spec.items():
+            value = thresholds.get(key)
+            if value is None:
+                continue
+            if column not in self.edge_data:
+                raise ValueError("The network has no " + column + " values to apply " + key + " to.")
+            operator = filters.threshold_operator(direction, thresholds)
+            values = self.edge_data[column]
+            keep &= values < value if operator == "<" else values > value
+        return self._edge_subgraph(keep, keep_nodes)
+
+    def subgraph(self, nodes):
+        """
+        Subnetwork induced by a set of genes.
+        :param nodes: A list of ensg numbers.
+        :return: A new CeRNANetwork with these genes and the interactions among them.
+        """
+        selected = numpy.zeros(self.number_of_nodes, dtype=bool)
+        selected[self._codes(nodes)] = True
+        return self._edge_subgraph(selected[self.source] & selected[self.target], False, selected)
+
+    def _edge_subgraph(self, keep, keep_nodes, selected=None):
+        if keep_nodes:
+            return CeRNANetwork(self.nodes, self.source[keep], self.target[keep],
+                                {column: values[keep] for column, values in self.edge_data.items()})
+        if selected is None:
+            selected = numpy.zeros(self.number_of_nodes, dtype=bool)
+            selected[self.source[keep]] = True
+            selected[self.target[keep]] = True
+        # re-code the remaining genes as 0..m-1
+        codes = numpy.cumsum(selected) - 1
+        return CeRNANetwork(self.nodes[selected], codes[self.source[keep]], codes[self.target[keep]],
+                            {column: values[keep] for column, values in self.edge_data.items()})
+
+    def edges(self):
+        """
+        The interactions of the network.
+        :return: A pandas dataframe with the ensg numbers of both genes and the edge statistics.
+        """
+        data = {"gene1": self.nodes[self.source], "gene2": self.nodes[self.target]}
+        data.update(self.edge_data)
+        return pandas.DataFrame(data)
+
+    def _series(self, values, name):
+        return pandas.Series(values, index=pandas.Index(self.nodes, name="ensg_number"), name=name)
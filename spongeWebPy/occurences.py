@@ -1,9 +1,6 @@
-import json
-import requests
-from pandas import json_normalize
-
 # local import
-import spongeWebPy.config as config
+import spongeWebPy.connection as connection
+import spongeWebPy.pagination as pagination
 
 def get_miRNAOccurences(disease_name,
                         mimat_number = None,
@@ -18,6 +15,7 @@ def get_miRNAOccurences(disease_name,
     :param disease_name: The name of the dataset of interest as string.
                          If default (None) is set, all available datasets with corresponding information are shown.
                          Fuzzy search is available (e.g. "kidney clear cell carcinoma" or just "kidney").
+                         A list of names queries all of these datasets concurrently and adds a "disease" column.
     :param mimat_number: A list of mimat_number(s). If mimat_number is set, hs_number must be None.
     :param hs_number: A list of hs_number(s). If hs_number is set, mimat_number must be None.
     :param occurences: Threshold of amount of contributions a miRNA should be considered.
@@ -41,19 +39,25 @@ def get_miRNAOccurences(disease_name,
 
     # Add list type parameters
     if mimat_number is not None:
-        params.update({"mimat_number": ",".join(mimat_number)})
+        params.update({"mimat_number": mimat_number})
     if hs_number is not None:
-        params.update({"hs_number": ",".join(hs_number)})
-
-    api_url = '{0}miRNAInteraction/getOccurence'.format(config.api_url_base)
+        params.update({"hs_number": hs_number})
 
-    response = requests.get(api_url, headers=config.headers, params=params)
+    return connection.api_request('miRNAInteraction/getOccurence', params)
 
-    json_dicts = json.loads(response.content.decode('utf-8'))
-    data = json_normalize(json_dicts)
 
-    if response.status_code == 200:
-        return data
-    else:
-        if response.status_code == 404:
-            raise ValueError("API response is empty. Reason: " + data["detail"].values)
+def iter_miRNAOccurences(page_size=1000, offset=None, concurrency=1, **params):
+    """
+    Iterate page by page over all miRNAs involved in cancer type/dataset of interest occurring a certain amount of times.
+    Iteration stops cleanly after the last page.
+    :param page_size: Number of results per page. Default value is 1000, which is also the maximum.
+    :param offset: Starting point from where results should be shown.
+    :param concurrency: Number of page requests kept in flight at the same time. Default 1 fetches page by page,
+                        higher values prefetch the following pages on a thread pool. Pages are yielded in order.
+    :param params: Further parameters of get_miRNAOccurences (all except limit and offset).
+    :return: A generator yielding one pandas dataframe per page.
+    :example: for page in iter_miRNAOccurences(disease_name="kidney clear cell carcinoma", occurences = 1000):
+                  print(page.shape)
+    """
+    return pagination.iter_pages(get_miRNAOccurences, page_size=page_size, offset=offset,
+                                 concurrency=concurrency, **params)
@@ -1,9 +1,5 @@
-import json
-import requests
-from pandas import json_normalize
-
 #local import
-import spongeWebPy.config as config
+import spongeWebPy.connection as connection
 
 
 def get_overallCounts():
@@ -12,16 +8,4 @@ def get_overallCounts():
     :return: Overview of interaction counts about all or specific dataset as pandas dataframe.
     :example: get_overallCounts()
     """
-    api_url = '{0}getOverallCounts'.format(config.api_url_base)
-    print(api_url)
-
-    response = requests.get(api_url, headers=config.headers)
-
-    json_dicts = json.loads(response.content.decode('utf-8'))
-    data = json_normalize(json_dicts)
-
-    if response.status_code == 200:
-        return data
-    else:
-        if response.status_code == 404:
-            raise ValueError("API response is empty. Reason: " + data["detail"].values)
+    return connection.api_request('getOverallCounts')
@@ -0,0 +1,159 @@
+"""
+Page through the offset based endpoints
+"""
+import inspect
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas
+
+# local import
+import spongeWebPy.config as config
+import spongeWebPy.connection as connection
+
+
+def iter_pages(function, page_size=1000, offset=None, concurrency=1, **params):
+    """
+    Call an endpoint function with increasing offsets and yield one result page at a time.
+    Iteration stops after the first page that holds less than page_size rows or when the API reports an empty result.
+    :param function: Endpoint function supporting the limit and offset parameters (e.g. get_all_ceRNAInteractions).
+    :param page_size: Number of results per page. Can be up to config.max_page_size (1000).
+    :param offset: Starting point from where results should be shown.
+    :param concurrency: Number of page requests kept in flight at the same time. Default 1 fetches page by page.
+                        Pages are always yielded in order.
+    :param params: All further parameters are passed to function unchanged.
+                   A list of disease names is paged one dataset after the other; every page then gets an additional
+                   first column "disease" and datasets without results are reported with a PartialResultWarning.
+    :return: A generator yielding pandas dataframes with at most page_size rows each.
+    """
+    check_page_arguments(page_size, concurrency)
+    if isinstance(params.get("disease_name"), (list, tuple)):
+        return _iter_diseases(function, page_size, offset, concurrency, params)
+    return _iter_pages(function, page_size, offset, concurrency, params)
+
+
+def _iter_pages(function, page_size, offset, concurrency, params):
+    offset = 0 if offset is None else offset
+    if concurrency == 1:
+        pages = _fetch_sequential(function, page_size, offset, params)
+    else:
+        pages = _fetch_concurrent(function, page_size, offset, concurrency, params)
+
+    try:
+        first_page = True
+        for page in pages:
+            if page is None:
+                return
+            if isinstance(page, connection.EmptyResponseError):
+                # an empty first page means the query itself matches nothing
+                if first_page:
+                    raise page
+                return
+            if len(page) > 0:
+                yield page
+            if len(page) < page_size:
+                return
+            first_page = False
+    finally:
+        pages.close()
+
+
+def _iter_diseases(function, page_size, offset, concurrency, params):
+    diseases = list(params["disease_name"])
+    if not diseases:
+        raise ValueError("disease_name: at least one dataset name is required.")
+    failures = {}
+    for disease in diseases:
+        found = False
+        try:
+            for page in _iter_pages(function, page_size, offset, concurrency, dict(params, disease_name=disease)):
+                page.insert(0, "disease", disease, allow_duplicates=True)
+                found = True
+                yield page
+        except Exception as error:
+            failures[disease] = error
+        else:
+            if not found:
+                failures[disease] = connection.EmptyResponseError("API response is empty. Reason: no data for " +
+                                                                  str(disease) + ".")
+    if len(failures) == len(diseases):
+        raise failures[diseases[0]]
+    connection.report_failures(failures, len(diseases))
+
+
+def fetch_all(function, page_size=1000, offset=None, concurrency=None, **params):
+    """
+    Download all results of an offset based endpoint function with concurrent page requests
+    and assemble them into one dataframe.
+    :param function: Endpoint function supporting the limit and offset parameters (e.g. get_all_ceRNAInteractions).
+    :param page_size: Number of results per page. Can be up to config.max_page_size (1000).
+    :param offset: Starting point from where results should be shown.
+    :param concurrency: Number of page requests kept in flight at the same time. Default is config.concurrency.
+    :param params: All further parameters are passed to function unchanged.
+    :return: A pandas dataframe with all results in server order.
+    :example: fetch_all(get_all_ceRNAInteractions, disease_name = "kidney clear cell carcinoma", concurrency = 8)
+    """
+    if concurrency is None:
+        concurrency = config.concurrency
+    params, compact = page_params(function, params)
+    pages = list(iter_pages(function, page_size=page_size, offset=offset, concurrency=concurrency, **params))
+    if not pages:
+        return pandas.DataFrame()
+    return connection.finish_frame(pandas.concat(pages, ignore_index=True), compact)
+
+
+def page_params(function, params):
+    """
+    Take the compact parameter off the page requests, so that only the combined pages are compacted. Pages compacted
+    one by one get different categories, which pandas.concat turns back into object columns.
+    :param function: Endpoint function the pages are requested with.
+    :param params: Parameters for function as passed to fetch_all.
+    :return: The parameters for the page requests and the compact argument for the combined result.
+    """
+    if "compact" not in inspect.signature(function).parameters:
+        return params, False
+    return dict(params, compact=False), params.get("compact")
+
+
+def check_page_arguments(page_size, concurrency):
+    """
+    Validate the paging parameters shared by the synchronous and asynchronous iterators.
+    """
+    if page_size < 1 or page_size > config.max_page_size:
+        raise ValueError("page_size: " + str(page_size) + " must be between 1 and " + str(config.max_page_size) + ".")
+    if concurrency < 1:
+        raise ValueError("concurrency: " + str(concurrency) + " must be at least 1.")
+
+
+def _fetch_page(function, page_size, offset, params):
+    try:
+        return function(limit=page_size, offset=offset, **params)
+    except connection.EmptyResponseError as error:
+        return error
+
+
+def _fetch_sequential(function, page_size, offset, params):
+    while True:
+        yield _fetch_page(function, page_size, offset, params)
+        offset += page_size
+
+
+def _fetch_concurrent(function, page_size, offset, concurrency, params):
+    # keep `concurrency` requests for the following pages in flight and hand them out in order; requests issued
+    # beyond the last page are cancelled or, if already running, waited for, so none of them is still using a
+    # connection or recording metrics when the caller continues
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    pending = deque()
+    try:
+        for _ in range(concurrency):
+            pending.append(executor.submit(_fetch_page, function, page_size, offset, params))
+            offset += page_size
+        while pending:
+            page = pending.popleft().result()
+            yield page
+            pending.append(executor.submit(_fetch_page, function, page_size, offset, params))
+            offset += page_size
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
@@ -0,0 +1,114 @@
+"""
+Answer narrower queries from cached broader results
+
+With the response cache switched on, a query of an endpoint in filters.ENDPOINTS that is not cached itself can
+often be answered from cached answers of a broader query: the same datasets, gene type and other parameters, a
+superset of the identifiers and thresholds that are at most as strict in the same direction. The broader result must
+be complete, i.e. its pages with an explicit limit from offset 0 up to a page with fewer rows than the limit (e.g. as
+fetched by pagination.fetch_all). Requests without limit are neither answered nor used as broader results for
+endpoints the server pages, since the server cuts them at a default limit. The rows are then filtered, sorted and
+paged locally with filters.apply; rows of a broader result with the same filters are only sorted and paged, since
+the server applied these filters already. Windows of an identical query (e.g. limit 100 at offset 200 within cached pages of
+1000 rows) are cut out of the cached pages even if they are incomplete.
+
+Sorting is done locally as well, so rows with equal sort values may come in a different order than from the API.
+Answers without sorting keep the order of the server and are therefore only taken from unsorted broader results.
+Switch the planner off with config.subsume_queries = False.
+"""
+import json
+
+import pandas
+
+# local import
+import spongeWebPy.cache as cache
+import spongeWebPy.config as config
+import spongeWebPy.connection as connection
+import spongeWebPy.filters as filters
+
+# parameters that only select a window of the ordered result
+_WINDOW = ("sorting", "descending", "limit", "offset")
+
+
+def answer(endpoint, params, empty_status=404):
+    """
+    Answer a request from cached answers of broader queries.
+    :param endpoint: Path of the endpoint relative to config.api_url_base.
+    :param params: Dictionary of query parameters of a single request (see connection.split_params).
+    :param empty_status: Status code the endpoint uses to signal an empty result.
+    :return: A pandas dataframe, empty if no cached row fits the parameters, or None if no complete broader result
+             is cached.
+    """
+    if not (config.cache_enabled and config.subsume_queries) or params is None or endpoint not in filters.ENDPOINTS:
+        return None
+    params = {key: value for key, value in params.items() if value is not None}
+    if params.get("limit") is None and filters.ENDPOINTS[endpoint]["paged"]:
+        # the server answers with its default number of rows, which is not known here
+        return None
+    fixed = _fixed(endpoint, params)
+    # broader queries that only differ in their offset form one result, keyed by their other parameters
+    results = {}
+    for stored, _ in cache.entries(endpoint):
+        if _fixed(endpoint, stored) != fixed or not filters.subsumes(endpoint, stored, params):
+            continue
+        key = json.dumps({name: value for name, value in stored.items() if name != "offset"}, sort_keys=True,
+                         default=str)
+        results.setdefault(key, {})[int(stored.get("offset") or 0)] = stored
+    for pages in results.values():
+        data = _answer_from(endpoint, pages, params, empty_status)
+        if data is not None:
+            return data
+    return None
+
+
+def _fixed(endpoint, params):
+    # parameters that have to be equal: all but the filters described in filters.ENDPOINTS and the window
+    spec = filters.ENDPOINTS[endpoint]
+    described = set(spec["match"]) | set(spec["thresholds"]) | set(_WINDOW)
+    described |= {direction for _, direction in spec["thresholds"].values() if direction not in ("<", ">")}
+    return {key: str(value) for key, value in params.items() if key not in described}
+
+
+def _answer_from(endpoint, pages, params, empty_status):
+    broader = pages[min(pages)]
+    same_order = all(str(broader.get(key)) == str(params.get(key)) for key in ("sorting", "descending"))
+    if params.get("sorting") is None and broader.get("sorting") is not None:
+        # the order of the server is lost
+        return None
+    same_rows = same_order and filters.subsumes(endpoint, params, broader)
+    limit = broader.get("limit")
+    if limit is None and filters.ENDPOINTS[endpoint]["paged"]:
+        # the server cut the answer at its default limit, how many rows are missing is unknown
+        return None
+    start = int(params.get("offset") or 0)
+    end = None if params.get("limit") is None else start + int(params["limit"])
+
+    frames = []
+    rows = 0
+    complete = False
+    offset = 0
+    while offset in pages:
+        content = cache.lookup(endpoint, pages[offset])
+        if content is None:
+            # evicted in the meantime
+            return None
+        frame = connection.build_frame(200, content, empty_status)
+        frames.append(frame)
+        rows += len(frame)
+        if limit is None or len(frame) < int(limit):
+            complete = True
+            break
+        if same_rows and end is not None and rows >= end:
+            break
+        offset += int(limit)
+
+    if not frames:
+        return None
+    data = pandas.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    if complete:
+        if filters.subsumes(endpoint, params, broader):
+            # the same filters, applied by the server already: only the order and the window are done locally
+            return filters.apply(endpoint, data, {key: params.get(key) for key in _WINDOW})
+        return filters.apply(endpoint, data, params)
+    if same_rows and end is not None and rows >= end:
+        return data.iloc[start:end].reset_index(drop=True)
+    return None
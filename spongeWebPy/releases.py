@@ -0,0 +1,149 @@
+"""
+Release-aware invalidation of the response cache
+
+SPONGE data only changes when a dataset is rebuilt. The fingerprint of a dataset is a hash of everything the
+metadata endpoints tell about it: its rows of getOverallCounts (run ID and interaction counts) and of dataset
+(dataset ID, origin, download url), optionally also its run information (the SPONGE parameters, one request per
+dataset). check_releases() compares the current fingerprints with those stored in the cache database and removes
+only the cached answers of datasets whose fingerprint changed, appeared or disappeared, including those requested by
+the dataset's abbreviation (e.g. KIRC); all other entries stay valid however old they are. With
+config.release_check_interval set, the check runs automatically before cached answers are used once the last check
+is older than that many seconds.
+
+The check itself always asks the API, its answers are neither taken from nor stored in the caches. The offline
+replica (sync_replica) and stored expression matrices are not touched, sync or persist them again for the datasets
+reported as changed.
+"""
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# local import
+import spongeWebPy.cache as cache
+import spongeWebPy.config as config
+import spongeWebPy.connection as connection
+import spongeWebPy.memo as memo
+import spongeWebPy.metrics as metrics
+
+# columns naming the dataset of a row of the metadata endpoints
+DISEASE_COLUMNS = ("disease_name", "dataset", "dataset.disease_name")
+
+_lock = threading.Lock()
+# time of the last check of this process, None until the stored one was read
+_checked = None
+
+
+def dataset_fingerprints(run_information=False):
+    """
+    Compute the current fingerprint of every dataset from the metadata endpoints, bypassing all caches.
+    :param run_information: Include the run information (SPONGE parameters) of every dataset, which costs one
+                            request per dataset. Default (False) sends two requests in total.
+    :return: A dictionary lower case disease name -> fingerprint (hexadecimal SHA-1).
+    :example: dataset_fingerprints()["kidney clear cell carcinoma"]
+    """
+    return _current_state(run_information)[0]
+
+
+def check_releases(run_information=False):
+    """
+    Remove the cached answers of datasets that were rebuilt since the last check (requires the response cache).
+    The first check only records the fingerprints.
+    :param run_information: Passed to dataset_fingerprints. Checks with and without it should not be mixed, since
+                            the fingerprints then differ for every dataset.
+    :return: A sorted list of the names of the datasets that changed, appeared or disappeared.
+    :example: enable_cache()
+              check_releases()
+    """
+    global _checked
+    if not config.cache_enabled:
+        raise ValueError("check_releases needs the response cache. Please call enable_cache first.")
+    current, abbreviations = _current_state(run_information)
+    stored, stored_abbreviations, _ = cache.load_fingerprints()
+    changed = []
+    if stored:
+        changed = sorted(disease for disease in set(current) | set(stored) if current.get(disease) !=
+                         stored.get(disease))
+    if changed:
+        # entries requested by abbreviation belong to the dataset as well
+        names = set(changed)
+        names |= {known[disease] for known in (abbreviations, stored_abbreviations) for disease in changed
+                  if disease in known}
+        cache.invalidate_diseases(sorted(names))
+        memo.forget_diseases(sorted(names))
+    cache.store_fingerprints(current, abbreviations)
+    _checked = time.time()
+    return changed
+
+
+def check_if_due():
+    """
+    Run check_releases if config.release_check_interval is set and the last check (of any process using the cache
+    database) is older. Errors of the check are not raised, the cached answers are then used as they are.
+    """
+    global _checked
+    interval = config.release_check_interval
+    if interval is None or not config.cache_enabled:
+        return
+    if _checked is not None and time.time() - _checked < interval:
+        return
+    # a single check at a time, other requests meanwhile use the cache as it is
+    if not _lock.acquire(blocking=False):
+        return
+    try:
+        if _checked is None:
+            _checked = cache.load_fingerprints()[2] or 0.0
+        if time.time() - _checked >= interval:
+            # also after a failure, the next attempt waits for the interval
+            _checked = time.time()
+            try:
+                check_releases()
+            except (connection.APIError, ValueError, OSError):
+                pass
+    finally:
+        _lock.release()
+
+
+def _current_state(run_information):
+    # the fingerprints and the abbreviations of all datasets
+    rows = {}
+    abbreviations = {}
+    for endpoint in ("getOverallCounts", "dataset"):
+        data = _download(endpoint)
+        _collect(rows, endpoint, data)
+        if "disease_name_abbreviation" in data.columns:
+            for disease, abbreviation in zip(data["disease_name"], data["disease_name_abbreviation"]):
+                if isinstance(abbreviation, str) and abbreviation:
+                    abbreviations[str(disease).lower()] = abbreviation.lower()
+    if run_information:
+        with ThreadPoolExecutor(max_workers=max(1, min(config.concurrency, len(rows)))) as executor:
+            answers = list(executor.map(lambda disease: _download("dataset/runInformation",
+                                                                  {"disease_name": disease}), sorted(rows)))
+        for disease, answer in zip(sorted(rows), answers):
+            # fuzzy search, only the rows of the dataset itself count
+            _collect(rows, "dataset/runInformation", answer, only=disease)
+    fingerprints = {disease: hashlib.sha1(json.dumps(sorted(parts), default=str).encode("utf-8")).hexdigest()
+                    for disease, parts in rows.items()}
+    return fingerprints, abbreviations
+
+
+def _download(endpoint, params=None):
+    # a plain request, memo, cache and coalescing might hand out answers of the previous release
+    with metrics.request(endpoint, params):
+        response = connection.get_session().get('{0}{1}'.format(config.api_url_base, endpoint), params=params,
+                                                timeout=config.timeout)
+        metrics.set_source("api", response.status_code)
+        connection.count_transfer(response.content, response.raw.tell())
+        return connection.build_frame(response.status_code, response.content)
+
+
+def _collect(rows, endpoint, data, only=None):
+    # adds the rows of an answer, as sorted JSON texts, to the parts of their dataset
+    column = next((name for name in DISEASE_COLUMNS if name in data.columns), None)
+    if column is None:
+        raise connection.APIError("The answer of " + endpoint + " names no dataset.")
+    for record in data.to_dict(orient="records"):
+        disease = str(record[column]).lower()
+        if only is None or disease == only:
+            rows.setdefault(disease, []).append(endpoint + json.dumps(record, sort_keys=True, default=str))
@@ -0,0 +1,290 @@
+"""
+Local offline replica of the SPONGE interaction tables
+
+sync_replica() mirrors the results of ceRNAInteraction/findAll, findceRNA and miRNAInteraction/findSpecific into a
+SQLite database with indexes on the identifier, disease and p-value columns. With config.backend = "replica",
+get_all_ceRNAInteractions, get_ceRNA and get_specific_miRNAInteraction answer from this database instead of the API,
+applying pValue/pValueDirection, mscor, correlation, sorting, limit and offset locally (see spongeWebPy.filters).
+The replica only holds the rows that were synced. The filters of every sync are recorded per dataset, and queries
+that ask for rows outside of them (e.g. a higher pValue, another dataset) raise a ReplicaCoverageError instead of
+returning the synced subset.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import pandas
+
+# local import
+import spongeWebPy.cache as cache
+import spongeWebPy.config as config
+import spongeWebPy.connection as connection
+import spongeWebPy.filters as filters
+import spongeWebPy.pagination as pagination
+
+# endpoint -> table name in the replica database
+TABLES = {"ceRNAInteraction/findAll": "ceRNA_interactions",
+          "findceRNA": "ceRNAs",
+          "miRNAInteraction/findSpecific": "miRNA_interactions"}
+
+# column suffixes that are indexed
+INDEXED = ("ensg_number", "gene_symbol", "disease_name", "p_value", "mir_ID", "hs_nr")
+
+_local = threading.local()
+
+
+class ReplicaCoverageError(ValueError):
+    """
+    Raised when a query asks for rows the replica did not sync.
+    """
+
+
+def replica_path():
+    """
+    Return the path of the replica database, config.replica_path or replica.sqlite in the per-user cache directory.
+    """
+    if config.replica_path is not None:
+        return config.replica_path
+    return os.path.join(cache.default_cache_dir(), "replica.sqlite")
+
+
+def _connect():
+    # one SQLite connection per thread and database file
+    path = replica_path()
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    db = connections.get(path)
+    if db is None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(path, timeout=30)
+        db.execute("CREATE TABLE IF NOT EXISTS replica_tables (endpoint TEXT PRIMARY KEY, table_name TEXT NOT NULL, "
+                   "synced REAL NOT NULL)")
+        db.execute("CREATE TABLE IF NOT EXISTS replica_columns (table_name TEXT NOT NULL, column_name TEXT NOT NULL, "
+                   "dtype TEXT NOT NULL, PRIMARY KEY (table_name, column_name))")
+        db.execute("CREATE TABLE IF NOT EXISTS replica_syncs (endpoint TEXT NOT NULL, params TEXT NOT NULL)")
+        connections[path] = db
+    return db
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def sync_replica(disease_name=None, endpoints=None, concurrency=None, **params):
+    """
+    Download interaction tables and store them in the local replica database.
+    Rows already stored for the synced datasets are replaced, other datasets are kept.
+    :param disease_name: The name of the dataset of interest as string or a list of names.
+                         If default (None) is set, all available datasets are synced (get_ceRNA requires a name).
+    :param endpoints: List of endpoints to mirror. Default are all endpoints in TABLES
+                      ("ceRNAInteraction/findAll", "findceRNA", "miRNAInteraction/findSpecific").
+    :param concurrency: Number of page requests kept in flight at the same time. Default is config.concurrency.
+    :param params: Further filter parameters applied while downloading, e.g. pValue = 0.2. Leaving out pValue keeps
+                   the default threshold (0.05) of the query functions. The replica only answers queries within
+                   these filters.
+    :return: Dictionary with the number of synced rows per endpoint.
+    :example: sync_replica(disease_name = "kidney clear cell carcinoma", endpoints = ["ceRNAInteraction/findAll"])
+    """
+    from spongeWebPy.all_ceRNAInteraction import get_all_ceRNAInteractions
+    from spongeWebPy.specific_ceRNA import get_ceRNA
+    from spongeWebPy.specific_miRNAInteraction import get_specific_miRNAInteraction
+    functions = {"ceRNAInteraction/findAll": get_all_ceRNAInteractions,
+                 "findceRNA": get_ceRNA,
+                 "miRNAInteraction/findSpecific": get_specific_miRNAInteraction}
+
+    def download(function):
+        # always ask the API, even while config.backend is "replica"
+        def page(**page_params):
+            return connection.send_request(*connection.prepare(function, **page_params))
+        return page
+
+    if concurrency is None:
+        concurrency = config.concurrency
+    counts = {}
+    db = _connect()
+    for endpoint in endpoints or list(TABLES):
+        if endpoint not in TABLES:
+            raise ValueError("Endpoint " + endpoint + " can not be mirrored. Possible values are " +
+                             ", ".join(TABLES) + ".")
+        table = TABLES[endpoint]
+        counts[endpoint] = 0
+        cleared = set()
+        sync_params = _sync_params(endpoint, params)
+        diseases = disease_name if isinstance(disease_name, (list, tuple)) else [disease_name]
+        # the filters as sent, including the defaults of the query function
+        synced = [_filters(connection.prepare(functions[endpoint], disease_name=disease, **sync_params).params)
+                  for disease in diseases]
+        with db:
+            for page in _download_pages(download(functions[endpoint]), diseases, concurrency, sync_params):
+                _prepare_table(db, table, page)
+                disease_columns = filters.columns(page.columns, "disease_name")
+                if disease_columns:
+                    # replace what an earlier sync stored for these datasets
+                    for disease in set(page[disease_columns[0]]) - cleared:
+                        db.execute("DELETE FROM " + _quote(table) + " WHERE " + _quote(disease_columns[0]) + " = ?",
+                                   (disease,))
+                        cleared.add(disease)
+                page.to_sql(table, db, if_exists="append", index=False)
+                counts[endpoint] += len(page)
+            _record_syncs(db, endpoint, synced, cleared)
+            db.execute("INSERT OR REPLACE INTO replica_tables (endpoint, table_name, synced) VALUES (?, ?, ?)",
+                       (endpoint, table, time.time()))
+    return counts
+
+
+def _download_pages(function, diseases, concurrency, params):
+    # datasets of a list are downloaded one after the other, without the "disease" column of multi-disease queries
+    for disease in diseases:
+        for page in pagination.iter_pages(function, page_size=config.max_page_size, concurrency=concurrency,
+                                          disease_name=disease, **params):
+            yield page
+
+
+def _sync_params(endpoint, params):
+    # the pValue direction etc. only exist for the interaction endpoints
+    known = set(filters.ENDPOINTS[endpoint]["match"]) | set(filters.ENDPOINTS[endpoint]["thresholds"])
+    known |= {direction for _, direction in filters.ENDPOINTS[endpoint]["thresholds"].values()}
+    return {key: value for key, value in params.items() if key in known}
+
+
+def _filters(params):
+    # the parameters of a request that select its rows
+    return {key: value for key, value in (params or {}).items() if value is not None and key not in filters.PAGING}
+
+
+def _record_syncs(db, endpoint, synced, replaced):
+    # an earlier sync stays valid if the new one replaced none of its datasets or stored at least its rows for them
+    kept = []
+    for (params,) in db.execute("SELECT params FROM replica_syncs WHERE endpoint = ?", (endpoint,)):
+        earlier = json.loads(params)
+        if earlier in synced:
+            continue
+        term = earlier.get("disease_name")
+        touched = [disease for disease in replaced if term is None or str(term).lower() in str(disease).lower()]
+        if not touched or all(filters.subsumes(endpoint, _without_disease(new), _without_disease(earlier))
+                              for new in synced):
+            kept.append(earlier)
+    db.execute("DELETE FROM replica_syncs WHERE endpoint = ?", (endpoint,))
+    db.executemany("INSERT INTO replica_syncs (endpoint, params) VALUES (?, ?)",
+                   [(endpoint, json.dumps(params, sort_keys=True)) for params in kept + synced])
+
+
+def _without_disease(params):
+    return {key: value for key, value in params.items() if key != "disease_name"}
+
+
+def synced_filters(endpoint):
+    """
+    Filters of the syncs the replica holds the rows of.
+    :param endpoint: Path of the endpoint relative to config.api_url_base (one of TABLES).
+    :return: A list of dictionaries of query parameters, one per synced dataset (disease_name None for all).
+    """
+    return [json.loads(params) for (params,) in
+            _connect().execute("SELECT params FROM replica_syncs WHERE endpoint = ?", (endpoint,))]
+
+
+def _prepare_table(db, table, page):
+    # create the table with the column layout of the first page, add columns that show up later
+    stored = [row[0] for row in db.execute("SELECT column_name FROM replica_columns WHERE table_name = ?", (table,))]
+    exists = db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+    if exists is None:
+        stored = []
+        db.execute("DELETE FROM replica_columns WHERE table_name = ?", (table,))
+        page.head(0).to_sql(table, db, index=False)
+    for column in page.columns:
+        if column not in stored:
+            if exists is not None:
+                db.execute("ALTER TABLE " + _quote(table) + " ADD COLUMN " + _quote(column))
+            db.execute("INSERT OR REPLACE INTO replica_columns (table_name, column_name, dtype) VALUES (?, ?, ?)",
+                       (table, column, str(page[column].dtype)))
+            if any(filters.columns([column], suffix) for suffix in INDEXED):
+                db.execute("CREATE INDEX IF NOT EXISTS " + _quote(table + "_" + column) + " ON " + _quote(table) +
+                           " (" + _quote(column) + ")")
+
+
+def synced_endpoints():
+    """
+    Endpoints available in the replica database.
+    :return: Dictionary endpoint -> time of the last sync (seconds since the epoch).
+    """
+    return {endpoint: synced for endpoint, synced in _connect().execute("SELECT endpoint, synced FROM replica_tables")}
+
+
+def query(endpoint, params=None):
+    """
+    Answer a request from the replica database with the filter semantics of the API.
+    :param endpoint: Path of the endpoint relative to config.api_url_base (one of TABLES).
+    :param params: Dictionary of query parameters as built by the endpoint function.
+    :return: A pandas dataframe with the same columns as the API answer.
+    """
+    params = params or {}
+    db = _connect()
+    if endpoint not in TABLES or endpoint not in synced_endpoints():
+        raise ValueError("Endpoint " + endpoint + " is not available in the replica. Please run sync_replica first.")
+    unknown = filters.unsupported(endpoint, params)
+    if unknown:
+        raise ValueError("The replica can not answer requests with the parameter(s) " + ", ".join(unknown) + ".")
+    synced = synced_filters(endpoint)
+    if not any(filters.subsumes(endpoint, sync, params) for sync in synced):
+        raise ReplicaCoverageError("The replica did not sync the rows of this request (" +
+                                   json.dumps(_filters(params), sort_keys=True, default=str) + "). Synced: " +
+                                   ("; ".join(json.dumps(sync, sort_keys=True) for sync in synced) or "nothing") +
+                                   ". Please run sync_replica with these filters or set config.backend = 'api'.")
+
+    table = TABLES[endpoint]
+    spec = filters.ENDPOINTS[endpoint]
+    dtypes = dict(db.execute("SELECT column_name, dtype FROM replica_columns WHERE table_name = ? ORDER BY rowid",
+                             (table,)))
+    names = list(dtypes)
+
+    conditions = []
+    arguments = []
+    for key, (suffix, kind) in spec["match"].items():
+        value = params.get(key)
+        if value is None:
+            continue
+        matches = [_quote(column) for column in filters.columns(names, suffix)]
+        if kind == "like":
+            alternatives = [column + " LIKE ?" for column in matches]
+            arguments += ["%" + str(value) + "%"] * len(matches)
+        elif kind == "in":
+            values = filters.identifiers(value)
+            alternatives = [column + " IN (" + ",".join("?" * len(values)) + ")" for column in matches]
+            arguments += values * len(matches)
+        else:
+            alternatives = [column + " = ?" for column in matches]
+            arguments += [str(value)] * len(matches)
+        conditions.append("(" + " OR ".join(alternatives or ["0"]) + ")")
+    for key, (suffix, direction) in spec["thresholds"].items():
+        value = params.get(key)
+        if value is None:
+            continue
+        operator = filters.threshold_operator(direction, params)
+        for column in filters.columns(names, suffix):
+            conditions.append(_quote(column) + " " + operator + " ?")
+            arguments.append(float(value))
+
+    sql = "SELECT * FROM " + _quote(table)
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    order = []
+    if params.get("sorting") is not None:
+        for column in filters.columns(names, spec["sorting"][params["sorting"]]):
+            order.append(_quote(column) + (" ASC" if str(params.get("descending")) == "False" else " DESC"))
+    sql += " ORDER BY " + ", ".join(order + ["rowid"])
+    if params.get("limit") is not None or params.get("offset") is not None:
+        sql += " LIMIT ? OFFSET ?"
+        arguments += [-1 if params.get("limit") is None else int(params["limit"]), int(params.get("offset") or 0)]
+
+    data = pandas.read_sql_query(sql, db, params=arguments)
+    if len(data) == 0:
+        raise connection.EmptyResponseError("Replica response is empty. Reason: no stored rows fit the parameters.")
+    for column, dtype in dtypes.items():
+        if dtype == "bool" and column in data:
+            data[column] = data[column].astype(bool)
+    return data[names]
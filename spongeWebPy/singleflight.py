@@ -0,0 +1,110 @@
+"""
+Coalescing of concurrent identical requests
+
+While a request is outstanding, identical requests (same endpoint and normalized parameters, see cache.request_key)
+from other threads or coroutines of the same event loop do not hit the API again: they wait for the outstanding one
+and each receive their own copy of its result, or its error. Switch it off with config.coalesce_requests = False.
+"""
+import asyncio
+import threading
+import weakref
+from concurrent.futures import Future
+
+# local import
+import spongeWebPy.cache as cache
+import spongeWebPy.config as config
+import spongeWebPy.metrics as metrics
+
+_calls = {}
+_lock = threading.Lock()
+# outstanding requests of the coroutines, per event loop
+_async_calls = weakref.WeakKeyDictionary()
+
+
+class _Call:
+    # an outstanding request, the number of callers waiting for it and, for coroutines, of all that joined it
+
+    def __init__(self, future):
+        self.future = future
+        self.waiters = 0
+        self.joined = 0
+
+
+def _copy(data):
+    return None if data is None else data.copy(deep=True)
+
+
+def run(endpoint, params, function):
+    """
+    Call function once for all identical requests issued by concurrent threads.
+    :param endpoint: Path of the endpoint relative to config.api_url_base.
+    :param params: Dictionary of query parameters.
+    :param function: Function without parameters sending the request and returning a pandas dataframe.
+    :return: The result of function, a private copy of it for every caller that joined an outstanding request.
+    """
+    if not config.coalesce_requests:
+        return function()
+    key = cache.request_key(endpoint, params)
+    with _lock:
+        call = _calls.get(key)
+        if call is None:
+            call = _calls[key] = _Call(Future())
+            leader = True
+        else:
+            call.waiters += 1
+            leader = False
+    if not leader:
+        metrics.count(endpoint, "coalesced")
+        return _copy(call.future.result())
+
+    try:
+        data = function()
+    except BaseException as error:
+        with _lock:
+            del _calls[key]
+        call.future.set_exception(error)
+        raise
+    with _lock:
+        # no caller can join any more, the waiters share a snapshot the leader's caller cannot modify
+        del _calls[key]
+        shared = call.waiters > 0
+    call.future.set_result(_copy(data) if shared else None)
+    return data
+
+
+async def run_async(endpoint, params, function):
+    """
+    Asynchronous version of run for the coroutines of one event loop.
+    :param endpoint: Path of the endpoint relative to config.api_url_base.
+    :param params: Dictionary of query parameters.
+    :param function: Coroutine function without parameters sending the request.
+    :return: The result of function, a private copy of it for every caller that joined an outstanding request.
+    """
+    if not config.coalesce_requests:
+        return await function()
+    loop = asyncio.get_running_loop()
+    calls = _async_calls.get(loop)
+    if calls is None:
+        calls = _async_calls[loop] = {}
+    key = cache.request_key(endpoint, params)
+    call = calls.get(key)
+    if call is None:
+        # the request runs in its own task, so that cancelling the caller that started it does not cancel it for
+        # the others
+        call = calls[key] = _Call(loop.create_task(function()))
+        call.future.add_done_callback(lambda _: calls.pop(key) if calls.get(key) is call else None)
+    else:
+        metrics.count(endpoint, "coalesced")
+    call.waiters += 1
+    call.joined += 1
+    try:
+        data = await asyncio.shield(call.future)
+    except asyncio.CancelledError:
+        if not call.future.done() and call.waiters == 1:
+            # nobody else waits for the request any more
+            call.future.cancel()
+        raise
+    finally:
+        call.waiters -= 1
+    # a private copy for every caller if the result is shared
+    return data if call.joined == 1 else _copy(data)
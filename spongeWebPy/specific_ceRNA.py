@@ -1,9 +1,6 @@
-import json
-import requests
-from pandas import json_normalize
-
 # local import
-import spongeWebPy.config as config
+import spongeWebPy.connection as connection
+import spongeWebPy.pagination as pagination
 
 def get_ceRNA(disease_name,
               gene_type=None,
@@ -21,6 +18,7 @@ def get_ceRNA(disease_name,
     :param disease_name: The name of the dataset of interest as string.
                          If default (None) is set, all available datasets with corresponding information are shown.
                          Fuzzy search is available (e.g. "kidney clear cell carcinoma" or just "kidney").
+                         A list of names queries all of these datasets concurrently and adds a "disease" column.
     :param ensg_number: A list of ensg number(s). If ensg_number is set, gene_symbol must be None.
     :param gene_symbol: A list of gene symbol(s). If gene_symbol is set, ensg_number must be None.
     :param gene_type: String that defines the type of gene of interest. One out of
@@ -72,19 +70,25 @@ def get_ceRNA(disease_name,
 
     # Add list type parameters
     if ensg_number is not None:
-        params.update({"ensg_number": ",".join(ensg_number)})
+        params.update({"ensg_number": ensg_number})
     if gene_symbol is not None:
-        params.update({"gene_symbol": ",".join(gene_symbol)})
-
-    api_url = '{0}/findceRNA'.format(config.api_url_base)
+        params.update({"gene_symbol": gene_symbol})
 
-    response = requests.get(api_url, headers=config.headers, params=params)
+    return connection.api_request('findceRNA', params)
 
-    json_dicts = json.loads(response.content.decode('utf-8'))
-    data = json_normalize(json_dicts)
 
-    if response.status_code == 200:
-        return data
-    else:
-        if response.status_code == 404:
-            raise ValueError("API response is empty. Reason: " + data["detail"].values)
+def iter_ceRNA(page_size=1000, offset=None, concurrency=1, **params):
+    """
+    Iterate page by page over all ceRNAs in a disease of interest satisfying the filter parameters.
+    Iteration stops cleanly after the last page.
+    :param page_size: Number of results per page. Default value is 1000, which is also the maximum.
+    :param offset: Starting point from where results should be shown.
+    :param concurrency: Number of page requests kept in flight at the same time. Default 1 fetches page by page,
+                        higher values prefetch the following pages on a thread pool. Pages are yielded in order.
+    :param params: Further parameters of get_ceRNA (all except limit and offset).
+    :return: A generator yielding one pandas dataframe per page.
+    :example: for page in iter_ceRNA(disease_name = "kidney clear cell carcinoma", gene_type = "lincRNA"):
+                  print(page.shape)
+    """
+    return pagination.iter_pages(get_ceRNA, page_size=page_size, offset=offset,
+                                 concurrency=concurrency, **params)
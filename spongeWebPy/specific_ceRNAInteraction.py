@@ -1,9 +1,6 @@
-import json
-import requests
-from pandas import json_normalize
-
 # local import
-import spongeWebPy.config as config
+import spongeWebPy.connection as connection
+import spongeWebPy.pagination as pagination
 
 def get_specific_ceRNAInteractions(disease_name=None,
                                    ensg_number=None,
@@ -11,12 +8,14 @@ def get_specific_ceRNAInteractions(disease_name=None,
                                    pValue=0.05,
                                    pValueDirection="<",
                                    limit=100,
-                                   offset=None):
+                                   offset=None,
+                                   compact=None):
     """
     Get all interactions between the given identifiers (ensg_number or gene_symbol).
     :param disease_name: The name of the dataset of interest as string.
                          If default (None) is set, all available datasets with corresponding information are shown.
                          Fuzzy search is available (e.g. "kidney clear cell carcinoma" or just "kidney").
+                         A list of names queries all of these datasets concurrently and adds a "disease" column.
     :param ensg_number: A list of ensg number(s). If ensg_number is set, gene_symbol must be None.
     :param gene_symbol: A list of gene symbol(s). If gene_symbol is set, ensg_number must be None.
     :param pValue: Threshold of the FDR adjusted p-value. Default is 0.05.
@@ -25,6 +24,8 @@ def get_specific_ceRNAInteractions(disease_name=None,
     :param limit: Number of results that should be shown. Default value is 100 and can be up to 1000.
                   For more results please use batches, the provided offset parameter or download the whole dataset.
     :param offset: Starting point from where results should be shown.
+    :param compact: If True, return memory-compact column types: categoricals for repeated identifiers, float32 for
+                    statistics and small integer types. Default (None) follows config.compact.
     :return: A pandas dataframe containing all interactions between genes of interest.
              If empty return value will be the reason for failure.
     :example: get_specific_ceRNAInteractions(disease_name = "pancancer",
@@ -40,19 +41,26 @@ def get_specific_ceRNAInteractions(disease_name=None,
 
     # Add list type parameters
     if ensg_number is not None:
-        params.update({"ensg_number": ",".join(ensg_number)})
+        params.update({"ensg_number": ensg_number})
     if gene_symbol is not None:
-        params.update({"gene_symbol": ",".join(gene_symbol)})
-
-    api_url = '{0}ceRNAInteraction/findSpecific'.format(config.api_url_base)
+        params.update({"gene_symbol": gene_symbol})
 
-    response = requests.get(api_url, headers=config.headers, params=params)
+    return connection.api_request('ceRNAInteraction/findSpecific', params, compact=compact)
 
-    json_dicts = json.loads(response.content.decode('utf-8'))
-    data = json_normalize(json_dicts)
 
-    if response.status_code == 200:
-        return data
-    else:
-        if response.status_code == 404:
-            raise ValueError("API response is empty. Reason: " + data["detail"].values)
\ No newline at end of file
+def iter_specific_ceRNAInteractions(page_size=1000, offset=None, concurrency=1, **params):
+    """
+    Iterate page by page over all interactions between the given identifiers (ensg_number or gene_symbol).
+    Iteration stops cleanly after the last page.
+    :param page_size: Number of results per page. Default value is 1000, which is also the maximum.
+    :param offset: Starting point from where results should be shown.
+    :param concurrency: Number of page requests kept in flight at the same time. Default 1 fetches page by page,
+                        higher values prefetch the following pages on a thread pool. Pages are yielded in order.
+    :param params: Further parameters of get_specific_ceRNAInteractions (all except limit and offset).
+    :return: A generator yielding one pandas dataframe per page.
+    :example: for page in iter_specific_ceRNAInteractions(disease_name = "pancancer",
+                                                         gene_symbol = ["PTENP1","VCAN","FN1"]):
+                  print(page.shape)
+    """
+    return pagination.iter_pages(get_specific_ceRNAInteractions, page_size=page_size, offset=offset,
+                                 concurrency=concurrency, **params)
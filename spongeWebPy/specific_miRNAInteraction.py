@@ -1,9 +1,6 @@
-import json
-import requests
-from pandas import json_normalize
-
 # local import
-import spongeWebPy.config as config
+import spongeWebPy.connection as connection
+import spongeWebPy.pagination as pagination
 
 def get_specific_miRNAInteraction(disease_name = None,
                                   mimat_number = None,
@@ -15,12 +12,14 @@ def get_specific_miRNAInteraction(disease_name = None,
                               correlation=None,
                               correlationDirection="<",
                                   limit = 100,
-                                  offset = None):
+                                  offset = None,
+                                  compact = None):
     """
     Get all ceRNA interactions where miRNA(s) of interest (different identifiers available - e.g. hs number or mimat number) contribute to.
     :param disease_name: The name of the dataset of interest as string.
                          If default (None) is set, all available datasets with corresponding information are shown.
                          Fuzzy search is available (e.g. "kidney clear cell carcinoma" or just "kidney").
+                         A list of names queries all of these datasets concurrently and adds a "disease" column.
     :param mimat_number: Mimat_number of interest. If mimat_number is set, hs_number must be None.
     :param hs_number: hs_number of interest. If hs_number is set, mimat_number must be None.
     :param limit: Number of results that should be shown. Default value is 100 and can be up to 1000.
@@ -35,6 +34,8 @@ def get_specific_miRNAInteraction(disease_name = None,
     :param correlationDirection: Direction of the correlation threshold (<, >). Must be set if pValue is set.
                                  Possible values are: "<", ">".
     :param offset: Starting point from where results should be shown.
+    :param compact: If True, return memory-compact column types: categoricals for repeated identifiers, float32 for
+                    statistics and small integer types. Default (None) follows config.compact.
     :return: A pandas dataframe containing all ceRNA interactions fitting the parameters.
              If empty return value will be the reason for failure.
     :example: get_specific_miRNAInteraction(disease_name = "kidney clear cell carcinoma",
@@ -47,15 +48,22 @@ def get_specific_miRNAInteraction(disease_name = None,
               "correlationDirection":correlationDirection,
               "limit": limit, "offset": offset}
 
-    api_url = '{0}miRNAInteraction/findSpecific'.format(config.api_url_base)
-
-    response = requests.get(api_url, headers=config.headers, params=params)
+    return connection.api_request('miRNAInteraction/findSpecific', params, compact=compact)
 
-    json_dicts = json.loads(response.content.decode('utf-8'))
-    data = json_normalize(json_dicts)
 
-    if response.status_code == 200:
-        return data
-    else:
-        if response.status_code == 404:
-            raise ValueError("API response is empty. Reason: " + data["detail"].values)
\ No newline at end of file
+def iter_specific_miRNAInteraction(page_size=1000, offset=None, concurrency=1, **params):
+    """
+    Iterate page by page over all ceRNA interactions where miRNA(s) of interest contribute to.
+    Iteration stops cleanly after the last page.
+    :param page_size: Number of results per page. Default value is 1000, which is also the maximum.
+    :param offset: Starting point from where results should be shown.
+    :param concurrency: Number of page requests kept in flight at the same time. Default 1 fetches page by page,
+                        higher values prefetch the following pages on a thread pool. Pages are yielded in order.
+    :param params: Further parameters of get_specific_miRNAInteraction (all except limit and offset).
+    :return: A generator yielding one pandas dataframe per page.
+    :example: for page in iter_specific_miRNAInteraction(disease_name = "kidney clear cell carcinoma",
+                                                        mimat_number = "MIMAT0000076"):
+                  print(page.shape)
+    """
+    return pagination.iter_pages(get_specific_miRNAInteraction, page_size=page_size, offset=offset,
+                                 concurrency=concurrency, **params)
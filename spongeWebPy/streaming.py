@@ -0,0 +1,150 @@
+"""
+Stream large answers as a sequence of dataframe chunks
+
+The answer is parsed while it is read from the socket (see decoding.ArrayDecoder) and handed out in dataframes of
+at most chunk_size rows, so the memory needed is proportional to the chunk size and not to the size of the answer.
+Streamed answers bypass the response cache and the coalescing of identical requests.
+"""
+import pandas
+
+# local import
+import spongeWebPy.config as config
+import spongeWebPy.connection as connection
+import spongeWebPy.decoding as decoding
+import spongeWebPy.identifiers as identifiers
+import spongeWebPy.metrics as metrics
+
+# bytes read from the socket at a time
+_read_size = 64 * 1024
+
+
+def iter_chunks(function, *args, chunk_size=None, **kwargs):
+    """
+    Call an endpoint function in streaming mode and yield its result in chunks.
+    :param function: Endpoint function that maps to a single API request (e.g. get_mirnaExprValues).
+    :param args: Positional parameters for function.
+    :param chunk_size: Maximal number of rows per chunk. Default (None) follows config.stream_chunk_size.
+    :param kwargs: Keyword parameters for function.
+                   A list of disease names is streamed one dataset after the other; every chunk then gets an
+                   additional first column "disease" and datasets without results are reported with a
+                   PartialResultWarning.
+    :return: A generator yielding pandas dataframes with at most chunk_size rows each, numbered consecutively.
+             Identifier lists that are split into several requests (see config.chunk_size) are streamed one request
+             after the other, rows found through two of them are not removed. Compact chunks have categories of
+             their own, pandas.concat of such chunks returns object columns where the categories differ.
+    :example: for chunk in iter_chunks(get_mirnaExprValues, "kidney clear cell carcinoma", chunk_size = 50000):
+                  print(chunk.shape)
+    """
+    if chunk_size is None:
+        chunk_size = config.stream_chunk_size
+    if chunk_size < 1:
+        raise ValueError("chunk_size: " + str(chunk_size) + " must be at least 1.")
+    # validates the parameters before the first chunk is requested
+    request = connection.prepare(function, *args, **kwargs)
+    if request.params is not None and isinstance(request.params.get("disease_name"), (list, tuple)):
+        return _stream_diseases(request, chunk_size)
+    return _stream(request, chunk_size)
+
+
+def _stream_diseases(request, chunk_size):
+    diseases = list(request.params["disease_name"])
+    if not diseases:
+        raise ValueError("disease_name: at least one dataset name is required.")
+    failures = {}
+    for disease in diseases:
+        found = False
+        try:
+            for chunk in _stream(request._replace(params=dict(request.params, disease_name=disease)), chunk_size):
+                chunk.insert(0, "disease", disease, allow_duplicates=True)
+                found = True
+                yield chunk
+        except Exception as error:
+            failures[disease] = error
+        else:
+            if not found:
+                failures[disease] = connection.EmptyResponseError("API response is empty. Reason: no data for " +
+                                                                  str(disease) + ".")
+    if len(failures) == len(diseases):
+        raise failures[diseases[0]]
+    connection.report_failures(failures, len(diseases))
+
+
+def _stream(request, chunk_size):
+    data = connection.answer_locally(request.endpoint, request.params)
+    if data is not None:
+        # the local backend holds the complete result already
+        for start in range(0, len(data), chunk_size):
+            yield connection.finish_frame(data.iloc[start:start + chunk_size], request.compact)
+        return
+
+    start = 0
+    empty = None
+    for params in connection.split_params(request.params, request.endpoint):
+        try:
+            for records in _stream_records(request.endpoint, params, request.empty_status, chunk_size):
+                chunk = decoding.records_to_frame(records)
+                identifiers.learn(chunk)
+                chunk.index = pandas.RangeIndex(start, start + len(chunk))
+                start += len(chunk)
+                yield connection.finish_frame(chunk, request.compact)
+        except connection.EmptyResponseError as error:
+            # like a chunked request, the call is only empty if all its requests are
+            empty = empty or error
+    if start == 0 and empty is not None:
+        raise empty
+
+
+def _stream_records(endpoint, params, empty_status, chunk_size):
+    # yields lists of at most chunk_size decoded records while the answer is read; the request is recorded like
+    # buffered ones, but its record is only attached while this generator runs, not while the caller has a chunk
+    record = metrics.start_record(endpoint, params)
+    error = None
+    try:
+        with metrics.recording(record):
+            response = connection.send_with_retries(endpoint, params, stream=True)
+            if response.status_code != 200:
+                with response:
+                    connection.build_frame(response.status_code, response.content, empty_status)
+        with response:
+            decoder = decoding.ArrayDecoder()
+            records = []
+            blocks = response.iter_content(chunk_size=_read_size)
+            try:
+                while True:
+                    with metrics.recording(record):
+                        with metrics.timed("download"):
+                            block = next(blocks, None)
+                        if block is None:
+                            break
+                        with metrics.timed("decode"):
+                            records.extend(decoder.feed(block))
+                    while len(records) >= chunk_size:
+                        _count(record, "rows", chunk_size)
+                        yield records[:chunk_size]
+                        del records[:chunk_size]
+                records.extend(decoder.close())
+            except ValueError as invalid:
+                raise connection.APIError("API response with status 200 is not valid JSON: " + str(invalid), 200)
+            finally:
+                # urllib3 decompresses while reading, tell() is the number of bytes that came over the wire
+                wire_bytes = response.raw.tell()
+                _count(record, "bytes", decoder.size)
+                _count(record, "wire_bytes", wire_bytes)
+                _count(record, "bytes_saved", max(decoder.size - wire_bytes, 0))
+            for offset in range(0, len(records), chunk_size):
+                chunk = records[offset:offset + chunk_size]
+                _count(record, "rows", len(chunk))
+                yield chunk
+    except GeneratorExit:
+        # the caller stopped reading, not a failure of the request
+        raise
+    except BaseException as failure:
+        error = failure
+        raise
+    finally:
+        metrics.finish_record(record, error)
+
+
+def _count(record, name, value):
+    if record is not None:
+        record.add_count(name, value)
@@ -0,0 +1,210 @@
+"""
+Vectorized log-rank tests and Kaplan-Meier curves for many genes at once
+
+get_survAna_pValues asks the server for one gene list at a time and only for its fixed grouping of the patients.
+A SurvivalCohort holds the survival times and events of the patients of a dataset, sorted by time on a shared grid,
+and tests a whole genes x patients group matrix with a few NumPy operations per batch of genes: patients at risk and
+events per time point are counted for every gene with numpy.add.reduceat and a reverse cumulative sum. The groups
+can be the server's over-/underexpression split (get_survAna_rates) or any cutoff of an expression matrix.
+"""
+import math
+
+import numpy
+import pandas
+
+# local import
+from spongeWebPy.matrix import ExpressionMatrix, get_geneExprMatrix
+from spongeWebPy.survivalAnalysis import get_survAna_rates, get_survAna_sampleInformation
+
+# p-value of a chi-square statistic with one degree of freedom, NaN stays NaN
+_erfc = numpy.vectorize(math.erfc, otypes=[numpy.float64])
+
+
+def _chi2_pvalue(chi2):
+    chi2 = numpy.asarray(chi2, dtype=numpy.float64)
+    known = ~numpy.isnan(chi2)
+    pvalues = numpy.full(chi2.shape, numpy.nan)
+    with numpy.errstate(invalid="ignore"):
+        pvalues[known] = _erfc(numpy.sqrt(chi2[known] / 2.0))
+    return pvalues
+
+
+class SurvivalCohort:
+    """
+    Survival times and events of the patients of one dataset.
+    :param samples: Sample ID of every patient.
+    :param time: Survival time of every patient.
+    :param event: 1 (or True) if the event (e.g. death) was observed for the patient, 0 if the time is censored.
+                  Patients without time or event are left out.
+    :example: cohort = SurvivalCohort.from_sample_information(get_survAna_sampleInformation("kidney"))
+              cohort.logrank(cohort.groups(get_geneExprMatrix("kidney", persist = True), cutoff = "median"))
+    """
+
+    def __init__(self, samples, time, event):
+        samples = numpy.asarray(samples)
+        time = numpy.asarray(time, dtype=numpy.float64)
+        event = numpy.asarray(event, dtype=numpy.float64)
+        if not len(samples) == len(time) == len(event):
+            raise ValueError("samples, time and event must have the same length.")
+        known = ~(numpy.isnan(time) | numpy.isnan(event))
+        order = numpy.argsort(time[known], kind="stable")
+        self.samples = samples[known][order]
+        self.time = time[known][order]
+        self.event = event[known][order] > 0
+        # shared grid: the distinct survival times and the position of their first patient
+        self.times, self.starts = numpy.unique(self.time, return_index=True)
+
+    @classmethod
+    def from_sample_information(cls, data, sample="sample_ID", time="survival_time", event="disease_status"):
+        """
+        Build the cohort from get_survAna_sampleInformation (or the patient_information columns of
+        get_survAna_rates, which are found automatically).
+        :param data: A pandas dataframe with one row per patient; duplicated patients are used once.
+        :return: A SurvivalCohort.
+        """
+        if sample not in data.columns and "patient_information." + sample in data.columns:
+            sample, time, event = ("patient_information." + column for column in (sample, time, event))
+        for column in (sample, time, event):
+            if column not in data.columns:
+                raise ValueError("Column " + column + " is missing in the sample information.")
+        patients = data.drop_duplicates(subset=sample)
+        return cls(patients[sample].to_numpy(),
+                   pandas.to_numeric(patients[time], errors="coerce").to_numpy(dtype=numpy.float64),
+                   pandas.to_numeric(patients[event], errors="coerce").to_numpy(dtype=numpy.float64))
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __repr__(self):
+        return "SurvivalCohort(" + str(len(self)) + " patients, " + str(int(self.event.sum())) + " events)"
+
+    def align(self, matrix):
+        """
+        Reorder the columns of an expression matrix to the patients of the cohort.
+        :param matrix: An ExpressionMatrix.
+        :return: A float array features x patients, NaN for patients without a value in matrix.
+        """
+        positions = pandas.Index(matrix.samples).get_indexer(self.samples)
+        values = numpy.asarray(matrix.values, dtype=numpy.float32)[:, numpy.maximum(positions, 0)]
+        values[:, positions < 0] = numpy.nan
+        return values
+
+    def groups(self, matrix, cutoff="mean"):
+        """
+        Split the patients per feature into a high (1) and a low (0) expression group.
+        :param matrix: An ExpressionMatrix, e.g. from get_geneExprMatrix.
+        :param cutoff: "mean" or "median" of every feature over the patients of the cohort, a number between 0 and 1
+                       for a quantile, or an array with one threshold per feature. Values above it count as high.
+        :return: A float array features x patients with 1, 0 and NaN for patients without a value.
+        """
+        values = self.align(matrix)
+        if isinstance(cutoff, str):
+            if cutoff == "mean":
+                thresholds = numpy.nanmean(values, axis=1)
+            elif cutoff == "median":
+                thresholds = numpy.nanmedian(values, axis=1)
+            else:
+                raise ValueError("cutoff: " + cutoff + " is not an allowed value. Possible values are 'mean', "
+                                 "'median', a quantile or one threshold per feature.")
+        elif numpy.ndim(cutoff) == 0:
+            if not 0 < cutoff < 1:
+                raise ValueError("cutoff: the quantile " + str(cutoff) + " must be between 0 and 1.")
+            thresholds = numpy.nanquantile(values, cutoff, axis=1)
+        else:
+            thresholds = numpy.asarray(cutoff, dtype=numpy.float64)
+            if thresholds.shape != (len(values),):
+                raise ValueError("cutoff: one threshold per feature is required.")
+        groups = (values > thresholds[:, None]).astype(numpy.float32)
+        groups[numpy.isnan(values)] = numpy.nan
+        return groups
+
+    def _counts(self, groups):
+        # events and patients at risk per gene and time point, overall and in the high group
+        groups = numpy.asarray(groups)
+        if groups.ndim != 2 or groups.shape[1] != len(self):
+            raise ValueError("groups must have one column per patient of the cohort.")
+        valid = ~numpy.isnan(groups)
+        high = groups > 0.5
+        at_time = numpy.add.reduceat(valid, self.starts, axis=1, dtype=numpy.int32)
+        high_at_time = numpy.add.reduceat(high, self.starts, axis=1, dtype=numpy.int32)
+        events = numpy.add.reduceat(valid & self.event, self.starts, axis=1, dtype=numpy.int32)
+        high_events = numpy.add.reduceat(high & self.event, self.starts, axis=1, dtype=numpy.int32)
+        # patients at risk at a time point: all whose survival time is not shorter
+        at_risk = numpy.cumsum(at_time[:, ::-1], axis=1)[:, ::-1]
+        high_at_risk = numpy.cumsum(high_at_time[:, ::-1], axis=1)[:, ::-1]
+        return at_risk, events, high_at_risk, high_events
+
+    def logrank(self, groups, features=None, batch_size=2048):
+        """
+        Log-rank test of the high against the low group for every row of groups.
+        :param groups: Array features x patients with 1 (high), 0 (low) and NaN (left out), e.g. from groups().
+        :param features: Identifier of every row, used as index of the result. Default numbers the rows.
+        :param batch_size: Number of rows tested at once, bounds the memory of the intermediate arrays.
+        :return: A pandas dataframe with one row per feature: patients (n_high, n_low), observed and expected events
+                 of the high group, the chi-square statistic and its p-value (NaN if the groups cannot be compared).
+        """
+        groups = numpy.asarray(groups, dtype=numpy.float32)
+        columns = {name: numpy.empty(len(groups)) for name in ("n_high", "n_low", "observed_high", "expected_high",
+                                                               "chi2")}
+        for start in range(0, len(groups), batch_size):
+            batch = slice(start, start + batch_size)
+            at_risk, events, high_at_risk, high_events = self._counts(groups[batch])
+            with numpy.errstate(invalid="ignore", divide="ignore"):
+                share = numpy.where(at_risk > 0, high_at_risk / at_risk, 0.0)
+                # hypergeometric variance with the correction for tied event times
+                ties = numpy.where(at_risk > 1, (at_risk - events) / (at_risk - 1.0), 0.0)
+                expected = (events * share).sum(axis=1)
+                variance = (events * share * (1.0 - share) * ties).sum(axis=1)
+                observed = high_events.sum(axis=1)
+                columns["chi2"][batch] = numpy.where(variance > 0, (observed - expected) ** 2 / variance, numpy.nan)
+            columns["n_high"][batch] = high_at_risk[:, 0]
+            columns["n_low"][batch] = at_risk[:, 0] - high_at_risk[:, 0]
+            columns["observed_high"][batch] = observed
+            columns["expected_high"][batch] = expected
+        columns["p_value"] = _chi2_pvalue(columns["chi2"])
+        result = pandas.DataFrame(columns, index=features)
+        return result.astype({"n_high": numpy.int64, "n_low": numpy.int64, "observed_high": numpy.int64})
+
+    def kaplan_meier(self, groups):
+        """
+        Kaplan-Meier survival curves of the high and the low group for every row of groups.
+        :param groups: Array features x patients with 1 (high), 0 (low) and NaN (left out), e.g. from groups().
+        :return: A tuple (times, high, low): the event times of the cohort and two arrays features x event times with
+                 the survival probability of the group right after each time.
+        """
+        at_risk, events, high_at_risk, high_events = self._counts(numpy.asarray(groups, dtype=numpy.float32))
+        observed = numpy.add.reduceat(self.event, self.starts, dtype=numpy.int32) > 0
+        curves = []
+        for group_at_risk, group_events in ((high_at_risk, high_events),
+                                            (at_risk - high_at_risk, events - high_events)):
+            with numpy.errstate(invalid="ignore", divide="ignore"):
+                factor = numpy.where(group_at_risk > 0, 1.0 - group_events / group_at_risk, 1.0)
+            curves.append(numpy.cumprod(factor, axis=1)[:, observed])
+        return self.times[observed], curves[0], curves[1]
+
+
+def logrank_screen(disease_name, ensg_number = None, gene_symbol = None, cutoff = None, persist = False):
+    """
+    Log-rank p-values for many genes computed locally, with one request per endpoint instead of one
+    get_survAna_pValues call per gene list.
+    :param disease_name: The name of the dataset of interest as string.
+                         Fuzzy search is available (e.g. "kidney clear cell carcinoma" or just "kidney").
+    :param ensg_number: A list of ensg number(s). If ensg_number is set, gene_symbol must be None.
+                        Default (None) tests all genes of the dataset.
+    :param gene_symbol: A list of gene symbol(s). If gene_symbol is set, ensg_number must be None.
+    :param cutoff: Default (None) uses the over-/underexpression groups of get_survAna_rates like
+                   get_survAna_pValues. Otherwise the expression values (get_geneExprMatrix) are split at this
+                   cutoff: "mean", "median", a quantile between 0 and 1 or one threshold per gene.
+    :param persist: Passed to get_geneExprMatrix if a cutoff is given.
+    :return: A pandas dataframe indexed by ensg number with the columns of SurvivalCohort.logrank.
+    :example: logrank_screen(disease_name = "kidney clear cell carcinoma", cutoff = 0.75).nsmallest(20, "p_value")
+    """
+    cohort = SurvivalCohort.from_sample_information(get_survAna_sampleInformation(disease_name))
+    if cutoff is None:
+        rates = get_survAna_rates(disease_name, ensg_number=ensg_number, gene_symbol=gene_symbol)
+        matrix = ExpressionMatrix.from_frame(rates, sample="patient_information.sample_ID", value="overexpression")
+        groups = cohort.align(matrix)
+    else:
+        matrix = get_geneExprMatrix(disease_name, ensg_number=ensg_number, gene_symbol=gene_symbol, persist=persist)
+        groups = cohort.groups(matrix, cutoff)
+    return cohort.logrank(groups, features=pandas.Index(matrix.features, name="ensg_number"))
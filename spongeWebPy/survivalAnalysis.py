@@ -1,9 +1,6 @@
-import json
-import requests
-from pandas import json_normalize
-
 #local import
-import spongeWebPy.config as config
+import spongeWebPy.connection as connection
+import spongeWebPy.streaming as streaming
 
 def get_survAna_pValues(disease_name,
                         ensg_number = None,
@@ -13,6 +10,7 @@ def get_survAna_pValues(disease_name,
     :param disease_name: The name of the dataset of interest as string.
                          If default (None) is set, all available datasets with corresponding information are shown.
                          Fuzzy search is available (e.g. "kidney clear cell carcinoma" or just "kidney").
+                         A list of names queries all of these datasets concurrently and adds a "disease" column.
     :param ensg_number: A list of ensg number(s). If ensg_number is set, gene_symbol must be None.
     :param gene_symbol: A list of gene symbol(s). If gene_symbol is set, ensg_number must be None.
     :return: A data_frame with gene information and corresponding log rank test pValue.
@@ -26,22 +24,11 @@ def get_survAna_pValues(disease_name,
 
     # Add list type parameters
     if ensg_number is not None:
-        params.update({"ensg_number": ",".join(ensg_number)})
+        params.update({"ensg_number": ensg_number})
     if gene_symbol is not None:
-        params.update({"gene_symbol": ",".join(gene_symbol)})
-
-    api_url = '{0}survivalAnalysis/getPValues'.format(config.api_url_base)
-
-    response = requests.get(api_url, headers=config.headers, params=params)
+        params.update({"gene_symbol": gene_symbol})
 
-    json_dicts = json.loads(response.content.decode('utf-8'))
-    data = json_normalize(json_dicts)
-
-    if response.status_code == 200:
-        return data
-    else:
-        if response.status_code == 404:
-            raise ValueError("API response is empty. Reason: " + data["detail"].values)
+    return connection.api_request('survivalAnalysis/getPValues', params)
 
 def get_survAna_rates(disease_name,
                       ensg_number = None,
@@ -52,6 +39,7 @@ def get_survAna_rates(disease_name,
     :param disease_name: The name of the dataset of interest as string.
                          If default (None) is set, all available datasets with corresponding information are shown.
                          Fuzzy search is available (e.g. "kidney clear cell carcinoma" or just "kidney").
+                         A list of names queries all of these datasets concurrently and adds a "disease" column.
     :param ensg_number: A list of ensg number(s). If ensg_number is set, gene_symbol must be None.
     :param gene_symbol: A list of gene symbol(s). If gene_symbol is set, ensg_number must be None.
     :param sample_ID: A list of sample_ID of the patient/sample of interest.
@@ -69,24 +57,30 @@ def get_survAna_rates(disease_name,
 
     # Add list type parameters
     if ensg_number is not None:
-        params.update({"ensg_number": ",".join(ensg_number)})
+        params.update({"ensg_number": ensg_number})
     if gene_symbol is not None:
-        params.update({"gene_symbol": ",".join(gene_symbol)})
+        params.update({"gene_symbol": gene_symbol})
     if sample_ID is not None:
-        params.update({"sample_ID": ",".join(sample_ID)})
-
-    api_url = '{0}survivalAnalysis/getRates'.format(config.api_url_base)
-
-    response = requests.get(api_url, headers=config.headers, params=params)
+        params.update({"sample_ID": sample_ID})
 
-    json_dicts = json.loads(response.content.decode('utf-8'))
-    data = json_normalize(json_dicts)
+    return connection.api_request('survivalAnalysis/getRates', params)
 
-    if response.status_code == 200:
-        return data
-    else:
-        if response.status_code == 404:
-            raise ValueError("API response is empty. Reason: " + data["detail"].values)
+def stream_survAna_rates(disease_name,
+                         ensg_number = None,
+                         gene_symbol = None,
+                         sample_ID = None,
+                         chunk_size = None):
+    """
+    Stream the raw survival analysis data in chunks, parsed while the answer arrives, so that a full cohort can be
+    processed with memory proportional to the chunk size.
+    Parameters as for get_survAna_rates, plus:
+    :param chunk_size: Maximal number of rows per chunk. Default (None) follows config.stream_chunk_size.
+    :return: A generator yielding pandas dataframes with at most chunk_size rows each.
+    :example: for chunk in stream_survAna_rates(disease_name="kidney clear cell carcinoma", chunk_size=50000):
+                  print(chunk.shape)
+    """
+    return streaming.iter_chunks(get_survAna_rates, disease_name, ensg_number=ensg_number, gene_symbol=gene_symbol,
+                                 sample_ID=sample_ID, chunk_size=chunk_size)
 
 def get_survAna_sampleInformation(disease_name,
                                   sample_ID = None):
@@ -95,6 +89,7 @@ def get_survAna_sampleInformation(disease_name,
     :param disease_name: The name of the dataset of interest as string.
                          If default (None) is set, all available datasets with corresponding information are shown.
                          Fuzzy search is available (e.g. "kidney clear cell carcinoma" or just "kidney").
+                         A list of names queries all of these datasets concurrently and adds a "disease" column.
 
     :param sample_ID: A list of sample_ID of the patient/sample of interest.
 
@@ -107,17 +102,6 @@ def get_survAna_sampleInformation(disease_name,
 
     # Add list type parameters
     if sample_ID is not None:
-        params.update({"sample_ID": ",".join(sample_ID)})
-
-    api_url = '{0}survivalAnalysis/sampleInformation'.format(config.api_url_base)
-
-    response = requests.get(api_url, headers=config.headers, params=params)
-
-    json_dicts = json.loads(response.content.decode('utf-8'))
-    data = json_normalize(json_dicts)
+        params.update({"sample_ID": sample_ID})
 
-    if response.status_code == 200:
-        return data
-    else:
-        if response.status_code == 404:
-            raise ValueError("API response is empty. Reason: " + data["detail"].values)
\ No newline at end of file
+    return connection.api_request('survivalAnalysis/sampleInformation', params)
\ No newline at end of file
@@ -0,0 +1,216 @@
+"""
+Client-side rate limiting, retries and adaptive concurrency for the API requests
+
+Every request first takes a token from a token bucket (config.rate_limit requests per second, switched off by
+default) and a slot from an AIMD (additive increase, multiplicative decrease) controller that caps the number of
+requests in flight. Connection errors and throttling or server errors (config.retry_statuses) halve the limit, every
+window of successful requests raises it by one again, so parallel jobs settle at the highest concurrency the server
+tolerates. Failed requests are retried up to config.max_retries times with jittered exponential backoff, a
+Retry-After header of the server is honored.
+"""
+import asyncio
+import email.utils
+import random
+import threading
+import time
+
+# local import
+import spongeWebPy.config as config
+
+_lock = threading.Lock()
+_bucket = None
+_controller = None
+_stats = {"retries": 0, "throttled": 0, "errors": 0}
+
+
+class TokenBucket:
+    """
+    Token bucket allowing rate requests per second on average and bursts of up to burst requests.
+    :param rate: Number of tokens added per second.
+    :param burst: Maximal number of stored tokens.
+    """
+
+    def __init__(self, rate, burst):
+        if rate <= 0:
+            raise ValueError("rate: " + str(rate) + " must be positive.")
+        self.rate = float(rate)
+        self.burst = max(float(burst), 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Take a token, possibly ahead of time.
+        :return: Seconds to wait before the reserved token may be used (0 if one was available).
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1.0
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+class ConcurrencyController:
+    """
+    AIMD limit of the number of requests in flight.
+    :param minimum: Lowest limit the controller shrinks to.
+    :param maximum: Highest limit the controller grows to, also the initial limit.
+    """
+
+    def __init__(self, minimum, maximum):
+        if minimum < 1 or maximum < minimum:
+            raise ValueError("Concurrency limits must satisfy 1 <= minimum <= maximum.")
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(maximum)
+        self.in_flight = 0
+        # number of decreases so far, requests started before the last decrease do not shrink the limit again
+        self._epoch = 0
+        self._condition = threading.Condition()
+
+    def try_acquire(self):
+        """
+        Take a slot if the limit allows it.
+        :return: A ticket for release() or None if all slots are taken.
+        """
+        with self._condition:
+            if self.in_flight >= int(self.limit):
+                return None
+            self.in_flight += 1
+            return self._epoch
+
+    def acquire(self):
+        """
+        Wait for a free slot.
+        :return: A ticket for release().
+        """
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+            return self._epoch
+
+    async def acquire_async(self):
+        """
+        Asynchronous version of acquire(). Waits without blocking the event loop.
+        """
+        ticket = self.try_acquire()
+        while ticket is None:
+            await asyncio.sleep(0.01)
+            ticket = self.try_acquire()
+        return ticket
+
+    def release(self, ticket, success):
+        """
+        Give a slot back and adapt the limit.
+        :param ticket: Value returned by acquire().
+        :param success: False if the server was overloaded (connection error, throttling or server error),
+                        True otherwise and None if the request was aborted, which leaves the limit unchanged.
+        """
+        with self._condition:
+            self.in_flight -= 1
+            if success:
+                # one more slot per window of `limit` successful requests
+                self.limit = min(float(self.maximum), self.limit + 1.0 / self.limit)
+            elif success is False and ticket == self._epoch:
+                self.limit = max(float(self.minimum), self.limit / 2.0)
+                self._epoch += 1
+            self._condition.notify_all()
+
+
+def bucket():
+    """
+    Return the token bucket configured by config.rate_limit and config.rate_burst, None if rate limiting is off.
+    """
+    global _bucket
+    if config.rate_limit is None:
+        return None
+    with _lock:
+        if _bucket is None or (_bucket.rate, _bucket.burst) != (float(config.rate_limit), float(config.rate_burst)):
+            _bucket = TokenBucket(config.rate_limit, config.rate_burst)
+        return _bucket
+
+
+def controller():
+    """
+    Return the shared concurrency controller configured by config.min_concurrency and config.max_concurrency.
+    """
+    global _controller
+    with _lock:
+        if _controller is None or (_controller.minimum, _controller.maximum) != (config.min_concurrency,
+                                                                                 config.max_concurrency):
+            _controller = ConcurrencyController(config.min_concurrency, config.max_concurrency)
+        return _controller
+
+
+def rate_delay():
+    """
+    Reserve a token of the rate limiter.
+    :return: Seconds to wait before sending the request.
+    """
+    tokens = bucket()
+    return 0.0 if tokens is None else tokens.reserve()
+
+
+def should_retry(status_code):
+    """
+    Whether an answer with this status code signals an overloaded or failing server.
+    """
+    return status_code in config.retry_statuses
+
+
+def backoff(attempt, retry_after=None):
+    """
+    Waiting time before the next attempt of a failed request: exponential backoff with full jitter,
+    but at least the time requested by the server, up to config.retry_backoff_max.
+    :param attempt: Number of the failed attempt, starting with 0.
+    :param retry_after: Value of the Retry-After header (seconds or HTTP date) or None.
+    :return: Seconds to wait.
+    """
+    delay = random.uniform(0, min(config.retry_backoff_max, config.retry_backoff * 2 ** attempt))
+    server_delay = _parse_retry_after(retry_after)
+    if server_delay is not None:
+        # a large or bogus header must not stall the caller indefinitely
+        delay = max(delay, min(server_delay, config.retry_backoff_max))
+    return delay
+
+
+def _parse_retry_after(value):
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if date is None:
+        return None
+    return max(date.timestamp() - time.time(), 0.0)
+
+
+def count(name):
+    """
+    Count a retry ("retries"), a throttling or server error answer ("throttled") or a connection error ("errors").
+    """
+    with _lock:
+        _stats[name] += 1
+
+
+def throttle_info():
+    """
+    State of the client-side rate limiting.
+    :return: Dictionary with the current concurrency limit, the number of requests in flight and the number of
+             retries, throttling or server error answers and connection errors in this process.
+    """
+    current = controller()
+    with _lock:
+        info = dict(_stats)
+    info.update({"limit": int(current.limit), "in_flight": current.in_flight})
+    return info
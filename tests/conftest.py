@@ -0,0 +1,72 @@
+"""
+Shared fixtures: the stand-in server of the benchmarks, run in this process
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
+
+# records held by every paged endpoint of the test server
+ROWS = 2500
+
+
+@pytest.fixture(scope="session")
+def api():
+    """
+    Point spongeWebPy at a local server answering with ROWS synthetic records per paged query.
+    :return: The base url of the server.
+    """
+    import server
+    import spongeWebPy.config as config
+    import spongeWebPy.connection as connection
+    import spongeWebPy.memo as memo
+
+    instance, url = server.serve(rows=ROWS, latency=0)
+    previous = config.api_url_base
+    config.api_url_base = url
+    connection.reset_session()
+    memo.clear_memo()
+    yield url
+    config.api_url_base = previous
+    connection.reset_session()
+    memo.clear_memo()
+    instance.shutdown()
+    instance.server_close()
+
+
+@pytest.fixture
+def cached(api, tmp_path, monkeypatch):
+    """
+    Switch on the response cache with a fresh database for one test.
+    """
+    import spongeWebPy.config as config
+    import spongeWebPy.memo as memo
+
+    monkeypatch.setattr(config, "cache_path", str(tmp_path / "responses.sqlite"))
+    monkeypatch.setattr(config, "cache_enabled", True)
+    memo.clear_memo()
+    yield
+    memo.clear_memo()
+
+
+@pytest.fixture
+def slow_api(api, monkeypatch):
+    """
+    A second stand-in server whose answers take 0.3 seconds, long enough for concurrent callers to overlap.
+    :return: A list with the RequestRecord of every request sent to the server.
+    """
+    import server
+    import spongeWebPy.config as config
+    import spongeWebPy.metrics as metrics
+
+    instance, url = server.serve(rows=ROWS, latency=0.3)
+    monkeypatch.setattr(config, "api_url_base", url)
+    sent = []
+    metrics.add_request_hook(after=sent.append)
+    yield sent
+    metrics.remove_request_hook(after=sent.append)
+    instance.shutdown()
+    instance.server_close()
@@ -0,0 +1,26 @@
+"""
+Response cache: only valid answers are stored
+"""
+import pytest
+import server
+
+# local import
+import spongeWebPy as sponge
+import spongeWebPy.cache as cache
+import spongeWebPy.connection as connection
+
+DISEASE = "kidney clear cell carcinoma"
+
+
+def test_invalid_answer_is_not_cached(cached, monkeypatch):
+    body = server._body
+    monkeypatch.setattr(server, "_body", lambda endpoint, rows, offset: b"<html>Bad gateway</html>")
+    with pytest.raises(connection.APIError, match="not valid JSON"):
+        sponge.get_all_ceRNAInteractions(disease_name=DISEASE, limit=10)
+    request = connection.prepare(sponge.get_all_ceRNAInteractions, disease_name=DISEASE, limit=10)
+    assert cache.lookup(request.endpoint, request.params) is None
+
+    monkeypatch.setattr(server, "_body", body)
+    data = sponge.get_all_ceRNAInteractions(disease_name=DISEASE, limit=10)
+    assert len(data) == 10
+    assert cache.lookup(request.endpoint, request.params) is not None
@@ -0,0 +1,164 @@
+"""
+Requests against the stand-in server: synchronous and asynchronous parity, pagination and chunk merging
+"""
+import asyncio
+import time
+
+import pandas
+import pytest
+
+# local import
+import spongeWebPy as sponge
+import spongeWebPy.aio as aio
+import spongeWebPy.connection as connection
+import spongeWebPy.pagination as pagination
+from conftest import ROWS
+
+DISEASE = "kidney clear cell carcinoma"
+
+CALLS = [
+    ("get_all_ceRNAInteractions", {"disease_name": DISEASE, "limit": 50, "offset": 100}),
+    ("get_ceRNA", {"disease_name": DISEASE, "gene_type": "lincRNA", "limit": 20}),
+    ("get_specific_ceRNAInteractions", {"disease_name": DISEASE, "gene_symbol": ["GENE1", "GENE2"], "limit": 30}),
+    ("get_geneCount", {"disease_name": DISEASE, "gene_symbol": ["GENE1"]}),
+    ("get_overallCounts", {}),
+]
+
+
+def _run(coroutine):
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await aio.close()
+    return asyncio.run(main())
+
+
+def _counting(function):
+    # wraps an endpoint function, recording the offset of every call
+    offsets = []
+
+    def wrapper(**kwargs):
+        offsets.append(kwargs.get("offset"))
+        return function(**kwargs)
+    return wrapper, offsets
+
+
+@pytest.mark.parametrize("name, kwargs", CALLS)
+def test_prepare_matches_the_request(api, name, kwargs):
+    function = getattr(sponge, name)
+    request = connection.prepare(function, **kwargs)
+    assert isinstance(request, connection.PendingRequest)
+    pandas.testing.assert_frame_equal(connection.api_request(*request), function(**kwargs))
+
+
+@pytest.mark.parametrize("name, kwargs", CALLS)
+def test_aio_matches_sync(api, name, kwargs):
+    expected = getattr(sponge, name)(**kwargs)
+    pandas.testing.assert_frame_equal(_run(getattr(aio, name)(**kwargs)), expected)
+
+
+def test_aio_matches_sync_for_disease_lists(api):
+    kwargs = {"disease_name": [DISEASE, "lung adenocarcinoma"], "limit": 10}
+    expected = sponge.get_all_ceRNAInteractions(**kwargs)
+    assert list(expected["disease"].unique()) == kwargs["disease_name"]
+    pandas.testing.assert_frame_equal(_run(aio.get_all_ceRNAInteractions(**kwargs)), expected)
+
+
+def test_pagination_stops_after_a_short_page(api):
+    function, offsets = _counting(sponge.get_all_ceRNAInteractions)
+    data = sponge.fetch_all(function, page_size=1000, concurrency=1, disease_name=DISEASE)
+    assert len(data) == ROWS
+    assert offsets == [0, 1000, 2000]
+
+
+def test_pagination_stops_at_an_empty_page(api):
+    # the last full page is followed by a single 404
+    function, offsets = _counting(sponge.get_all_ceRNAInteractions)
+    pages = list(pagination.iter_pages(function, page_size=500, disease_name=DISEASE))
+    assert [len(page) for page in pages] == [500] * 5
+    assert offsets == [0, 500, 1000, 1500, 2000, 2500]
+
+
+def test_pagination_raises_for_an_empty_first_page(api):
+    with pytest.raises(connection.EmptyResponseError):
+        sponge.fetch_all(sponge.get_all_ceRNAInteractions, page_size=100, offset=ROWS, disease_name=DISEASE)
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_concurrent_pagination_keeps_the_order(api, concurrency):
+    # the records of the test server depend on the page they are requested with
+    expected = pandas.concat([sponge.get_all_ceRNAInteractions(disease_name=DISEASE, limit=250, offset=offset)
+                              for offset in range(1000, ROWS, 250)], ignore_index=True)
+    data = sponge.fetch_all(sponge.get_all_ceRNAInteractions, page_size=250, offset=1000, concurrency=concurrency,
+                            disease_name=DISEASE)
+    assert len(data) == ROWS - 1000
+    pandas.testing.assert_frame_equal(data, expected)
+
+
+def test_aio_pagination_matches_sync(api):
+    expected = sponge.fetch_all(sponge.get_all_ceRNAInteractions, page_size=1000, disease_name=DISEASE)
+    data = _run(aio.fetch_all(aio.get_all_ceRNAInteractions, page_size=1000, concurrency=3, disease_name=DISEASE))
+    pandas.testing.assert_frame_equal(data, expected)
+    with pytest.raises(connection.EmptyResponseError):
+        _run(aio.fetch_all(aio.get_all_ceRNAInteractions, page_size=100, offset=ROWS, disease_name=DISEASE))
+
+
+def test_merge_chunks_removes_duplicates():
+    first = pandas.DataFrame({"gene": ["A", "B"], "score": [1.0, 2.0]})
+    second = pandas.DataFrame({"gene": ["B", "C"], "score": [2.0, 3.0]})
+    data = connection.merge_chunks([first, None, connection.EmptyResponseError("empty"), second])
+    assert data["gene"].tolist() == ["A", "B", "C"]
+    assert data.index.tolist() == [0, 1, 2]
+
+
+def test_merge_chunks_compares_unhashable_cells_as_text():
+    chunk = pandas.DataFrame({"gene": ["A"], "pathways": [["p1", "p2"]]})
+    data = connection.merge_chunks([chunk, chunk.copy()])
+    assert len(data) == 1
+
+
+def test_merge_chunks_of_empty_answers():
+    first = connection.EmptyResponseError("first")
+    with pytest.raises(connection.EmptyResponseError) as error:
+        connection.merge_chunks([None, first, connection.EmptyResponseError("second")])
+    assert error.value is first
+    assert connection.merge_chunks([None, None]) is None
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_fetch_all_compacts_the_combined_pages(api, concurrency):
+    data = sponge.fetch_all(sponge.get_all_ceRNAInteractions, page_size=500, concurrency=concurrency,
+                            disease_name=DISEASE, compact=True)
+    assert len(data) == ROWS
+    for column in ("gene1.ensg_number", "gene2.ensg_number", "gene1.gene_symbol", "gene2.gene_symbol",
+                   "run.dataset.disease_name"):
+        assert isinstance(data[column].dtype, pandas.CategoricalDtype), column
+    assert data["correlation"].dtype == "float32"
+    assert str(_run(aio.fetch_all(aio.get_all_ceRNAInteractions, page_size=500, disease_name=DISEASE,
+                                  compact=True)).dtypes) == str(data.dtypes)
+
+
+def test_prefetched_pages_do_not_outlive_fetch_all(slow_api):
+    data = sponge.fetch_all(sponge.get_all_ceRNAInteractions, page_size=1000, concurrency=4, disease_name=DISEASE)
+    assert len(data) == ROWS
+    finished = len(slow_api)
+    time.sleep(0.7)
+    assert len(slow_api) == finished
+    assert {0, 1000, 2000} <= {record.params["offset"] for record in slow_api}
+
+
+def test_prefetched_pages_do_not_outlive_aio_fetch_all(slow_api):
+    async def main():
+        try:
+            data = await aio.fetch_all(aio.get_all_ceRNAInteractions, page_size=1000, concurrency=4,
+                                       disease_name=DISEASE)
+            finished = len(slow_api)
+            await asyncio.sleep(0.7)
+            return data, finished
+        finally:
+            await aio.close()
+
+    data, finished = asyncio.run(main())
+    assert len(data) == ROWS
+    assert len(slow_api) == finished
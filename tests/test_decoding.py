@@ -0,0 +1,53 @@
+"""
+The fast flattening of decoded records compared with pandas.json_normalize
+"""
+import functools
+
+import pandas
+import payloads
+import pytest
+
+# local import
+import spongeWebPy.decoding as decoding
+
+PAYLOADS = [
+    payloads.ceRNA_interactions,
+    payloads.ceRNAs,
+    payloads.miRNA_interactions,
+    payloads.miRNA_occurences,
+    payloads.gene_expression,
+    payloads.mirna_expression,
+    payloads.gene_counts,
+    payloads.survival_rates,
+    payloads.survival_pvalues,
+    payloads.sample_information,
+    payloads.datasets,
+    payloads.run_information,
+    payloads.overall_counts,
+    functools.partial(payloads.gene_annotations, "hallmark"),
+]
+
+
+@pytest.mark.parametrize("generate", PAYLOADS)
+def test_records_to_frame_matches_json_normalize(generate):
+    records = generate(200, 0)
+    pandas.testing.assert_frame_equal(decoding.records_to_frame(records), pandas.json_normalize(records))
+
+
+@pytest.mark.parametrize("records", [
+    [],
+    [{"a": 1}, {"a": 2, "b": 3}],
+    [{"a": {"b": 1}}, {"a": None}],
+    [{"a": None}, {"a": {"b": 1}}],
+    [{"a": {"b": 1, "c": 2}}, {"a": {"b": 1}}],
+    [{"a": [1, 2], "b": {"c": None}}],
+    {"a": 1, "b": {"c": 2}},
+])
+def test_irregular_records_match_json_normalize(records):
+    pandas.testing.assert_frame_equal(decoding.records_to_frame(records), pandas.json_normalize(records))
+
+
+def test_loads_matches_json():
+    import json
+    content = json.dumps(payloads.ceRNA_interactions(100, 0)).encode("utf-8")
+    assert decoding.loads(content) == json.loads(content)
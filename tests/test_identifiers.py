@@ -0,0 +1,52 @@
+"""
+Identifier lists are only rewritten on request, miRNA names keep their case and ambiguous symbols are not guessed
+"""
+import pytest
+
+# local import
+import spongeWebPy.config as config
+import spongeWebPy.identifiers as identifiers
+
+
+@pytest.fixture
+def index(monkeypatch):
+    monkeypatch.setattr(config, "cache_enabled", False)
+    identifiers.clear_identifiers()
+    current = identifiers.index()
+    current.add("gene", ["ENSG00000171862", "ENSG00000078237"], ["PTEN", "TIGAR"])
+    current.add("mirna", ["MIMAT0000076", "MI0000077"], ["hsa-miR-21-5p", "hsa-mir-21"])
+    yield current
+    identifiers.clear_identifiers()
+
+
+def test_params_are_sent_unchanged_by_default(index):
+    params = {"ensg_number": ["pten", "PTEN", "ENSG00000078237.5"], "hs_number": ["hsa-mir-21"]}
+    assert identifiers.normalize_params(params) is params
+
+
+def test_normalization_on_request(index, monkeypatch):
+    monkeypatch.setattr(config, "normalize_identifiers", True)
+    params = {"ensg_number": ["pten", "ENSG00000171862", "ENSG00000078237.5"], "gene_symbol": ["ensg00000078237"],
+              "disease_name": ["kidney", "kidney"]}
+    assert identifiers.normalize_params(params) == {
+        "ensg_number": ["ENSG00000171862", "ENSG00000078237"], "gene_symbol": ["TIGAR"], "disease_name": ["kidney"]}
+
+
+def test_mirna_names_keep_their_case(index, monkeypatch):
+    monkeypatch.setattr(config, "normalize_identifiers", True)
+    assert list(identifiers.to_mimat_number(["hsa-miR-21-5p", "hsa-mir-21", "HSA-MIR-21-5P"])) == \
+        ["MIMAT0000076", "MI0000077", None]
+    params = identifiers.normalize_params({"hs_number": ["hsa-mir-21", "hsa-miR-21-5p", "mimat0000076"]})
+    assert params["hs_number"] == ["hsa-mir-21", "hsa-miR-21-5p"]
+
+
+def test_ambiguous_symbol_is_not_guessed(index, monkeypatch):
+    index.add("gene", ["ENSG00000000001", "ENSG00000000002"], ["SHARED", "shared"])
+    assert list(identifiers.to_ensg_number(["Shared", "pten"])) == [None, "ENSG00000171862"]
+    assert list(identifiers.to_gene_symbol(["ENSG00000000002"])) == ["shared"]
+
+    monkeypatch.setattr(config, "normalize_identifiers", True)
+    with pytest.raises(identifiers.AmbiguousIdentifierError, match="ENSG00000000001, ENSG00000000002"):
+        identifiers.normalize_params({"ensg_number": ["SHARED"]})
+    # as a symbol it is spelled like the first one seen
+    assert identifiers.normalize_params({"gene_symbol": ["Shared"]}) == {"gene_symbol": ["SHARED"]}
@@ -0,0 +1,42 @@
+"""
+Import-time budget: importing spongeWebPy must stay cheap and offline
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# runs in a fresh interpreter, so that modules imported by other tests do not count
+SCRIPT = """
+import socket
+import sys
+
+def refuse(*args, **kwargs):
+    raise AssertionError("socket call during import")
+
+socket.socket.connect = refuse
+socket.socket.connect_ex = refuse
+socket.create_connection = refuse
+socket.getaddrinfo = refuse
+
+import spongeWebPy
+
+heavy = sorted(name for name in ("pandas", "requests", "numpy", "urllib3") if name in sys.modules)
+print(",".join(heavy))
+"""
+
+
+def test_import_is_lazy_and_offline():
+    result = subprocess.run([sys.executable, "-c", SCRIPT], cwd=ROOT, capture_output=True, text=True,
+                            env=dict(os.environ, PYTHONPATH=ROOT))
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ""
+
+
+def test_public_names_resolve_on_access():
+    result = subprocess.run([sys.executable, "-c", "import spongeWebPy, sys; spongeWebPy.get_overallCounts; "
+                             "print('pandas' in sys.modules)"], cwd=ROOT, capture_output=True, text=True,
+                            env=dict(os.environ, PYTHONPATH=ROOT))
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "True"
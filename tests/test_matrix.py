@@ -0,0 +1,26 @@
+"""
+Saving a matrix over a stored one swaps the whole store
+"""
+import os
+
+import numpy
+
+# local import
+from spongeWebPy.matrix import ExpressionMatrix
+
+
+def _matrix(value):
+    return ExpressionMatrix(numpy.full((2, 3), value, dtype=numpy.float32), numpy.array(["g1", "g2"]),
+                            numpy.array(["s1", "s2", "s3"]))
+
+
+def test_save_replaces_a_stored_matrix(tmp_path):
+    path = str(tmp_path / "store")
+    _matrix(1).save(path)
+    mapped = ExpressionMatrix.load(path)
+    _matrix(2).save(path)
+
+    assert os.listdir(str(tmp_path)) == ["store"]
+    assert (ExpressionMatrix.load(path).values == 2).all()
+    # a matrix opened before keeps the values of the old store
+    assert (mapped.values == 1).all()
@@ -0,0 +1,95 @@
+"""
+Centralities of small networks with known values
+"""
+import math
+
+import numpy
+import pandas
+import pytest
+
+# local import
+from spongeWebPy.network import CeRNANetwork
+
+
+def _network(edges, **edge_data):
+    interactions = pandas.DataFrame({"gene1.ensg_number": [a for a, _ in edges],
+                                     "gene2.ensg_number": [b for _, b in edges]})
+    for column, values in edge_data.items():
+        interactions[column] = values
+    return CeRNANetwork.from_interactions(interactions)
+
+
+# a - b - c - d
+PATH = _network([("a", "b"), ("b", "c"), ("c", "d")])
+# hub with four leaves
+STAR = _network([("hub", "l1"), ("hub", "l2"), ("hub", "l3"), ("hub", "l4")])
+# two separate pairs
+PAIRS = _network([("a", "b"), ("c", "d")])
+
+
+def _values(series, order):
+    return series.loc[order].to_numpy()
+
+
+def test_degree():
+    assert _values(PATH.degree(), list("abcd")).tolist() == [1, 2, 2, 1]
+    numpy.testing.assert_allclose(_values(PATH.degree(normalized=True), list("abcd")), [1 / 3, 2 / 3, 2 / 3, 1 / 3])
+    assert STAR.degree()["hub"] == 4
+    assert PAIRS.degree().tolist() == [1, 1, 1, 1]
+
+
+def test_betweenness():
+    # b and c lie on the shortest paths a-c, a-d resp. b-d, a-d: 2 of the 3 pairs not containing them
+    numpy.testing.assert_allclose(_values(PATH.betweenness(), list("abcd")), [0, 2 / 3, 2 / 3, 0])
+    numpy.testing.assert_allclose(_values(PATH.betweenness(normalized=False), list("abcd")), [0, 2, 2, 0])
+    # the hub is on all 6 paths between leaves
+    assert STAR.betweenness()["hub"] == pytest.approx(1.0)
+    assert STAR.betweenness(normalized=False).drop("hub").tolist() == [0, 0, 0, 0]
+    assert PAIRS.betweenness().tolist() == [0, 0, 0, 0]
+
+
+def test_betweenness_counts_every_shortest_path():
+    # square a-b-d, a-c-d: b and c carry half of the paths between a and d
+    square = _network([("a", "b"), ("a", "c"), ("b", "d"), ("c", "d")])
+    numpy.testing.assert_allclose(_values(square.betweenness(normalized=False), list("abcd")), [0.5] * 4)
+
+
+def test_sampled_betweenness_with_all_sources_is_exact():
+    pandas.testing.assert_series_equal(PATH.betweenness(k=4, seed=1), PATH.betweenness())
+    assert len(STAR.betweenness(k=2, seed=1)) == 5
+
+
+def test_eigenvector():
+    x = math.sin(math.pi / 5), math.sin(2 * math.pi / 5)
+    norm = math.sqrt(2 * (x[0] ** 2 + x[1] ** 2))
+    numpy.testing.assert_allclose(_values(PATH.eigenvector(tol=1e-10, max_iter=1000), list("abcd")),
+                                  [x[0] / norm, x[1] / norm, x[1] / norm, x[0] / norm], atol=1e-6)
+    star = STAR.eigenvector(tol=1e-10, max_iter=1000)
+    assert star["hub"] == pytest.approx(1 / math.sqrt(2), abs=1e-6)
+    assert star.drop("hub").to_numpy() == pytest.approx([1 / math.sqrt(8)] * 4, abs=1e-6)
+    assert PAIRS.eigenvector().tolist() == pytest.approx([0.5] * 4)
+
+
+def test_parallel_edges_and_self_loops_are_ignored():
+    network = _network([("a", "b"), ("b", "a"), ("a", "b"), ("b", "b"), ("b", "c")])
+    assert network.number_of_edges == 2
+    assert sorted(network.neighbors("b")) == ["a", "c"]
+    assert _values(network.degree(), list("abc")).tolist() == [1, 2, 1]
+
+
+def test_threshold_and_subgraph():
+    network = _network([("a", "b"), ("b", "c"), ("c", "d")], p_value=[0.01, 0.2, 0.03], mscor=[0.5, 0.1, 0.05])
+    kept = network.threshold(pValue=0.05)
+    assert kept.number_of_edges == 2
+    assert sorted(kept.nodes) == list("abcd")
+    assert kept.betweenness().tolist() == [0, 0, 0, 0]
+    strong = network.threshold(mscor=0.08, mscorDirection=">")
+    assert sorted(strong.nodes) == list("abc")
+    assert network.threshold(pValue=0.05, keep_nodes=True).number_of_nodes == 4
+    sub = network.subgraph(["b", "c", "d"])
+    assert sub.number_of_edges == 2
+    assert sub.edges()["p_value"].tolist() == [0.2, 0.03]
+    with pytest.raises(ValueError):
+        network.subgraph(["x"])
+    with pytest.raises(ValueError):
+        network.threshold(foo=1)
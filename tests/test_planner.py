@@ -0,0 +1,114 @@
+"""
+Narrower queries answered from cached broader results, and those that still go to the API
+"""
+import pandas
+import pytest
+
+# local import
+import spongeWebPy as sponge
+import spongeWebPy.connection as connection
+import spongeWebPy.filters as filters
+import spongeWebPy.metrics as metrics
+from conftest import ROWS
+
+DISEASE = "kidney clear cell carcinoma"
+ENDPOINT = "ceRNAInteraction/findAll"
+
+
+@pytest.fixture
+def sources(cached):
+    """
+    Where the answers of the requests came from, in order.
+    """
+    recorded = []
+
+    def after(record):
+        recorded.append(record.source)
+
+    metrics.add_request_hook(after=after)
+    yield recorded
+    metrics.remove_request_hook(after=after)
+
+
+@pytest.fixture
+def broader(sources):
+    # the complete result of the default query, pages up to the short last one
+    data = sponge.fetch_all(sponge.get_all_ceRNAInteractions, page_size=1000, concurrency=1, disease_name=DISEASE)
+    assert len(data) == ROWS and sources == ["api"] * 3
+    sources.clear()
+    return data
+
+
+def _expected(data, **kwargs):
+    request = connection.prepare(sponge.get_all_ceRNAInteractions, disease_name=DISEASE, **kwargs)
+    return filters.apply(ENDPOINT, data, request.params)
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"pValue": 0.01, "limit": 1000},
+    {"pValue": 0.01, "limit": 20, "offset": 40, "sorting": "mscor", "descending": False},
+    {"mscor": 0.5, "mscorDirection": "<", "correlation": 0.0, "correlationDirection": ">", "limit": 500},
+])
+def test_narrower_query_is_answered_locally(broader, sources, kwargs):
+    data = sponge.get_all_ceRNAInteractions(disease_name=DISEASE, **kwargs)
+    assert sources == ["subsumed"]
+    expected = _expected(broader, **kwargs)
+    assert len(expected) > 0
+    pandas.testing.assert_frame_equal(data, expected)
+
+
+def test_window_of_the_identical_query_is_cut_out(broader, sources):
+    # the server filtered the cached rows already, they are not filtered again
+    data = sponge.get_all_ceRNAInteractions(disease_name=DISEASE, limit=100, offset=1950)
+    assert sources == ["subsumed"]
+    pandas.testing.assert_frame_equal(data, broader.iloc[1950:2050].reset_index(drop=True))
+
+
+def test_identifier_subset_is_answered_locally(broader, sources):
+    # the stand-in server answers with rows of every dataset
+    rows = broader[broader["run.dataset.disease_name"] == DISEASE]
+    symbols = rows["gene1.gene_symbol"].iloc[:3].tolist()
+    data = sponge.get_all_ceRNAInteractions(disease_name=DISEASE, gene_symbol=symbols, limit=1000)
+    assert sources == ["subsumed"]
+    assert len(data) >= 3
+    assert (data["gene1.gene_symbol"].isin(symbols) | data["gene2.gene_symbol"].isin(symbols)).all()
+    pandas.testing.assert_frame_equal(data, _expected(broader, gene_symbol=symbols, limit=1000))
+
+
+@pytest.mark.parametrize("kwargs", [
+    # more rows than the cached answer holds
+    {"pValue": 0.1, "limit": 100},
+    {"pValue": 0.01, "pValueDirection": ">", "limit": 100},
+    {"disease_name": "kidney", "limit": 100},
+])
+def test_broader_query_goes_to_the_api(broader, sources, kwargs):
+    sponge.get_all_ceRNAInteractions(**dict({"disease_name": DISEASE}, **kwargs))
+    assert sources == ["api"]
+
+
+def test_unsorted_query_is_not_answered_from_a_sorted_result(sources):
+    sponge.fetch_all(sponge.get_all_ceRNAInteractions, page_size=1000, concurrency=1, disease_name=DISEASE,
+                     sorting="pValue")
+    sources.clear()
+    sponge.get_all_ceRNAInteractions(disease_name=DISEASE, pValue=0.01, limit=100)
+    assert sources == ["api"]
+    sponge.get_all_ceRNAInteractions(disease_name=DISEASE, pValue=0.01, limit=100, sorting="pValue")
+    assert sources == ["api", "subsumed"]
+
+
+def test_truncated_result_is_not_used(sources):
+    # a single full page: further pages may hold more matching rows
+    sponge.get_all_ceRNAInteractions(disease_name=DISEASE, limit=1000)
+    sponge.get_all_ceRNAInteractions(disease_name=DISEASE, pValue=0.01, limit=10)
+    assert sources == ["api", "api"]
+    # windows of the identical query are cut out of the cached page
+    data = sponge.get_all_ceRNAInteractions(disease_name=DISEASE, limit=100, offset=300)
+    assert sources == ["api", "api", "subsumed"]
+    assert len(data) == 100
+
+
+def test_planner_can_be_switched_off(broader, sources, monkeypatch):
+    import spongeWebPy.config as config
+    monkeypatch.setattr(config, "subsume_queries", False)
+    sponge.get_all_ceRNAInteractions(disease_name=DISEASE, pValue=0.01, limit=100)
+    assert sources == ["api"]
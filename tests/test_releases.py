@@ -0,0 +1,57 @@
+"""
+A rebuilt dataset invalidates only its own cached and memoized answers
+"""
+import server
+
+# local import
+import spongeWebPy as sponge
+import spongeWebPy.cache as cache
+import spongeWebPy.connection as connection
+import spongeWebPy.memo as memo
+import spongeWebPy.releases as releases
+
+KIDNEY = "kidney clear cell carcinoma"
+LUNG = "lung adenocarcinoma"
+
+
+def _key(function, *args, **kwargs):
+    request = connection.prepare(function, *args, **kwargs)
+    return request.endpoint, request.params
+
+
+def _rebuilt(rows, offset):
+    # the kidney dataset got a new run
+    records = server.payloads.overall_counts(min(rows, 4), offset)
+    for record in records:
+        if record["disease_name"] == KIDNEY:
+            record["run_ID"] += 100
+    return records
+
+
+def test_changed_release_drops_only_its_dataset(cached, monkeypatch):
+    requests = {name: _key(sponge.get_all_ceRNAInteractions, disease_name=disease, limit=10)
+                for name, disease in (("kidney", KIDNEY), ("lung", LUNG), ("abbreviation", "KCCC"),
+                                      ("search", "kidney"))}
+    for endpoint, params in requests.values():
+        connection.api_request(endpoint, params)
+    sponge.get_runInformation(KIDNEY)
+    sponge.get_runInformation(LUNG)
+    sponge.get_overallCounts()
+    assert releases.check_releases() == []
+
+    server._body.cache_clear()
+    monkeypatch.setitem(server.ENDPOINTS, "getOverallCounts", (_rebuilt, False))
+    try:
+        assert releases.check_releases() == [KIDNEY]
+    finally:
+        server._body.cache_clear()
+
+    assert cache.lookup(*requests["kidney"]) is None
+    assert cache.lookup(*requests["abbreviation"]) is None
+    assert cache.lookup(*requests["search"]) is None
+    assert cache.lookup(*requests["lung"]) is not None
+    assert memo.lookup(*_key(sponge.get_runInformation, KIDNEY)) is None
+    assert memo.lookup(*_key(sponge.get_runInformation, LUNG)) is not None
+    # not requested for a single dataset
+    assert memo.lookup(*_key(sponge.get_overallCounts)) is None
+    assert releases.check_releases() == []
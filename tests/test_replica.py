@@ -0,0 +1,58 @@
+"""
+Queries of the offline replica stay within the synced filters
+"""
+import pytest
+
+# local import
+import spongeWebPy as sponge
+import spongeWebPy.config as config
+import spongeWebPy.replica as replica
+
+DISEASE = "kidney clear cell carcinoma"
+ENDPOINT = "ceRNAInteraction/findAll"
+
+
+@pytest.fixture
+def local(api, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "replica_path", str(tmp_path / "replica.sqlite"))
+    yield
+    config.backend = "api"
+
+
+def test_synced_query_is_answered(local):
+    replica.sync_replica(disease_name=DISEASE, endpoints=[ENDPOINT])
+    config.backend = "replica"
+    data = sponge.get_all_ceRNAInteractions(disease_name=DISEASE, pValue=0.01, limit=50)
+    assert 0 < len(data) <= 50
+    assert (data["p_value"] < 0.01).all()
+    assert data["run.dataset.disease_name"].str.contains(DISEASE).all()
+
+
+def test_query_beyond_the_synced_threshold_raises(local):
+    replica.sync_replica(disease_name=DISEASE, endpoints=[ENDPOINT])
+    assert replica.synced_filters(ENDPOINT) == [{"disease_name": DISEASE, "pValue": 0.05, "pValueDirection": "<",
+                                                 "mscorDirection": "<", "correlationDirection": "<"}]
+    config.backend = "replica"
+    with pytest.raises(replica.ReplicaCoverageError):
+        sponge.get_all_ceRNAInteractions(disease_name=DISEASE, pValue=0.1)
+    with pytest.raises(replica.ReplicaCoverageError):
+        sponge.get_all_ceRNAInteractions(disease_name=DISEASE, pValue=0.01, pValueDirection=">")
+
+
+def test_dataset_that_was_not_synced_raises(local):
+    replica.sync_replica(disease_name=DISEASE, endpoints=[ENDPOINT])
+    config.backend = "replica"
+    with pytest.raises(replica.ReplicaCoverageError, match="did not sync"):
+        sponge.get_all_ceRNAInteractions(disease_name="lung adenocarcinoma")
+    with pytest.raises(replica.ReplicaCoverageError):
+        sponge.get_all_ceRNAInteractions()
+
+
+def test_later_syncs_keep_or_drop_earlier_ones(local):
+    replica.sync_replica(disease_name=DISEASE, endpoints=[ENDPOINT])
+    # the stand-in server answers with rows of every dataset, so each sync replaces the rows of all of them
+    replica.sync_replica(disease_name="lung adenocarcinoma", endpoints=[ENDPOINT], pValue=0.2)
+    assert sorted(sync["disease_name"] for sync in replica.synced_filters(ENDPOINT)) == [DISEASE,
+                                                                                          "lung adenocarcinoma"]
+    replica.sync_replica(disease_name="pancancer", endpoints=[ENDPOINT], pValue=0.01)
+    assert [sync["disease_name"] for sync in replica.synced_filters(ENDPOINT)] == ["pancancer"]
@@ -0,0 +1,97 @@
+"""
+Concurrent identical requests share one request to the server, its result and its error
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas
+import pytest
+
+# local import
+import spongeWebPy as sponge
+import spongeWebPy.aio as aio
+import spongeWebPy.config as config
+import spongeWebPy.connection as connection
+from conftest import ROWS
+
+DISEASE = "kidney clear cell carcinoma"
+CALLERS = 8
+
+
+def _threads(function):
+    barrier = threading.Barrier(CALLERS)
+
+    def call():
+        barrier.wait()
+        try:
+            return function()
+        except Exception as error:
+            return error
+
+    with ThreadPoolExecutor(CALLERS) as executor:
+        return list(executor.map(lambda _: call(), range(CALLERS)))
+
+
+def _coroutines(function):
+    async def main():
+        try:
+            return await asyncio.gather(*[function() for _ in range(CALLERS)], return_exceptions=True)
+        finally:
+            await aio.close()
+    return asyncio.run(main())
+
+
+def _check_shared_result(results, sent):
+    assert len(sent) == 1
+    for data in results:
+        pandas.testing.assert_frame_equal(data, results[0])
+    # every caller got its own copy
+    assert len({id(data) for data in results}) == CALLERS
+    results[1].iloc[0, 0] = None
+    assert results[0].iloc[0, 0] is not None
+
+
+def test_threads_share_one_request(slow_api):
+    results = _threads(lambda: sponge.get_all_ceRNAInteractions(disease_name=DISEASE, limit=50))
+    _check_shared_result(results, slow_api)
+
+
+def test_threads_share_the_error(slow_api):
+    results = _threads(lambda: sponge.get_all_ceRNAInteractions(disease_name=DISEASE, limit=50, offset=ROWS))
+    assert len(slow_api) == 1
+    assert all(isinstance(error, connection.EmptyResponseError) for error in results)
+
+
+def test_coroutines_share_one_request(slow_api):
+    results = _coroutines(lambda: aio.get_all_ceRNAInteractions(disease_name=DISEASE, limit=50))
+    _check_shared_result(results, slow_api)
+
+
+def test_coroutines_share_the_error(slow_api):
+    results = _coroutines(lambda: aio.get_all_ceRNAInteractions(disease_name=DISEASE, limit=50, offset=ROWS))
+    assert len(slow_api) == 1
+    assert all(isinstance(error, connection.EmptyResponseError) for error in results)
+
+
+def test_cancelled_leader_does_not_cancel_the_others(slow_api):
+    async def main():
+        try:
+            leader = asyncio.ensure_future(aio.get_all_ceRNAInteractions(disease_name=DISEASE, limit=20))
+            await asyncio.sleep(0.05)
+            follower = asyncio.ensure_future(aio.get_all_ceRNAInteractions(disease_name=DISEASE, limit=20))
+            await asyncio.sleep(0.05)
+            leader.cancel()
+            return await follower
+        finally:
+            await aio.close()
+
+    assert len(asyncio.run(main())) == 20
+    assert len(slow_api) == 1
+
+
+def test_coalescing_can_be_switched_off(slow_api, monkeypatch):
+    monkeypatch.setattr(config, "coalesce_requests", False)
+    results = _coroutines(lambda: aio.get_all_ceRNAInteractions(disease_name=DISEASE, limit=50))
+    assert len(slow_api) == CALLERS
+    assert all(isinstance(data, pandas.DataFrame) for data in results)
@@ -0,0 +1,101 @@
+"""
+Incremental JSON array parsing and streamed answers
+"""
+import json
+import random
+
+import pandas
+import payloads
+import pytest
+
+# local import
+import spongeWebPy as sponge
+import spongeWebPy.connection as connection
+import spongeWebPy.decoding as decoding
+import spongeWebPy.streaming as streaming
+from conftest import ROWS
+
+DISEASE = "kidney clear cell carcinoma"
+
+# strings with escapes and multi-byte characters, literals and numbers that can be cut anywhere
+TRICKY = [{"text": 'quote " backslash \\ slash / tab \t newline \n', "unicode": "Zürich 東京 \U0001F9EC  ",
+           "escaped": "\\u0041 \\\" ]}", "nested": {"list": [1, -2.5e-3, 1E+10, [], {}], "none": None}},
+          True, False, None, 0, -0.0, 123456789012345678, 3.14159, "", "]", "[", ",", [[], [[]]], {"": ""}]
+
+
+def _decode(content, sizes):
+    decoder = decoding.ArrayDecoder()
+    elements = []
+    position = 0
+    for size in sizes:
+        elements += decoder.feed(content[position:position + size])
+        position += size
+    elements += decoder.feed(content[position:])
+    return elements + decoder.close()
+
+
+def _random_sizes(content, rng):
+    sizes = []
+    while sum(sizes) < len(content):
+        sizes.append(rng.randint(0, 7))
+    return sizes
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_splits(seed):
+    rng = random.Random(seed)
+    records = TRICKY + payloads.ceRNA_interactions(20, seed)
+    for content in (json.dumps(records).encode("utf-8"), json.dumps(records, ensure_ascii=False, indent=1).encode(
+            "utf-8")):
+        assert _decode(content, _random_sizes(content, rng)) == records
+
+
+def test_byte_by_byte():
+    content = json.dumps(TRICKY, ensure_ascii=False).encode("utf-8")
+    assert _decode(content, [1] * len(content)) == TRICKY
+
+
+@pytest.mark.parametrize("content, expected", [
+    (b"[]", []),
+    (b"  [ ]  ", []),
+    (b"[1]", [1]),
+    (b'{"detail": "No results found."}', [{"detail": "No results found."}]),
+    (b"[[1], 2]", [[1], 2]),
+])
+def test_small_documents(content, expected):
+    assert _decode(content, [1] * len(content)) == expected
+    assert _decode(content, []) == expected
+
+
+@pytest.mark.parametrize("content", [b"", b"[", b"[1,", b"[1,]", b"[1,,2]", b"[1 2]", b"[1]x", b"[{]", b'["abc',
+                                     b"[tru]", b"[1]]", b"{", b"[-]"])
+def test_malformed_arrays(content):
+    with pytest.raises(ValueError):
+        _decode(content, [1] * len(content))
+    with pytest.raises(ValueError):
+        _decode(content, [])
+
+
+def test_chunks_match_the_buffered_call(api, monkeypatch):
+    # small reads cut the records at arbitrary bytes
+    monkeypatch.setattr(streaming, "_read_size", 97)
+    expected = sponge.get_all_ceRNAInteractions(disease_name=DISEASE, limit=1000)
+    chunks = list(streaming.iter_chunks(sponge.get_all_ceRNAInteractions, disease_name=DISEASE, limit=1000,
+                                        chunk_size=300))
+    assert [len(chunk) for chunk in chunks] == [300, 300, 300, 100]
+    assert [chunk.index[0] for chunk in chunks] == [0, 300, 600, 900]
+    pandas.testing.assert_frame_equal(pandas.concat(chunks), expected)
+
+
+def test_chunks_of_several_datasets(api):
+    chunks = list(streaming.iter_chunks(sponge.get_all_ceRNAInteractions, disease_name=[DISEASE, "pancancer"],
+                                        limit=250, chunk_size=100))
+    assert [len(chunk) for chunk in chunks] == [100, 100, 50] * 2
+    assert [chunk["disease"].iloc[0] for chunk in chunks] == [DISEASE] * 3 + ["pancancer"] * 3
+
+
+def test_empty_and_invalid_streams(api):
+    with pytest.raises(connection.EmptyResponseError):
+        list(streaming.iter_chunks(sponge.get_all_ceRNAInteractions, disease_name=DISEASE, offset=ROWS))
+    with pytest.raises(ValueError):
+        streaming.iter_chunks(sponge.get_all_ceRNAInteractions, disease_name=DISEASE, chunk_size=0)
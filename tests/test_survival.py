@@ -0,0 +1,97 @@
+"""
+Vectorized log-rank tests and Kaplan-Meier curves compared with a straightforward per-gene loop
+"""
+import math
+
+import numpy
+import pytest
+
+# local import
+from spongeWebPy.survival import SurvivalCohort
+
+
+def _reference_logrank(time, event, group):
+    # one gene: patients with a group, sums over the distinct times of these patients
+    valid = ~numpy.isnan(group)
+    time, event, high = time[valid], event[valid], group[valid] > 0.5
+    observed = expected = variance = 0.0
+    for t in numpy.unique(time):
+        at_risk = time >= t
+        n, n_high = at_risk.sum(), (at_risk & high).sum()
+        d, d_high = (event & (time == t)).sum(), (event & high & (time == t)).sum()
+        observed += d_high
+        expected += d * n_high / n
+        if n > 1:
+            variance += d * (n_high / n) * (1 - n_high / n) * (n - d) / (n - 1)
+    if variance == 0:
+        return observed, expected, math.nan, math.nan
+    chi2 = (observed - expected) ** 2 / variance
+    return observed, expected, chi2, math.erfc(math.sqrt(chi2 / 2))
+
+
+def _reference_curve(time, event, member, grid):
+    # survival of one group right after each time of the grid
+    survival, curve = 1.0, []
+    for t in grid:
+        at_risk = (time >= t) & member
+        deaths = (event & (time == t) & member).sum()
+        if at_risk.sum():
+            survival *= 1 - deaths / at_risk.sum()
+        curve.append(survival)
+    return curve
+
+
+@pytest.fixture
+def cohort_data():
+    rng = numpy.random.default_rng(7)
+    patients = 60
+    # few distinct times, so that many events are tied
+    time = rng.integers(1, 12, patients).astype(float)
+    event = rng.random(patients) < 0.6
+    groups = (rng.random((6, patients)) < 0.5).astype(numpy.float32)
+    # patients without a group
+    groups[1, :10] = numpy.nan
+    groups[2, rng.random(patients) < 0.3] = numpy.nan
+    # everybody in one group: nothing to compare
+    groups[3] = 1.0
+    groups[4] = 0.0
+    return time, event, groups
+
+
+def test_logrank_matches_the_per_gene_loop(cohort_data):
+    time, event, groups = cohort_data
+    cohort = SurvivalCohort(numpy.arange(len(time)), time, event)
+    # the cohort sorts its patients by time, the columns of the groups follow its order
+    result = cohort.logrank(groups[:, cohort.samples], batch_size=4)
+    for row, group in enumerate(groups):
+        observed, expected, chi2, p_value = _reference_logrank(time, event, group)
+        assert result["observed_high"].iloc[row] == observed
+        assert result["expected_high"].iloc[row] == pytest.approx(expected)
+        assert result["n_high"].iloc[row] == (group > 0.5).sum()
+        assert result["n_low"].iloc[row] == (group < 0.5).sum()
+        if math.isnan(chi2):
+            assert numpy.isnan(result["chi2"].iloc[row]) and numpy.isnan(result["p_value"].iloc[row])
+        else:
+            assert result["chi2"].iloc[row] == pytest.approx(chi2)
+            assert result["p_value"].iloc[row] == pytest.approx(p_value)
+    assert numpy.isnan(result["p_value"].iloc[[3, 4]]).all()
+
+
+def test_kaplan_meier_matches_the_per_gene_loop(cohort_data):
+    time, event, groups = cohort_data
+    cohort = SurvivalCohort(numpy.arange(len(time)), time, event)
+    times, high, low = cohort.kaplan_meier(groups[:, cohort.samples])
+    assert times.tolist() == sorted(set(time[event]))
+    for row, group in enumerate(groups):
+        numpy.testing.assert_allclose(high[row], _reference_curve(time, event, group > 0.5, times))
+        numpy.testing.assert_allclose(low[row], _reference_curve(time, event, group < 0.5, times))
+    # nobody in the low group
+    assert (low[3] == 1.0).all()
+
+
+def test_patients_without_time_or_event_are_left_out():
+    cohort = SurvivalCohort(["a", "b", "c", "d"], [5.0, numpy.nan, 2.0, 2.0], [1, 1, numpy.nan, 0])
+    assert cohort.samples.tolist() == ["d", "a"]
+    assert cohort.event.tolist() == [False, True]
+    with pytest.raises(ValueError):
+        cohort.logrank(numpy.ones((1, 3)))
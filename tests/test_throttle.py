@@ -0,0 +1,140 @@
+"""
+Backoff, token bucket, adaptive concurrency and retries of overloaded answers
+"""
+import asyncio
+import email.utils
+import time
+
+import pytest
+import server
+
+# local import
+import spongeWebPy as sponge
+import spongeWebPy.aio as aio
+import spongeWebPy.config as config
+import spongeWebPy.connection as connection
+import spongeWebPy.throttle as throttle
+
+DISEASE = "kidney clear cell carcinoma"
+
+
+@pytest.fixture
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(config, "retry_backoff", 0.001)
+    monkeypatch.setattr(config, "retry_backoff_max", 0.01)
+    yield
+    server.FAULTS.clear()
+
+
+def test_backoff_grows_exponentially_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(config, "retry_backoff", 0.5)
+    monkeypatch.setattr(config, "retry_backoff_max", 3)
+    for attempt, bound in ((0, 0.5), (1, 1.0), (2, 2.0), (5, 3.0)):
+        delays = [throttle.backoff(attempt) for _ in range(200)]
+        assert 0 <= min(delays) and max(delays) <= bound
+
+
+def test_backoff_honors_retry_after_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(config, "retry_backoff", 0.001)
+    monkeypatch.setattr(config, "retry_backoff_max", 60)
+    assert 5 <= throttle.backoff(0, "5") <= 5.001
+    assert throttle.backoff(0, "86400") == 60
+    assert throttle.backoff(0, "-3") <= 0.001
+
+
+def test_backoff_parses_http_dates(monkeypatch):
+    monkeypatch.setattr(config, "retry_backoff", 0.001)
+    monkeypatch.setattr(config, "retry_backoff_max", 60)
+    # HTTP dates have whole seconds
+    delay = throttle.backoff(0, email.utils.formatdate(time.time() + 10, usegmt=True))
+    assert 8.5 <= delay <= 10.001
+    assert throttle.backoff(0, email.utils.formatdate(time.time() - 100, usegmt=True)) <= 0.001
+    assert throttle.backoff(0, email.utils.formatdate(time.time() + 7 * 86400, usegmt=True)) == 60
+
+
+@pytest.mark.parametrize("value", ["soon", "", "Mon, 99 Foo 2020", "1e999e"])
+def test_backoff_ignores_bogus_retry_after(monkeypatch, value):
+    monkeypatch.setattr(config, "retry_backoff", 0.001)
+    assert throttle.backoff(0, value) <= 0.001
+
+
+def test_token_bucket():
+    bucket = throttle.TokenBucket(rate=10, burst=2)
+    delays = [bucket.reserve() for _ in range(4)]
+    assert delays[:2] == [0.0, 0.0]
+    assert delays[2] == pytest.approx(0.1, abs=0.01)
+    assert delays[3] == pytest.approx(0.2, abs=0.01)
+    with pytest.raises(ValueError):
+        throttle.TokenBucket(rate=0, burst=1)
+
+
+def test_controller_halves_once_per_epoch():
+    controller = throttle.ConcurrencyController(1, 16)
+    tickets = [controller.acquire() for _ in range(6)]
+    # all six requests were started before the first failure, together they shrink the limit once
+    for ticket in tickets:
+        controller.release(ticket, False)
+    assert controller.limit == 8
+    controller.release(controller.acquire(), False)
+    assert controller.limit == 4
+    for _ in range(5):
+        controller.release(controller.acquire(), False)
+    assert controller.limit == 1
+    assert controller.in_flight == 0
+
+
+def test_controller_increases_additively():
+    controller = throttle.ConcurrencyController(1, 6)
+    controller.release(controller.acquire(), False)
+    assert controller.limit == 3
+    # one slot more per window of `limit` successful requests
+    for _ in range(3):
+        controller.release(controller.acquire(), True)
+    assert 3.9 < controller.limit < 4.1
+    for _ in range(100):
+        controller.release(controller.acquire(), True)
+    assert controller.limit == 6
+    # aborted requests leave the limit unchanged
+    controller.release(controller.acquire(), None)
+    assert controller.limit == 6
+
+
+def test_controller_limits_requests_in_flight():
+    controller = throttle.ConcurrencyController(1, 2)
+    first, second = controller.try_acquire(), controller.try_acquire()
+    assert first is not None and second is not None
+    assert controller.try_acquire() is None
+    controller.release(first, True)
+    assert controller.try_acquire() is not None
+
+
+def test_overloaded_answers_are_retried(api, fast_retries):
+    before = throttle.throttle_info()
+    server.FAULTS["getGeneCount"] = [503, 429]
+    data = sponge.get_geneCount(disease_name=DISEASE, gene_symbol=["GENE1"])
+    assert len(data) > 0
+    info = throttle.throttle_info()
+    assert info["retries"] - before["retries"] == 2
+    assert info["throttled"] - before["throttled"] == 2
+
+
+def test_retries_give_up_after_max_retries(api, fast_retries, monkeypatch):
+    monkeypatch.setattr(config, "max_retries", 1)
+    server.FAULTS["getGeneCount"] = [503, 503, 503]
+    with pytest.raises(connection.APIError) as error:
+        sponge.get_geneCount(disease_name=DISEASE, gene_symbol=["GENE2"])
+    assert error.value.status_code == 503
+    assert server.FAULTS["getGeneCount"] == [503]
+
+
+def test_aio_retries_overloaded_answers(api, fast_retries):
+    server.FAULTS["getGeneCount"] = [502]
+
+    async def main():
+        try:
+            return await aio.get_geneCount(disease_name=DISEASE, gene_symbol=["GENE3"])
+        finally:
+            await aio.close()
+
+    assert len(asyncio.run(main())) > 0
+    assert server.FAULTS["getGeneCount"] == []